@@ -0,0 +1,165 @@
+"""
+Aggregati del dataset calcolati una sola volta per ogni caricamento dei dati.
+
+Le pagine leggono queste tabelle invece di rifare groupby, value_counts e
+describe a ogni rerun di Streamlit.
+"""
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+import pandas as pd
+
+# Colonne storiche e statistiche calcolate per ogni distilleria
+HISTORY_COLUMNS = ['winning_bid_mean', 'trading_volume', 'lots_count']
+HISTORY_STATS = ['mean', 'sum', 'min', 'max', 'count']
+
+
+@dataclass
+class Aggregates:
+    """
+    Tabelle riassuntive del dataset.
+
+    Attributes:
+        per_distillery (pandas.DataFrame): Statistiche per nome di distilleria, colonne "<colonna>_<statistica>"
+        country_counts (pandas.DataFrame): Numero di distillerie per paese (colonne country, count)
+        info_describe (dict): Risultato di describe() per ogni colonna numerica di df_info
+        means (dict): Medie globali delle principali colonne di df_info e df_data
+        top_rating (pandas.DataFrame): Distillerie con rating più alto, in ordine decrescente
+        history_totals (dict): Somma e numero di valori di ogni colonna storica usata in means
+    """
+    per_distillery: pd.DataFrame = field(default_factory=pd.DataFrame)
+    country_counts: pd.DataFrame = field(default_factory=lambda: pd.DataFrame(columns=["country", "count"]))
+    info_describe: dict = field(default_factory=dict)
+    means: dict = field(default_factory=dict)
+    top_rating: pd.DataFrame = field(default_factory=pd.DataFrame)
+    history_totals: dict = field(default_factory=dict)
+    _top_cache: dict = field(default_factory=dict, repr=False)
+
+    @property
+    def info_numeric_columns(self):
+        """Colonne numeriche di df_info disponibili per le statistiche."""
+        return list(self.info_describe)
+
+    def top_distilleries(self, column, k=10):
+        """
+        Restituisce le k distillerie con il valore più alto di una statistica.
+
+        Usa una selezione parziale (nlargest) invece di ordinare tutta la tabella;
+        il risultato viene memorizzato, quindi i rerun successivi non ricalcolano nulla.
+
+        Args:
+            column (str): Colonna di per_distillery, ad esempio "winning_bid_mean_mean"
+            k (int): Numero di distillerie (None per tutte)
+
+        Returns:
+            pandas.DataFrame: Colonne name e column, in ordine decrescente
+        """
+        if self.per_distillery.empty:
+            return pd.DataFrame(columns=['name', column])
+        if (column, k) not in self._top_cache:
+            values = self.per_distillery[column]
+            top = values.nlargest(k) if k else values.dropna().sort_values(ascending=False)
+            top = top.rename_axis('name').reset_index()
+            self._top_cache[(column, k)] = top
+        return self._top_cache[(column, k)]
+
+
+def compute_aggregates(df_info, df_data, top_k=None):
+    """
+    Calcola tutti gli aggregati usati dalle pagine della dashboard.
+
+    Args:
+        df_info (pandas.DataFrame): Informazioni sulle distillerie
+        df_data (pandas.DataFrame): Dati storici combinati
+        top_k (int): Numero di distillerie da tenere nella classifica per rating (None per tutte)
+
+    Returns:
+        Aggregates: Tabelle riassuntive
+    """
+    aggregates = Aggregates()
+    means = {}
+
+    if not df_info.empty:
+        country_counts = df_info["country"].value_counts().reset_index()
+        country_counts.columns = ["country", "count"]
+        aggregates.country_counts = country_counts
+
+        numeric_cols = df_info.select_dtypes(include=['float64', 'int64']).columns.tolist()
+        aggregates.info_describe = {col: df_info[col].describe() for col in numeric_cols}
+        for col in ("whiskybase_rating", "whiskybase_votes"):
+            if col in df_info.columns:
+                means[col] = df_info[col].mean()
+
+        if top_k:
+            aggregates.top_rating = df_info.nlargest(top_k, 'whiskybase_rating')
+        else:
+            rated = df_info.dropna(subset=['whiskybase_rating'])
+            aggregates.top_rating = rated.sort_values('whiskybase_rating', ascending=False, kind='stable')
+
+    if not df_data.empty:
+        columns = [col for col in HISTORY_COLUMNS if col in df_data.columns]
+        per_distillery = df_data.groupby('name', observed=True)[columns].agg(HISTORY_STATS)
+        per_distillery.columns = [f"{col}_{stat}" for col, stat in per_distillery.columns]
+        aggregates.per_distillery = per_distillery
+        for col in ("winning_bid_mean", "trading_volume"):
+            if col in df_data.columns:
+                values = df_data[col]
+                aggregates.history_totals[col] = (float(values.sum()), int(values.count()))
+                means[col] = values.mean()
+
+    aggregates.means = means
+    return aggregates
+
+
+def _combine_per_distillery(previous, added):
+    # Statistiche per nome di due insiemi di righe disgiunti: somme e conteggi si
+    # sommano, minimi e massimi si confrontano, la media è somma / conteggio
+    if previous.empty:
+        return added
+    names = previous.index.union(added.index)
+    before, after = previous.reindex(names), added.reindex(names)
+    combined = {}
+    for col in HISTORY_COLUMNS:
+        if f"{col}_sum" not in before.columns or f"{col}_sum" not in after.columns:
+            continue
+        total = before[f"{col}_sum"].fillna(0) + after[f"{col}_sum"].fillna(0)
+        count = before[f"{col}_count"].fillna(0) + after[f"{col}_count"].fillna(0)
+        combined[f"{col}_mean"] = total / count.where(count > 0)
+        combined[f"{col}_sum"] = total
+        combined[f"{col}_min"] = np.fmin(before[f"{col}_min"], after[f"{col}_min"])
+        combined[f"{col}_max"] = np.fmax(before[f"{col}_max"], after[f"{col}_max"])
+        combined[f"{col}_count"] = count.astype('int64')
+    return pd.DataFrame(combined, index=names)
+
+
+def merge_aggregates(previous, new_data):
+    """
+    Aggiorna gli aggregati con gli storici di distillerie appena aggiunte.
+
+    Solo le nuove righe vengono raggruppate; le statistiche esistenti vengono
+    combinate con le loro, quindi il costo non dipende dalle dimensioni dello
+    storico già caricato. Le informazioni sulle distillerie non cambiano.
+
+    Args:
+        previous (Aggregates): Aggregati dello storico corrente
+        new_data (pandas.DataFrame): Storici delle sole distillerie aggiunte
+
+    Returns:
+        Aggregates: Nuovi aggregati (previous non viene modificato)
+    """
+    if new_data.empty:
+        return previous
+    added = compute_aggregates(pd.DataFrame(), new_data)
+    means = dict(previous.means)
+    totals = dict(previous.history_totals)
+    for col, (total, count) in added.history_totals.items():
+        old_total, old_count = totals.get(col, (0.0, 0))
+        totals[col] = (old_total + total, old_count + count)
+        means[col] = totals[col][0] / totals[col][1] if totals[col][1] else np.nan
+    return replace(
+        previous,
+        per_distillery=_combine_per_distillery(previous.per_distillery, added.per_distillery),
+        means=means,
+        history_totals=totals,
+        _top_cache={},
+    )
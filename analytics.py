@@ -0,0 +1,254 @@
+"""
+Analisi di mercato su tutte le distillerie: matrice dei prezzi dt × slug,
+rendimenti mensili, medie e volatilità mobili, correlazioni e indice di mercato.
+
+Lo storico viene trasformato una sola volta per ogni risultato pubblicato in
+array NumPy di forma (mesi, distillerie); tutti i calcoli sono vettoriali e
+restano rapidi anche con migliaia di distillerie.
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+
+def _rolling_sums(values, window):
+    # Somme mobili lungo l'asse dei mesi ignorando i NaN, con il numero di valori presenti
+    present = ~np.isnan(values)
+    sums = np.cumsum(np.where(present, values, 0.0), axis=0)
+    counts = np.cumsum(present, axis=0)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts[window:] = counts[window:] - counts[:-window]
+    return sums, counts
+
+
+@dataclass
+class MarketAnalytics:
+    """
+    Matrici mensili di prezzi e volumi di tutte le distillerie.
+
+    Attributes:
+        dates (numpy.ndarray): Mesi in ordine crescente (righe delle matrici)
+        slugs (numpy.ndarray): Slug delle distillerie (colonne delle matrici)
+        names (numpy.ndarray): Nomi delle distillerie, nello stesso ordine di slugs
+        prices (numpy.ndarray): Prezzo medio di aggiudicazione, NaN dove mancano aste
+        volumes (numpy.ndarray): Volume di trading, NaN dove mancano aste
+        returns (numpy.ndarray): Rendimenti rispetto al mese precedente (prima riga NaN)
+    """
+    dates: np.ndarray
+    slugs: np.ndarray
+    names: np.ndarray
+    prices: np.ndarray
+    volumes: np.ndarray
+    returns: np.ndarray
+    _cache: dict = field(default_factory=dict, repr=False)
+
+    def __len__(self):
+        return len(self.slugs)
+
+    def rolling_mean(self, window=12, min_periods=3):
+        """
+        Media mobile dei prezzi di ogni distilleria.
+
+        Args:
+            window (int): Ampiezza della finestra in mesi
+            min_periods (int): Numero minimo di mesi con dati nella finestra
+
+        Returns:
+            numpy.ndarray: Matrice (mesi, distillerie), NaN dove i dati non bastano
+        """
+        sums, counts = _rolling_sums(self.prices, window)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts >= min_periods, sums / counts, np.nan)
+
+    def rolling_volatility(self, window=12, min_periods=3):
+        """
+        Deviazione standard mobile dei rendimenti mensili di ogni distilleria.
+
+        Args:
+            window (int): Ampiezza della finestra in mesi
+            min_periods (int): Numero minimo di rendimenti nella finestra
+
+        Returns:
+            numpy.ndarray: Matrice (mesi, distillerie), NaN dove i dati non bastano
+        """
+        sums, counts = _rolling_sums(self.returns, window)
+        squares, _ = _rolling_sums(self.returns ** 2, window)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = (squares - sums ** 2 / counts) / (counts - 1)
+            return np.where(counts >= min_periods, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+
+    def correlation(self, min_periods=12):
+        """
+        Matrice di correlazione dei rendimenti tra tutte le coppie di distillerie.
+
+        Ogni coppia usa solo i mesi in cui entrambe hanno un rendimento; le
+        somme necessarie vengono calcolate con prodotti matriciali, quindi
+        il costo è quello di poche moltiplicazioni (distillerie × mesi × distillerie).
+        Il risultato viene memorizzato.
+
+        Args:
+            min_periods (int): Numero minimo di mesi in comune (altrimenti NaN)
+
+        Returns:
+            numpy.ndarray: Matrice simmetrica (distillerie, distillerie)
+        """
+        key = ('correlation', min_periods)
+        if key not in self._cache:
+            present = ~np.isnan(self.returns)
+            mask = present.astype('float64')
+            values = np.where(present, self.returns, 0.0)
+
+            n = mask.T @ mask
+            sum_x = values.T @ mask          # somma di x_i sui mesi in comune con j
+            sum_xx = (values ** 2).T @ mask
+            sum_xy = values.T @ values
+            with np.errstate(invalid='ignore', divide='ignore'):
+                cov = sum_xy - sum_x * sum_x.T / n
+                var_x = sum_xx - sum_x ** 2 / n
+                corr = cov / np.sqrt(var_x * var_x.T)
+            corr[n < min_periods] = np.nan
+            np.fill_diagonal(corr, np.where(np.diag(n) >= min_periods, 1.0, np.nan))
+            self._cache[key] = np.clip(corr, -1.0, 1.0)
+        return self._cache[key]
+
+    def market_index(self, weighting='equal', base=100.0):
+        """
+        Indice dell'intero mercato costruito concatenando i rendimenti medi mensili.
+
+        Args:
+            weighting (str): 'equal' per la media semplice dei rendimenti, 'volume'
+                per pesarli con il volume di trading del mese precedente
+            base (float): Valore iniziale dell'indice
+
+        Returns:
+            pandas.DataFrame: Colonne dt, index, return, distilleries (distillerie con
+            un rendimento nel mese) e volume (volume totale del mese)
+        """
+        key = ('market_index', weighting, base)
+        if key not in self._cache:
+            present = ~np.isnan(self.returns)
+            if weighting == 'volume':
+                weights = np.zeros_like(self.volumes)
+                weights[1:] = np.nan_to_num(self.volumes[:-1])
+                weights = np.where(present, weights, 0.0)
+            else:
+                weights = present.astype('float64')
+            total = weights.sum(axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean_return = np.where(total > 0, (np.where(present, self.returns, 0.0) * weights).sum(axis=1) / total, 0.0)
+            self._cache[key] = pd.DataFrame({
+                'dt': self.dates,
+                'index': base * np.cumprod(1.0 + mean_return),
+                'return': mean_return,
+                'distilleries': present.sum(axis=1),
+                'volume': np.nansum(self.volumes, axis=1),
+            })
+        return self._cache[key]
+
+    def most_correlated(self, k=20, min_periods=12):
+        """
+        Coppie di distillerie con la correlazione dei rendimenti più alta.
+
+        Args:
+            k (int): Numero di coppie
+            min_periods (int): Numero minimo di mesi in comune
+
+        Returns:
+            pandas.DataFrame: Colonne distilleria_1, distilleria_2 e correlazione
+        """
+        key = ('most_correlated', k, min_periods)
+        if key not in self._cache:
+            corr = self.correlation(min_periods)
+            upper = np.triu_indices(len(self), k=1)
+            values = corr[upper]
+            valid = np.flatnonzero(~np.isnan(values))
+            k = min(k, len(valid))
+            # Selezione parziale delle k coppie migliori, poi ordinamento solo di quelle
+            top = valid[np.argpartition(values[valid], -k)[-k:]] if k else valid[:0]
+            top = top[np.argsort(values[top])[::-1]]
+            self._cache[key] = pd.DataFrame({
+                'distilleria_1': self.names[upper[0][top]],
+                'distilleria_2': self.names[upper[1][top]],
+                'correlazione': values[top],
+            })
+        return self._cache[key]
+
+    def top_by_volume(self, k):
+        """Posizioni delle k distillerie con il volume di trading totale più alto."""
+        totals = np.nansum(self.volumes, axis=0)
+        k = min(k, len(totals))
+        top = np.argpartition(totals, -k)[-k:] if k else np.array([], dtype=int)
+        return top[np.argsort(totals[top])[::-1]]
+
+    def select(self, positions):
+        """Matrici ristrette alle distillerie nelle posizioni indicate (stessi mesi)."""
+        return MarketAnalytics(
+            dates=self.dates, slugs=self.slugs[positions], names=self.names[positions],
+            prices=self.prices[:, positions], volumes=self.volumes[:, positions],
+            returns=self.returns[:, positions],
+        )
+
+    def by_volume(self, k):
+        """
+        Matrici delle k distillerie con il volume di trading più alto, in ordine decrescente.
+
+        Correlazioni e coppie più correlate calcolate sul risultato costano
+        k × k invece di distillerie × distillerie. Il risultato viene memorizzato.
+
+        Args:
+            k (int): Numero di distillerie
+
+        Returns:
+            MarketAnalytics: Matrici ristrette
+        """
+        key = ('by_volume', k)
+        if key not in self._cache:
+            self._cache[key] = self.select(self.top_by_volume(k))
+        return self._cache[key]
+
+
+def compute_market_analytics(df_data, dates=None):
+    """
+    Costruisce le matrici mensili dt × slug di prezzi, volumi e rendimenti.
+
+    Args:
+        df_data (pandas.DataFrame): Dati storici combinati (colonne dt, slug, name,
+            winning_bid_mean, trading_volume)
+        dates (numpy.ndarray): Mesi delle righe delle matrici, in ordine crescente
+            (di default quelli presenti in df_data); servono quando df_data contiene
+            solo alcune distillerie ma i rendimenti vanno calcolati sui mesi di tutto il mercato
+
+    Returns:
+        MarketAnalytics: Matrici del mercato (vuote se non ci sono dati)
+    """
+    if df_data.empty:
+        empty = np.empty((0, 0))
+        return MarketAnalytics(
+            dates=np.array([], dtype='datetime64[ns]'), slugs=np.array([], dtype=object),
+            names=np.array([], dtype=object), prices=empty, volumes=empty, returns=empty,
+        )
+
+    if dates is None:
+        dates, rows = np.unique(df_data['dt'].to_numpy(), return_inverse=True)
+    else:
+        dates = np.asarray(dates, dtype=df_data['dt'].to_numpy().dtype)
+        rows = np.searchsorted(dates, df_data['dt'].to_numpy())
+    columns, slugs = pd.factorize(df_data['slug'], sort=True)
+    slugs = np.asarray(slugs, dtype=object)
+    # Il nome di ogni slug dalla sua prima riga
+    first = np.unique(columns, return_index=True)[1]
+    names = np.asarray(df_data['name'].to_numpy()[first], dtype=object)
+
+    shape = (len(dates), len(slugs))
+    prices = np.full(shape, np.nan)
+    prices[rows, columns] = df_data['winning_bid_mean'].to_numpy(dtype='float64', na_value=np.nan)
+    volumes = np.full(shape, np.nan)
+    volumes[rows, columns] = df_data['trading_volume'].to_numpy(dtype='float64', na_value=np.nan)
+
+    returns = np.full(shape, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns[1:] = prices[1:] / prices[:-1] - 1.0
+    returns[~np.isfinite(returns)] = np.nan
+
+    return MarketAnalytics(dates=dates, slugs=slugs, names=names, prices=prices, volumes=volumes, returns=returns)
@@ -1,9 +1,38 @@
+import math
+import os
+import time
+from contextlib import contextmanager
+
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import numpy as np
-from data_loader import build_combined_dataframe, load_distilleries_info
+import figures
+import metrics
+from downsampling import PERIODS, resample_period
+from rankings import ranking_html
+from filters import Filters
+
+# Secondi tra un aggiornamento automatico dei dati e il successivo
+REFRESH_INTERVAL = float(os.environ.get("WHISKY_REFRESH_INTERVAL", 6 * 3600))
+
+# Numero massimo di punti per traccia nei grafici temporali (0 per mostrarli tutti)
+MAX_POINTS = int(os.environ.get("WHISKY_MAX_POINTS", 300))
+
+# Lunghezze disponibili per le classifiche
+RANKING_SIZES = [10, 50, "Tutte"]
+
+# Finestra in mesi di media e volatilità mobili nella pagina di mercato
+ROLLING_WINDOW = 12
+
+# Pagina di diagnostica: visibile solo se il server è avviato con WHISKY_DIAGNOSTICS=1
+DIAGNOSTICS = os.environ.get("WHISKY_DIAGNOSTICS") == "1"
+
+# Cartella di uno snapshot offline (vedi "python data_loader.py export"): se
+# indicata, l'app parte dallo snapshot senza accedere alla rete
+SNAPSHOT_PATH = os.environ.get("WHISKY_SNAPSHOT")
+
+# Database SQLite (vedi "python data_loader.py db"): se indicato, gli storici
+# restano nel database e le pagine li leggono con query
+DATABASE_PATH = os.environ.get("WHISKY_DATABASE")
 
 # Configurazione della pagina
 st.set_page_config(
@@ -33,26 +62,162 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Funzione per generare un gradiente di colori
+# (interpolazione lineare tra due colori esadecimali "#rrggbb", senza matplotlib)
 def color_gradient(start_color, end_color, n):
-    import matplotlib.colors as mcolors
-    return [mcolors.to_hex(c) for c in mcolors.LinearSegmentedColormap.from_list("", [start_color, end_color])(np.linspace(0, 1, n))]
+    start = [int(start_color.lstrip("#")[i:i + 2], 16) for i in (0, 2, 4)]
+    end = [int(end_color.lstrip("#")[i:i + 2], 16) for i in (0, 2, 4)]
+    steps = max(n - 1, 1)
+    return [
+        "#" + "".join(f"{round(a + (b - a) * k / steps):02x}" for a, b in zip(start, end))
+        for k in range(n)
+    ]
         
 
-# Funzione per caricare i dati
-@st.cache_data
-def load_data(top_n=50):
+# Funzione per caricare i dati: all'avvio solo l'elenco delle distillerie,
+# gli storici vengono scaricati alla prima selezione (o precaricati in background).
+# La risorsa è condivisa da tutte le sessioni senza copie: i DataFrame dei
+# risultati sono in sola lettura (vedi dataset.DatasetResult)
+@st.cache_resource
+def load_data(lazy=True, prefetch=50):
+    # Eseguita solo quando la risorsa non è in cache
+    metrics.incr("load_data.miss")
+    # Import rinviato: dataset porta con sé data_loader, requests e il client HTTP
+    from dataset import WhiskyDataset
+
+    if DATABASE_PATH:
+        return WhiskyDataset.from_database(DATABASE_PATH)
+    if SNAPSHOT_PATH:
+        return WhiskyDataset.from_snapshot(SNAPSHOT_PATH)
+    # Il precaricamento parte dopo la prima pagina mostrata (store.mark_first_paint)
+    store = WhiskyDataset(top_n=None, lazy=lazy, prefetch=prefetch, defer_prefetch=True)
     with st.spinner(f"Caricamento dei dati in corso..."):
-        df_info = load_distilleries_info()
-        if df_info.empty:
-            st.error("Impossibile caricare i dati delle distillerie. Verifica la connessione e riprova.")
-            return pd.DataFrame(), pd.DataFrame()
-        df_data = build_combined_dataframe(top_n=top_n)
-    return df_info, df_data
+        store.load()
+    return store
+
+# Grafici già costruiti, condivisi tra le sessioni
+@st.cache_resource
+def get_figure_cache():
+    return figures.FigureCache()
+
+# Mostra un grafico riusando quello in cache per la stessa chiave
+# (pagina, grafico, selezione, versione dei dati)
+def show_figure(key, builder, **kwargs):
+    cache = get_figure_cache()
+    fig = cache.get_or_build(key, builder)
+    start = time.perf_counter()
+    st.plotly_chart(fig, **kwargs)
+    cache.record_render(key, time.perf_counter() - start)
+
+# Misura il tempo di calcolo di una sezione della pagina nel rerun corrente:
+# le sezioni nascoste non vengono eseguite e quindi non compaiono
+@contextmanager
+def timed_section(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        st.session_state.setdefault("section_timings", {})[name] = elapsed
+        metrics.record(f"section:{name}", elapsed)
+
+# Tempi delle sezioni calcolate nell'ultimo rerun
+def show_section_timings():
+    timings = st.session_state.get("section_timings", {})
+    with st.expander("⏱️ Tempi delle sezioni"):
+        for name, seconds in timings.items():
+            st.caption(f"{name}: {seconds * 1000:.1f} ms")
+        if not timings:
+            st.caption("Nessuna sezione calcolata")
+
+# Aggiornamento periodico in background, uno per dataset: store_id (id(store))
+# fa parte della chiave della cache, così un nuovo dataset restituito da
+# load_data (ad esempio dopo st.cache_resource.clear()) ottiene il proprio
+# refresher invece di quello legato al dataset precedente
+@st.cache_resource
+def start_refresher(store_id, _store, interval=REFRESH_INTERVAL):
+    from refresher import Refresher
+
+    return Refresher(_store, interval=interval).start()
+
+# Pannello con lo stato dell'aggiornamento automatico dei dati
+def show_refresh_status(refresher):
+    status = refresher.status
+    with st.expander("🔄 Stato aggiornamento dati"):
+        if status['last_refresh']:
+            last = time.strftime("%d/%m/%Y %H:%M", time.localtime(status['last_refresh']))
+            st.caption(f"Ultimo aggiornamento: {last} ({status['last_duration']:.1f} s)")
+        else:
+            st.caption("Nessun aggiornamento dall'avvio")
+        if status['next_run']:
+            st.caption(f"Prossimo aggiornamento: {time.strftime('%d/%m/%Y %H:%M', time.localtime(status['next_run']))}")
+        st.caption(f"Errori: {status['total_failures']} (consecutivi: {status['consecutive_failures']})")
+        if status['last_error']:
+            st.caption(f"Ultimo errore: {status['last_error']}")
+
+# Avviso sulla disponibilità dei dati di dettaglio
+def show_history_notice(store):
+    dataset = store.result
+    if store.offline:
+        # Offline non viene scaricato nulla: si segnala solo se mancano degli storici
+        if len(dataset.index) < len(dataset.info):
+            source = "nel database" if DATABASE_PATH else "nello snapshot"
+            st.info(f"ℹ️ Dati di dettaglio presenti {source} per {len(dataset.index)} distillerie su {len(dataset.info)}: le altre non sono disponibili offline.")
+    elif store.lazy:
+        st.info(f"ℹ️ Dati di dettaglio caricati per {len(dataset.index)} distillerie su {len(dataset.info)}: le altre vengono scaricate alla prima selezione.")
+    else:
+        st.warning(f"⚠️ I dati di dettaglio sono disponibili solo per {len(dataset.index)} distillerie tra quelle con rating più alto.")
+
+# Avanzamento del precaricamento degli storici: finché è in corso il frammento
+# si aggiorna da solo e, quando arrivano nuovi dati, ridisegna l'intera pagina
+def show_loading_progress(store):
+    polling = store.loading
+
+    @st.fragment(run_every=1.0 if polling else None)
+    def progress():
+        if store.version != st.session_state.get("data_version") or (polling and not store.loading):
+            st.rerun()
+        done, total = store.progress
+        if store.loading:
+            st.progress(done / total if total else 0.0, text=f"Caricamento storici: {done}/{total} distillerie")
+        elif "complete" in store.timings:
+            first_paint = store.timings.get("first_paint", 0.0)
+            st.caption(f"Dati pronti in {store.timings['complete']:.1f} s (prima visualizzazione in {first_paint:.1f} s)")
+
+    progress()
+
+# Opzioni dei menu di selezione: in modalità lazy tutte le distillerie
+def distillery_options(store, dataset):
+    index = dataset.index
+    return index.all_names if store.lazy else index.available_names
+
+# Filtri globali nella sidebar: periodo, paesi e rating minimo
+def show_filters(dataset):
+    filter_index = dataset.filter_index
+    start = end = min_rating = None
+    with st.expander("🔎 Filtri"):
+        if filter_index.date_range:
+            first, last = (date.date() for date in filter_index.date_range)
+            if first < last:
+                period = st.slider("Periodo:", min_value=first, max_value=last, value=(first, last), format="MM/YYYY")
+                if period != (first, last):
+                    start, end = (pd.Timestamp(date) for date in period)
+        countries = st.multiselect("Paesi:", options=filter_index.countries, placeholder="Tutti i paesi")
+        if filter_index.rating_range:
+            low, high = (float(math.floor(filter_index.rating_range[0])), float(math.ceil(filter_index.rating_range[1])))
+            if low < high:
+                rating = st.slider("Rating minimo:", min_value=low, max_value=high, value=low, step=0.5)
+                if rating > low:
+                    min_rating = rating
+    return Filters(start=start, end=end, countries=tuple(sorted(countries)), min_rating=min_rating)
     
 
 # Funzione per visualizzare la pagina principale con overview
-def show_overview(df_info, df_data):
+def show_overview(dataset):
+    df_info, aggregates = dataset.info, dataset.aggregates
     st.title("🥃 Panoramica del Mercato del Whisky")
+    if df_info.empty:
+        st.warning("Nessuna distilleria corrisponde ai filtri selezionati.")
+        return
     # Layout a colonne per le metriche principali
     col1, col2, col3 = st.columns(3)
     
@@ -64,8 +229,8 @@ def show_overview(df_info, df_data):
     
     with col2:
         st.markdown("<div class='stat-box'>", unsafe_allow_html=True)
-        if not df_info.empty and "whiskybase_rating" in df_info.columns:
-            avg_rating = df_info["whiskybase_rating"].astype(float).mean()
+        if "whiskybase_rating" in aggregates.means:
+            avg_rating = aggregates.means["whiskybase_rating"]
             st.metric("Rating Medio", f"{avg_rating:.2f}/100")
         else:
             st.metric("Rating Medio", "N/A")
@@ -73,8 +238,8 @@ def show_overview(df_info, df_data):
 
     with col3:
         st.markdown("<div class='stat-box'>", unsafe_allow_html=True)
-        if not df_info.empty and "whiskybase_votes" in df_info.columns:
-            avg_votes = df_info["whiskybase_votes"].astype(int).mean()
+        if "whiskybase_votes" in aggregates.means:
+            avg_votes = aggregates.means["whiskybase_votes"]
             st.metric("Numero medio di voti", f"{avg_votes:.0f}")
         else:
             st.metric("Numero medio di voti", "N/A")
@@ -82,61 +247,55 @@ def show_overview(df_info, df_data):
     
     st.markdown("---")
     
-    # Distribuzione per paese
-    st.subheader("🌍 Distribuzione Distillerie per Paese")
-    country_counts = df_info["country"].value_counts().reset_index()
-    country_counts.columns = ["country", "count"]
-
-    fig = px.pie(
-        country_counts, 
-        values="count", 
-        names="country", 
-        hole=0.4
-    )
-
-    fig.update_layout(
-    showlegend=False
-    )
-
-    fig.update_traces(
-        textfont_size=16,
-        textposition='outside',
-        textinfo='percent+label',
-        pull=[0.05]*len(country_counts)
-    )
+    # Le schede rieseguono la pagina al cambio: solo quella aperta viene calcolata
+    tab1, tab2 = st.tabs(["🌍 Paesi", "📌 Statistiche"], key="overview_tab", on_change="rerun")
 
-    st.plotly_chart(fig)
+    # Distribuzione per paese
+    if tab1.open:
+        with tab1, timed_section("Panoramica / Paesi"):
+            st.subheader("🌍 Distribuzione Distillerie per Paese")
+            country_counts = aggregates.country_counts
+
+            show_figure(
+                ("overview", "country_pie", dataset.key),
+                lambda: figures.country_pie(country_counts),
+            )
         
     # Rating vs Numero di Whisky
-    st.subheader("📌 Statistiche e Boxplot")
-    # Per colonne numeriche, mostra statistiche
-    numeric_cols = df_info.select_dtypes(include=['float64', 'int64']).columns.tolist()
-    if numeric_cols:
-        stats_col = st.selectbox("Seleziona una colonna per l'analisi:", options=numeric_cols)
-        stats = df_info[stats_col].describe()
-        
-        # Visualizza le statistiche in una tabella formattata
-        st.subheader(f"Statistiche di {stats_col}")
-        stats_df = pd.DataFrame(stats).transpose()
-        st.dataframe(stats_df, use_container_width=True)
-        
-        # Crea un box plot
-        fig = px.box(df_info, y=stats_col, 
-                title=f"Box Plot di {stats_col}",
-                color_discrete_sequence=['#3CB44B'])
-        st.plotly_chart(fig, use_container_width=True)
+    if tab2.open:
+        with tab2, timed_section("Panoramica / Statistiche"):
+            st.subheader("📌 Statistiche e Boxplot")
+            # Per colonne numeriche, mostra statistiche
+            numeric_cols = aggregates.info_numeric_columns
+            if numeric_cols:
+                stats_col = st.selectbox("Seleziona una colonna per l'analisi:", options=numeric_cols)
+                stats = aggregates.info_describe[stats_col]
+                
+                # Visualizza le statistiche in una tabella formattata
+                st.subheader(f"Statistiche di {stats_col}")
+                stats_df = pd.DataFrame(stats).transpose()
+                st.dataframe(stats_df, use_container_width=True)
+                
+                # Crea un box plot
+                show_figure(
+                    ("overview", "box", stats_col, dataset.key),
+                    lambda: figures.info_box_plot(df_info, stats_col),
+                    use_container_width=True,
+                )
 
 # Funzione per visualizzare l'analisi di una singola distilleria
-def show_distillery_analysis(df_info, df_data):
+def show_distillery_analysis(store, filters):
+    dataset = store.result.filtered(filters)
+    index, aggregates = dataset.index, dataset.aggregates
     st.title("📈 Analisi Distillerie")
-    st.warning(f"⚠️ I dati di dettaglio sono disponibili solo per {len(df_data['slug'].unique())} distillerie tra quelle con rating più alto.")
+    show_history_notice(store)
 
     col1, col2 = st.columns(2)
 
     with col1:
         st.markdown("<div class='stat-box'>", unsafe_allow_html=True)
-        if not df_data.empty and "winning_bid_mean" in df_data.columns:
-            avg_price = df_data["winning_bid_mean"].mean()
+        if "winning_bid_mean" in aggregates.means:
+            avg_price = aggregates.means["winning_bid_mean"]
             st.metric("Prezzo Medio", f"GBP (£) {avg_price:.2f}")
         else:
             st.metric("Prezzo Medio", "N/A")
@@ -144,8 +303,8 @@ def show_distillery_analysis(df_info, df_data):
     
     with col2:
         st.markdown("<div class='stat-box'>", unsafe_allow_html=True)
-        if not df_data.empty and "trading_volume" in df_data.columns:
-            avg_vol = df_data['trading_volume'].mean()
+        if "trading_volume" in aggregates.means:
+            avg_vol = aggregates.means["trading_volume"]
             st.metric("Trading Volume Medio", f"GBP (£) {avg_vol:.2f}")
         else:
             st.metric("Prezzo Medio Aste", "N/A")
@@ -153,29 +312,31 @@ def show_distillery_analysis(df_info, df_data):
    
     st.markdown("---")
     
-    # Ottieni solo le distillerie per cui abbiamo estratto i dati
-    available_slugs = df_data['slug'].unique()
-    available_distilleries = df_info[df_info['slug'].isin(available_slugs)].sort_values(by='name')
-    
     # Selezione distilleria
+    options = distillery_options(store, dataset)
+    if not options:
+        st.warning("Nessuna distilleria corrisponde ai filtri selezionati.")
+        return
     selected_distillery = st.selectbox(
         "Seleziona una distilleria:",
-        options=available_distilleries['name'].tolist(),
+        options=options,
         index=0
     )
     
-    # Ottieni lo slug della distilleria selezionata
-    slug = available_distilleries[available_distilleries['name'] == selected_distillery]['slug'].iloc[0]
-    
-    # Filtra i dati per la distilleria selezionata
-    distillery_data = df_data[df_data['slug'] == slug]
+    # Ottieni lo slug della distilleria selezionata e, se serve, scarica lo storico
+    slug = index.slug_for(selected_distillery)
+    if not store.is_requested(slug):
+        with st.spinner(f"Caricamento dei dati di {selected_distillery}..."):
+            dataset = store.ensure_loaded([slug]).filtered(filters)
+            index = dataset.index
+    distillery_data = index.history_for(slug)
     
     if distillery_data.empty:
         st.warning(f"Non ci sono dati disponibili per {selected_distillery}.")
         return
     
     # Informazioni sulla distilleria
-    info = df_info[df_info['slug'] == slug].iloc[0]
+    info = index.info_for(slug)
     
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -185,61 +346,31 @@ def show_distillery_analysis(df_info, df_data):
     with col3:
         st.metric("Numero di Whisky", int(info['whiskybase_whiskies']))
     
-    # Trend prezzo medio
-    fig = px.line(
-        distillery_data,
-        x='dt',
-        y='winning_bid_mean',
-        markers=True,
-        labels={
-            'dt': 'Data',
-            'winning_bid_mean': 'Prezzo Medio (£ GBP)'},
-            title=f"📈 Trend Prezzo Medio di {selected_distillery}")
-
-    # Miglioramenti estetici
-    fig.update_layout(
-        title={'x': 0.1, 'font': {'size': 26}},
-        xaxis_title='Data',
-        yaxis_title='Prezzo Medio (£ GBP)',
-        template='plotly_white',  # stile bianco pulito
-        xaxis_tickangle=45,
-        margin=dict(l=40, r=40, t=80, b=40),
-        hovermode="x unified")
-    st.plotly_chart(fig, use_container_width=True)
-    
-    # Volume di trading
-    fig = px.bar(
-    distillery_data,
-    x='dt',
-    y='trading_volume',
-    labels={
-        'dt': 'Data',
-        'trading_volume': 'Volume (£ GBP)'},
-        title=f"📊 Volume di Trading di {selected_distillery}")
-
-    # Miglioramenti estetici
-    fig.update_layout(
-        title={'x': 0.1, 'font': {'size': 26}},
-        xaxis_title='Data',
-        yaxis_title='Volume (£ GBP)',
-        template='plotly_white',  # stile bianco pulito
-        xaxis_tickangle=45,
-        margin=dict(l=40, r=40, t=80, b=40),
-        hovermode="x unified")
-    st.plotly_chart(fig, use_container_width=True)
+    # Trend prezzo medio e volume di trading, aggregati per il periodo scelto
+    period = st.radio("Aggregazione temporale:", options=list(PERIODS), horizontal=True)
+    selection = (slug, period, MAX_POINTS, dataset.key)
+    with timed_section("Analisi / Grafici"):
+        show_figure(
+            ("analysis", "price") + selection,
+            lambda: figures.price_trend(resample_period(distillery_data, period), selected_distillery, MAX_POINTS),
+            use_container_width=True,
+        )
+        show_figure(
+            ("analysis", "volume") + selection,
+            lambda: figures.volume_bars(resample_period(distillery_data, period), selected_distillery, MAX_POINTS),
+            use_container_width=True,
+        )
 
 # Funzione per visualizzare il confronto tra distillerie
-def show_distillery_comparison(df_info, df_data):
+def show_distillery_comparison(store, filters):
+    dataset = store.result.filtered(filters)
+    index = dataset.index
     st.title("🔄 Confronto tra Distillerie")
-    st.warning(f"⚠️ I dati di dettaglio sono disponibili solo per {len(df_data['slug'].unique())} distillerie tra quelle con rating più alto.")
-    
-    # Ottieni solo le distillerie per cui abbiamo estratto i dati
-    available_slugs = df_data['slug'].unique()
-    available_distilleries = df_info[df_info['slug'].isin(available_slugs)].sort_values(by='name')
+    show_history_notice(store)
     
-    # Selezione multiple di distillerie
-    all_distilleries = available_distilleries['name'].tolist()
-    default_selections = all_distilleries[:3] if len(all_distilleries) >= 3 else all_distilleries
+    # Selezione multiple di distillerie (di default tra quelle con dati già caricati)
+    all_distilleries = distillery_options(store, dataset)
+    default_selections = (index.available_names or all_distilleries)[:3]
     selected_distilleries = st.multiselect(
         "Seleziona le distillerie da confrontare:",
         options=all_distilleries,
@@ -249,14 +380,19 @@ def show_distillery_comparison(df_info, df_data):
     if not selected_distilleries:
         st.warning("Seleziona almeno una distilleria per visualizzare il confronto.")
         return
-      # Ottieni gli slug delle distillerie selezionate
-    selected_slugs = available_distilleries[available_distilleries['name'].isin(selected_distilleries)]['slug'].tolist()
+    # Ottieni gli slug delle distillerie selezionate (nell'ordine del menu)
+    selected = set(selected_distilleries)
+    selected_slugs = [index.slug_for(name) for name in all_distilleries if name in selected]
+    if not all(store.is_requested(slug) for slug in selected_slugs):
+        with st.spinner("Caricamento dei dati delle distillerie selezionate..."):
+            dataset = store.ensure_loaded(selected_slugs).filtered(filters)
+            index = dataset.index
     
     # Prepara i dati per il grafico
     compare_data = []
     for slug in selected_slugs:
-        name = df_info[df_info['slug'] == slug]['name'].iloc[0]
-        distillery_data = df_data[df_data['slug'] == slug]
+        name = index.info_for(slug)['name']
+        distillery_data = index.history_for(slug)
         if not distillery_data.empty:
             compare_data.append((name, distillery_data))
 
@@ -264,226 +400,253 @@ def show_distillery_comparison(df_info, df_data):
         st.warning("Non ci sono dati disponibili per le distillerie selezionate.")
         return
 
-    # Crea il grafico con Plotly
-    fig = go.Figure()
-
-    for name, data in compare_data:
-        fig.add_trace(
-            go.Scatter(
-                x=data['dt'], 
-                y=data['winning_bid_mean'], 
-                mode='lines+markers',
-                name=name
+    # Grafici con Plotly: andamento (aggregato per il periodo scelto) e
+    # distribuzione (sempre sui dati mensili) di prezzo, lotti e volume
+    period = st.radio("Aggregazione temporale:", options=list(PERIODS), horizontal=True)
+    selection = (tuple(selected_slugs), MAX_POINTS, dataset.key)
+
+    def trend(column, title):
+        period_data = [(name, resample_period(data, period)) for name, data in compare_data]
+        return figures.comparison_lines(period_data, column, title, 'Prezzo Medio (£ GBP)', MAX_POINTS)
+
+    def distribution(column, title):
+        return figures.comparison_boxes(compare_data, column, title, 'Prezzo Medio (£ GBP)')
+
+    charts = [
+        (("price", period), trend, 'winning_bid_mean', "📈 Trend Prezzo Medio"),
+        (("price_box",), distribution, 'winning_bid_mean', "📊 Boxplot Prezzo Medio"),
+        (("lots", period), trend, 'lots_count', "📈 Trend Numero di Lotti"),
+        (("volume_box",), distribution, 'trading_volume', "📊 Boxplot Trading Volume"),
+    ]
+    with timed_section("Confronto / Grafici"):
+        for name, builder, column, title in charts:
+            show_figure(
+                ("comparison",) + name + selection,
+                lambda: builder(column, title),
+                use_container_width=True,
             )
-        )
 
-    fig.update_layout(
-        title={'text': "📈 Trend Prezzo Medio", 'x': 0.1, 'font': {'size': 26}},
-        xaxis_title='Data',
-        yaxis_title='Prezzo Medio (£ GBP)',
-        template='plotly_white',
-        xaxis_tickangle=45,
-        margin=dict(l=40, r=40, t=80, b=40),
-        hovermode="x unified",
-        legend_title_text="Distilleria",
-    )
+# Funzione per visualizzare il ranking delle distillerie
+def show_rankings(dataset):
+    aggregates = dataset.aggregates
+    st.title("🏆 Classifiche")
 
-    st.plotly_chart(fig, use_container_width=True)
+    # Numero di distillerie per classifica: ogni scheda resta un unico elemento
+    top_n = st.radio("Distillerie in classifica:", options=RANKING_SIZES, horizontal=True)
+    k = None if top_n == "Tutte" else top_n
+    label = "Tutte le" if k is None else f"Top {k}"
     
-    # Visualizzazione boxplot
-    # Colori coerenti con plotly (puoi anche personalizzarli)
-    color_sequence = px.colors.qualitative.Plotly
-
-    # Crea il boxplot
-    fig = go.Figure()
-
-    for idx, (name, data) in enumerate(compare_data):
-        fig.add_trace(
-            go.Box(
-                y=data['winning_bid_mean'],
-                name=name,
-                marker_color=color_sequence[idx % len(color_sequence)],
-                boxmean=True,  # Mostra anche la media
-                boxpoints='outliers'  # Mostra solo gli outlier
-            )
-        )
-
-    fig.update_layout(
-        title={'text': "📊 Boxplot Prezzo Medio", 'x': 0.1, 'font': {'size': 26}},
-        yaxis_title='Prezzo Medio (£ GBP)',
-        xaxis_title='Distilleria',
-        template='plotly_white',
-        margin=dict(l=40, r=40, t=80, b=50),
-        boxmode='group'
+    tab1, tab2, tab3 = st.tabs(
+        ["Rating", "Prezzo Medio", "Volume di Trading"], key="rankings_tab", on_change="rerun"
     )
-
-    st.plotly_chart(fig, use_container_width=True)
-
-    # Crea il grafico con Plotly
-    fig = go.Figure()
-
-    for name, data in compare_data:
-        fig.add_trace(
-            go.Scatter(
-                x=data['dt'], 
-                y=data['lots_count'], 
-                mode='lines+markers',
-                name=name
+    
+    # Tab 1: Top distillerie per rating
+    if tab1.open:
+        with tab1, timed_section("Classifiche / Rating"):
+            st.subheader(f"⭐ {label} Distillerie per Rating")
+            top_rating = aggregates.top_rating.head(k) if k else aggregates.top_rating
+            st.markdown(
+                ranking_html(top_rating, 'whiskybase_rating', colore_barra="#1F77B4", colore_sfondo="#E8F6F3"),
+                unsafe_allow_html=True,
             )
-        )
 
-    fig.update_layout(
-        title={'text': "📈 Trend Numero di Lotti", 'x': 0.1, 'font': {'size': 26}},
-        xaxis_title='Data',
-        yaxis_title='Prezzo Medio (£ GBP)',
-        template='plotly_white',
-        xaxis_tickangle=45,
-        margin=dict(l=40, r=40, t=80, b=40),
-        hovermode="x unified",
-        legend_title_text="Distilleria",
-    )
+    # Tab 2: Top distillerie per prezzo medio
+    if tab2.open:
+        with tab2, timed_section("Classifiche / Prezzo Medio"):
+            st.subheader(f"💰 {label} Distillerie per Prezzo Medio")
+            st.caption(f"Calcolata sulle {len(dataset.index)} distillerie con dati storici caricati.")
+            top_prices = aggregates.top_distilleries('winning_bid_mean_mean', k=k)
+            st.markdown(
+                ranking_html(top_prices, 'winning_bid_mean_mean', colore_barra="#F4D03F", colore_sfondo="#FEF9E7", unità="£"),
+                unsafe_allow_html=True,
+            )
 
-    st.plotly_chart(fig, use_container_width=True)
+    # Tab 3: Top distillerie per volume di trading
+    if tab3.open:
+        with tab3, timed_section("Classifiche / Volume di Trading"):
+            st.subheader(f"📊 {label} Distillerie per Volume di Trading")
+            st.caption(f"Calcolata sulle {len(dataset.index)} distillerie con dati storici caricati.")
+            top_volume = aggregates.top_distilleries('trading_volume_sum', k=k)
+            st.markdown(
+                ranking_html(top_volume, 'trading_volume_sum', colore_barra="#E74C3C", colore_sfondo="#FDEDEC", unità="£"),
+                unsafe_allow_html=True,
+            )
 
-    # Crea un secondo boxplot per il trading volume
-    fig = go.Figure()
+# Funzione per visualizzare l'analisi dell'intero mercato
+def show_market(store, dataset):
+    st.title("🌐 Analisi di Mercato")
+    show_history_notice(store)
 
-    for idx, (name, data) in enumerate(compare_data):
-        fig.add_trace(
-            go.Box(
-                y=data['trading_volume'],
-                name=name,
-                marker_color=color_sequence[idx % len(color_sequence)],
-                boxmean=True,  # Mostra anche la media
-                boxpoints='outliers'  # Mostra solo gli outlier
-            )
-        )
+    market = dataset.analytics
+    if not len(market):
+        st.warning("Non ci sono dati storici disponibili.")
+        return
 
-    fig.update_layout(
-        title={'text': "📊 Boxplot Trading Volume", 'x': 0.1, 'font': {'size': 26}},
-        yaxis_title='Prezzo Medio (£ GBP)',
-        xaxis_title='Distilleria',
-        template='plotly_white',
-        margin=dict(l=40, r=40, t=80, b=50),
-        boxmode='group'
+    weighting = st.radio(
+        "Ponderazione dei rendimenti:", options=['equal', 'volume'], horizontal=True,
+        format_func={'equal': "Uguale per ogni distilleria", 'volume': "Per volume di trading"}.get,
     )
+    with timed_section("Mercato / Indice"):
+        market_index = market.market_index(weighting)
+        last = market_index['index'].iloc[-1]
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Distillerie nell'indice", len(market))
+        with col2:
+            st.metric("Mesi", len(market_index))
+        with col3:
+            change = last / market_index['index'].iloc[-13] - 1 if len(market_index) > 12 else None
+            st.metric("Indice", f"{last:.1f}", delta=f"{change:+.1%} in 12 mesi" if change is not None else None)
+
+        show_figure(
+            ("market", "index", weighting, dataset.key),
+            lambda: figures.market_index_chart(market_index, "📈 Indice del Mercato"),
+            use_container_width=True,
+        )
 
-    st.plotly_chart(fig, use_container_width=True)
-
-# Funzione per visualizzare il ranking delle distillerie
-def show_rankings(df_info, df_data):
-    st.title("🏆 Classifiche")
-    
-    tab1, tab2, tab3 = st.tabs(["Rating", "Prezzo Medio", "Volume di Trading"])
-    
-    # Funzione comune per generare i box
-    def create_bar(distilleria, valore, valore_massimo, colore_barra, colore_sfondo, simbolo_medaglia="", unità=""):
-        bar_width = (valore / valore_massimo) * 100
-
-        st.markdown(
-            f"""
-            <div style='
-                background-color: {colore_sfondo};
-                border-radius: 8px;
-                padding: 8px 12px;
-                margin-bottom: 8px;
-                width: 100%;
-                box-shadow: 0 2px 6px rgba(0,0,0,0.1);
-                display: flex;
-                flex-direction: column;
-            '>
-                <div style='
-                    display: flex;
-                    justify-content: space-between;
-                    align-items: center;
-                    margin-bottom: 4px;
-                    font-weight: bold;
-                    font-size: 16px;
-                    color: black;
-                '>
-                    <div style='text-align: left;'>{simbolo_medaglia} {distilleria}</div>
-                    <div style='text-align: right;'>{valore:.2f} {unità}</div>
-                </div>
-                <div style='
-                    background-color: {colore_barra};
-                    width: {bar_width}%;
-                    height: 20px;
-                    border-radius: 6px;
-                '></div>
-            </div>
-            """,
-            unsafe_allow_html=True
+    with timed_section("Mercato / Correlazioni"):
+        st.subheader("🔗 Correlazione dei rendimenti mensili")
+        size = len(market)
+        if size > 5:
+            size = st.slider("Distillerie nella heatmap (per volume di trading):", 5, min(100, size), min(30, size))
+        # Correlazioni solo tra le distillerie mostrate: k × k invece di tutte le coppie
+        top = market.by_volume(size)
+        show_figure(
+            ("market", "heatmap", size, dataset.key),
+            lambda: figures.correlation_heatmap(top.correlation(), top.names, "Correlazioni"),
+            use_container_width=True,
         )
-    
-    # Tab 1: Top distillerie per rating
-    with tab1:
-        st.subheader("⭐ Top 10 Distillerie per Rating")
-        top_rating = df_info.sort_values(by='whiskybase_rating', ascending=False).head(10)
-        max_rating = top_rating['whiskybase_rating'].max()
-        medals = ["🥇", "🥈", "🥉"]
-
-        for idx, (index, row) in enumerate(top_rating.iterrows()):
-            distilleria = row['name']
-            rating = row['whiskybase_rating']
-            medal = medals[idx] if idx < 3 else ""
-            create_bar(distilleria, rating, max_rating, colore_barra="#1F77B4", colore_sfondo="#E8F6F3", simbolo_medaglia=medal)
+        st.caption(f"Coppie più correlate tra le {len(top)} distillerie della heatmap")
+        st.dataframe(top.most_correlated(20), use_container_width=True, hide_index=True)
+
+    with timed_section("Mercato / Medie mobili"):
+        st.subheader(f"📉 Media e volatilità mobili ({ROLLING_WINDOW} mesi)")
+        names = dict(zip(top.slugs, top.names))
+        slug = st.selectbox("Distilleria:", options=list(top.slugs), format_func=names.get)
+        position = list(top.slugs).index(slug)
+        show_figure(
+            ("market", "rolling", slug, dataset.key),
+            lambda: figures.rolling_chart(
+                top.dates,
+                top.prices[:, position],
+                top.rolling_mean(ROLLING_WINDOW)[:, position],
+                top.rolling_volatility(ROLLING_WINDOW)[:, position],
+                names[slug],
+            ),
+            use_container_width=True,
+        )
+        st.caption("Media mobile del prezzo medio e deviazione standard mobile dei rendimenti mensili (asse destro)")
 
-    # Tab 2: Top distillerie per prezzo medio
-    with tab2:
-        st.subheader("💰 Top 10 Distillerie per Prezzo Medio")
-        avg_prices = df_data.groupby('name')['winning_bid_mean'].mean().reset_index()
-        top_prices = avg_prices.sort_values(by='winning_bid_mean', ascending=False).head(10)
-        max_price = top_prices['winning_bid_mean'].max()
-        medals = ["🥇", "🥈", "🥉"]
-
-        for idx, (index, row) in enumerate(top_prices.iterrows()):
-            distilleria = row['name']
-            prezzo_medio = row['winning_bid_mean']
-            medal = medals[idx] if idx < 3 else ""
-            create_bar(distilleria, prezzo_medio, max_price, colore_barra="#F4D03F", colore_sfondo="#FEF9E7", simbolo_medaglia=medal, unità="£")
+# Pagina nascosta con le metriche di prestazione del processo
+def show_diagnostics(store):
+    from http_client import get_fetch_report
 
-    # Tab 3: Top distillerie per volume di trading
-    with tab3:
-        st.subheader("📊 Top 10 Distillerie per Volume di Trading")
-        total_volume = df_data.groupby('name')['trading_volume'].sum().reset_index()
-        top_volume = total_volume.sort_values(by='trading_volume', ascending=False).head(10)
-        max_volume = top_volume['trading_volume'].max()
-        medals = ["🥇", "🥈", "🥉"]
-
-        for idx, (index, row) in enumerate(top_volume.iterrows()):
-            distilleria = row['name']
-            volume_totale = row['trading_volume']
-            medal = medals[idx] if idx < 3 else ""
-            create_bar(distilleria, volume_totale, max_volume, colore_barra="#E74C3C", colore_sfondo="#FDEDEC", simbolo_medaglia=medal, unità="£")
+    dataset = store.result
+    stats = dataset.stats
+    st.title("🩺 Diagnostica")
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Versione dati", dataset.version)
+    with col2:
+        st.metric("Righe storico", f"{stats.rows:,}")
+    with col3:
+        st.metric("Memoria storico", f"{stats.memory / 2**20:.1f} MB", delta=f"{(stats.memory - stats.memory_raw) / 2**20:.1f} MB", delta_color="inverse")
+    with col4:
+        counters = metrics.snapshot()['counters']
+        calls, misses = counters.get("load_data.calls", 0), counters.get("load_data.miss", 0)
+        st.metric("load_data in cache", f"{calls - misses}/{calls}")
+
+    st.subheader("Fasi")
+    st.dataframe(metrics.get_stage_report(), use_container_width=True, hide_index=True)
+
+    st.subheader("Contatori e valori istantanei")
+    snapshot = metrics.snapshot()
+    st.json({'counters': snapshot['counters'], 'gauges': snapshot['gauges'], 'timings': store.timings})
+
+    st.subheader("Richieste HTTP")
+    fetch_report = get_fetch_report()
+    if fetch_report.empty:
+        st.caption("Nessuna richiesta registrata")
+    else:
+        st.dataframe(fetch_report, use_container_width=True, hide_index=True)
+
+    st.subheader("Cache dei grafici")
+    figure_stats = get_figure_cache().stats
+    st.dataframe(pd.DataFrame.from_dict(figure_stats, orient='index'), use_container_width=True)
+
+    export = metrics.export_json(
+        dataset={
+            'version': dataset.version,
+            'stats': vars(stats),
+            'timings': store.timings,
+        },
+        figures=figure_stats,
+        fetches=fetch_report.to_dict(orient='records'),
+    )
+    st.download_button("⬇️ Esporta metriche (JSON)", export, file_name="whisky_metrics.json", mime="application/json")
 
 # App principale
 def main():
     # Carica i dati
-    df_info, df_data = load_data(top_n=50)
+    st.session_state["section_timings"] = {}
+    metrics.incr("load_data.calls")
+    store = load_data()
+    # La versione va letta prima del risultato: al peggio si fa un rerun in più
+    st.session_state["data_version"] = store.version
+    dataset = store.result
     
-    if df_info.empty:
+    if not dataset.ok:
+        # Non teniamo in cache un caricamento fallito
+        load_data.clear()
         st.error("Impossibile caricare i dati delle distillerie. Verifica la connessione e riprova.")
         return
     
     # Sidebar per la navigazione
     st.sidebar.title("🥃 Whisky Dashboard")
+    with st.sidebar:
+        show_loading_progress(store)
+        if store.offline and DATABASE_PATH:
+            st.caption(f"🗄️ Dati offline dal database `{DATABASE_PATH}`")
+        elif store.offline:
+            st.caption(f"📦 Dati offline dallo snapshot `{SNAPSHOT_PATH}`")
+        else:
+            show_refresh_status(start_refresher(id(store), store))
     
     # Menu di navigazione
+    pages = ["Panoramica", "Classifiche", "Analisi Distillerie", "Confronto Distillerie", "Analisi di Mercato"]
+    if DIAGNOSTICS:
+        pages.append("Diagnostica")
     menu = st.sidebar.radio(
         "Menu di Navigazione",
-        options=["Panoramica", "Classifiche", "Analisi Distillerie", "Confronto Distillerie"]
+        options=pages
     )
 
+    # Filtri comuni a tutte le pagine
+    with st.sidebar:
+        filters = show_filters(dataset)
+    with metrics.timed("filters"):
+        view = dataset.filtered(filters)
+    if filters.active:
+        st.sidebar.caption(f"Filtri attivi: {len(view.info)} distillerie su {len(dataset.info)}, {len(view.index)} con dati storici")
     
     # Visualizza la pagina selezionata
-    if menu == "Panoramica":
-        show_overview(df_info, df_data)
-    elif menu == "Analisi Distillerie":
-        show_distillery_analysis(df_info, df_data)
-    elif menu == "Confronto Distillerie":
-        show_distillery_comparison(df_info, df_data)
-    elif menu == "Classifiche":
-        show_rankings(df_info, df_data)
+    with metrics.timed(f"page:{menu}"):
+        if menu == "Panoramica":
+            show_overview(view)
+        elif menu == "Analisi Distillerie":
+            show_distillery_analysis(store, filters)
+        elif menu == "Confronto Distillerie":
+            show_distillery_comparison(store, filters)
+        elif menu == "Classifiche":
+            show_rankings(view)
+        elif menu == "Analisi di Mercato":
+            show_market(store, view)
+        elif menu == "Diagnostica":
+            show_diagnostics(store)
+    store.mark_first_paint()
+    with st.sidebar:
+        show_section_timings()
     
     # Footer
     st.sidebar.divider()
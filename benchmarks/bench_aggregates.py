@@ -0,0 +1,55 @@
+"""
+Costo per rerun delle classifiche e delle metriche: ricalcolo su df_info/df_data
+contro lettura degli aggregati precalcolati.
+
+Uso:
+    python -m benchmarks.bench_aggregates
+"""
+import timeit
+
+from aggregates import compute_aggregates
+from benchmarks.stub_api import generate_frames
+
+
+def recompute(df_info, df_data):
+    # Il lavoro che le pagine facevano a ogni rerun
+    df_info.sort_values(by='whiskybase_rating', ascending=False).head(10)
+    avg_prices = df_data.groupby('name')['winning_bid_mean'].mean().reset_index()
+    avg_prices.sort_values(by='winning_bid_mean', ascending=False).head(10)
+    total_volume = df_data.groupby('name')['trading_volume'].sum().reset_index()
+    total_volume.sort_values(by='trading_volume', ascending=False).head(10)
+    df_info["country"].value_counts().reset_index()
+    for col in df_info.select_dtypes(include=['float64', 'int64']).columns:
+        df_info[col].describe()
+    df_info["whiskybase_rating"].mean()
+    df_data["winning_bid_mean"].mean()
+    df_data["trading_volume"].mean()
+
+
+def precomputed(aggregates):
+    aggregates.top_rating.head(10)
+    aggregates.top_distilleries('winning_bid_mean_mean', k=10)
+    aggregates.top_distilleries('trading_volume_sum', k=10)
+    aggregates.country_counts
+    for col in aggregates.info_numeric_columns:
+        aggregates.info_describe[col]
+    aggregates.means
+
+
+def main():
+    repeat = 20
+    for n_distilleries in (50, 500, 2000):
+        df_info, df_data = generate_frames(n_distilleries, n_months=120)
+        build = timeit.timeit(lambda: compute_aggregates(df_info, df_data), number=1)
+        aggregates = compute_aggregates(df_info, df_data)
+        before = timeit.timeit(lambda: recompute(df_info, df_data), number=repeat) / repeat
+        after = timeit.timeit(lambda: precomputed(aggregates), number=repeat) / repeat
+        print(
+            f"righe={len(df_data):>7}: ricalcolo {before * 1000:7.2f} ms/rerun, "
+            f"precalcolati {after * 1000:5.2f} ms/rerun "
+            f"(calcolo aggregati {build * 1000:.0f} ms, una volta)"
+        )
+
+
+if __name__ == "__main__":
+    main()
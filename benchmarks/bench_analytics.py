@@ -0,0 +1,47 @@
+"""
+Costo delle analisi di mercato al crescere del numero di distillerie:
+pivot e correlazioni con pandas contro le matrici NumPy di analytics.py.
+
+Uso:
+    python -m benchmarks.bench_analytics
+"""
+import time
+
+from analytics import compute_market_analytics
+from benchmarks.stub_api import generate_frames
+
+
+def with_pandas(df_data):
+    prices = df_data.pivot_table(index='dt', columns='slug', values='winning_bid_mean', observed=True)
+    returns = prices.pct_change(fill_method=None)
+    returns.corr(min_periods=12)
+    returns.rolling(12, min_periods=3).std()
+    return returns.mean(axis=1).add(1).cumprod()
+
+
+def with_numpy(df_data):
+    market = compute_market_analytics(df_data)
+    market.correlation()
+    market.rolling_volatility()
+    return market.market_index()
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    for n_distilleries in (200, 1000, 3000):
+        _, df_data = generate_frames(n_distilleries, n_months=120)
+        pandas_seconds = timed(with_pandas, df_data)
+        numpy_seconds = timed(with_numpy, df_data)
+        print(
+            f"distillerie={n_distilleries:>5} righe={len(df_data):>7}: "
+            f"pandas {pandas_seconds * 1000:8.0f} ms, analytics {numpy_seconds * 1000:6.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Backend in memoria contro database SQLite (database.py): tempo di apertura,
+memoria occupata, classifiche, storico di una distilleria, filtri e analisi di mercato.
+
+Uso:
+    python -m benchmarks.bench_database
+"""
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.stub_api import generate_frames
+from data_loader import memory_usage_bytes, optimize_dtypes
+from database import WhiskyDatabase, load_database
+from dataset import DatasetResult
+from filters import Filters
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        for n_distilleries in (200, 1000, 3000):
+            df_info, df_data = generate_frames(n_distilleries, n_months=120)
+            df_data = optimize_dtypes(df_data)
+            path = os.path.join(directory, f"whisky-{n_distilleries}.db")
+            database = WhiskyDatabase(path)
+            database.write_info(df_info)
+            _, write = timed(lambda: database.write_history(df_data))
+            database.analyze()
+
+            memory, open_memory = timed(lambda: DatasetResult(info=df_info, history=df_data))
+            sqlite, open_sqlite = timed(lambda: load_database(path))
+            slug = df_info['slug'].iloc[0]
+            filters = Filters(start=pd.Timestamp('2018-01-01'), end=pd.Timestamp('2021-12-01'), min_rating=80.0)
+
+            print(f"righe={len(df_data):>7} ({os.path.getsize(path) / 2**20:.0f} MB su disco, scrittura {write:.1f} s)")
+            print(f"  apertura            memoria {open_memory * 1000:8.1f} ms ({memory_usage_bytes(df_data) / 2**20:.0f} MB di storico)"
+                  f"   SQLite {open_sqlite * 1000:8.1f} ms (storico non caricato)")
+            for label, call in [
+                ("top 10 per volume", lambda result: result.aggregates.top_distilleries('trading_volume_sum', 10)),
+                ("storico di uno slug", lambda result: result.index.history_for(slug)),
+                ("filtri", lambda result: result.filtered(filters)),
+                ("indice di mercato", lambda result: result.filtered(filters).analytics.market_index()),
+                ("heatmap 30", lambda result: result.filtered(filters).analytics.by_volume(30).correlation()),
+            ]:
+                _, in_memory = timed(lambda: call(memory))
+                _, in_sqlite = timed(lambda: call(sqlite))
+                print(f"  {label:<19} memoria {in_memory * 1000:8.1f} ms   SQLite {in_sqlite * 1000:8.1f} ms")
+            sqlite.database.close()
+            database.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Caricamento degli storici contro uno stub che inietta guasti (errori 500,
+risposte 429 con Retry-After e richieste appese), con il report per risorsa
+prodotto da http_client.
+
+Uso:
+    python -m benchmarks.bench_faults
+"""
+import time
+
+import data_loader
+import http_client
+from benchmarks.stub_api import StubAPI
+
+
+def main():
+    # Timeout brevi per rendere visibile il limite alla latenza di coda
+    http_client.READ_TIMEOUT = 1.0
+    http_client.BACKOFF_BASE = 0.1
+    data_loader.cache = None
+
+    stub = StubAPI(n_distilleries=200, n_months=60, latency=0.02,
+                   error_rate=0.1, throttle_rate=0.05, hang_rate=0.02, hang_seconds=30)
+    with stub:
+        data_loader.API_BASE_URL = stub.base_url
+        http_client.clear_fetch_report()
+        start = time.perf_counter()
+        df_data = data_loader.build_combined_dataframe(top_n=None, rate_limit=None)
+        elapsed = time.perf_counter() - start
+
+    report = http_client.get_fetch_report()
+    latency = report['latency']
+    print(f"Tempo totale: {elapsed:.2f}s, distillerie con dati: {df_data['slug'].nunique()}/{len(report) - 1}")
+    print(f"Latenza per risorsa: p50 {latency.quantile(0.5):.2f}s, p95 {latency.quantile(0.95):.2f}s, max {latency.max():.2f}s")
+    print(f"Tentativi: {report['attempts'].value_counts().sort_index().to_dict()}")
+    print(f"Esiti: {report['outcome'].value_counts().to_dict()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Confronta il caricamento seriale e quello concorrente di build_combined_dataframe
+contro lo stub locale dell'API.
+
+Uso:
+    python -m benchmarks.bench_fetch
+"""
+import time
+
+import pandas as pd
+
+import data_loader
+from benchmarks.stub_api import StubAPI
+
+
+def run(top_n, **kwargs):
+    start = time.perf_counter()
+    df_data = data_loader.build_combined_dataframe(top_n=top_n, **kwargs)
+    return df_data, time.perf_counter() - start
+
+
+def main():
+    with StubAPI(n_distilleries=400, n_months=60, latency=0.05) as stub:
+        data_loader.API_BASE_URL = stub.base_url
+        # Misuriamo la rete, non la cache su disco
+        data_loader.cache = None
+        for top_n in (50, 200, None):
+            # Comportamento precedente: una richiesta alla volta con pausa fissa
+            serial, serial_time = run(top_n, wait_time=0.1, max_workers=1)
+            concurrent, concurrent_time = run(top_n)
+            pd.testing.assert_frame_equal(serial, concurrent)
+            label = "all" if top_n is None else top_n
+            print(
+                f"top_n={label}: seriale {serial_time:.2f}s, "
+                f"concorrente {concurrent_time:.2f}s ({serial_time / concurrent_time:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
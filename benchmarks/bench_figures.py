@@ -0,0 +1,55 @@
+"""
+Dimensione e tempo di costruzione/serializzazione dei grafici temporali del
+confronto, con e senza riduzione dei punti (periodo e LTTB).
+
+Il tempo di disegno nel browser cresce con il numero di punti inviati: la
+dimensione del JSON del grafico ne è l'indicatore; il tempo misurato qui è
+quello di costruzione più serializzazione (to_json) lato server.
+
+Uso:
+    python -m benchmarks.bench_figures
+"""
+import time
+
+from benchmarks.stub_api import generate_frames
+from distillery_index import DistilleryIndex
+from downsampling import resample_period
+from figures import comparison_lines
+
+
+def measure(compare_data, period, max_points, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        period_data = [(name, resample_period(data, period)) for name, data in compare_data]
+        fig = comparison_lines(period_data, 'winning_bid_mean', "Trend", "Prezzo", max_points)
+        payload = fig.to_json()
+        best = min(best, time.perf_counter() - start)
+    points = sum(len(trace.x) for trace in fig.data)
+    return points, len(payload), best
+
+
+def main():
+    configurations = [
+        ("tutti i punti", 'Mensile', None),
+        ("LTTB 300", 'Mensile', 300),
+        ("LTTB 100", 'Mensile', 100),
+        ("trimestrale", 'Trimestrale', None),
+        ("annuale", 'Annuale', None),
+    ]
+    for n_months in (120, 600):
+        df_info, df_data = generate_frames(20, n_months=n_months)
+        index = DistilleryIndex(df_info, df_data)
+        for n_selected in (1, 5, 20):
+            slugs = df_info['slug'].head(n_selected).tolist()
+            compare_data = [(index.info_for(slug)['name'], index.history_for(slug)) for slug in slugs]
+            for label, period, max_points in configurations:
+                points, size, seconds = measure(compare_data, period, max_points)
+                print(
+                    f"mesi={n_months:>3} selezionate={n_selected:>2} {label:<13}: "
+                    f"{points:>6} punti, JSON {size / 1024:8.1f} KB, {seconds * 1000:7.1f} ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
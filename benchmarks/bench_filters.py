@@ -0,0 +1,64 @@
+"""
+Tempo di applicazione dei filtri globali (periodo, paesi, rating minimo) sul
+catalogo completo: maschere booleane sull'intero storico contro FilterIndex
+(storico ordinato per data e ricerca binaria, intervalli di righe per
+distilleria, gruppi per paese).
+
+Uso:
+    python -m benchmarks.bench_filters
+"""
+import time
+
+import pandas as pd
+
+from aggregates import compute_aggregates
+from benchmarks.stub_api import generate_frames
+from data_loader import optimize_dtypes
+from dataset import DatasetResult
+from filters import Filters
+
+
+def with_masks(df_info, df_data, filters):
+    info = df_info
+    if filters.countries:
+        info = info[info['country'].isin(filters.countries)]
+    if filters.min_rating is not None:
+        info = info[info['whiskybase_rating'] >= filters.min_rating]
+    data = df_data[(df_data['dt'] >= filters.start) & (df_data['dt'] <= filters.end)]
+    data = data[data['slug'].isin(info['slug'])]
+    return compute_aggregates(info, data)
+
+
+def main():
+    for n_distilleries in (200, 1000, 3000):
+        df_info, df_data = generate_frames(n_distilleries, n_months=120)
+        df_data = optimize_dtypes(df_data)
+        result = DatasetResult(info=df_info, history=df_data)
+        start = time.perf_counter()
+        filter_index = result.filter_index
+        build = time.perf_counter() - start
+
+        countries = tuple(filter_index.countries[:2])
+        cases = [
+            Filters(start=pd.Timestamp('2020-01-01'), end=pd.Timestamp('2023-12-01')),
+            Filters(start=pd.Timestamp('2018-01-01'), end=pd.Timestamp('2021-12-01'), countries=countries, min_rating=80.0),
+        ]
+        for filters in cases:
+            start = time.perf_counter()
+            with_masks(df_info, df_data, filters)
+            masks = time.perf_counter() - start
+            start = time.perf_counter()
+            filtered = filter_index.apply(filters)
+            indexed = time.perf_counter() - start
+            start = time.perf_counter()
+            filter_index.apply(filters)
+            cached = time.perf_counter() - start
+            print(
+                f"righe={len(df_data):>7} filtro su {len(filtered.info):>4} distillerie: "
+                f"maschere {masks * 1000:6.1f} ms, FilterIndex {indexed * 1000:6.1f} ms "
+                f"(in cache {cached * 1000:.3f} ms, costruzione {build * 1000:.0f} ms una volta)"
+            )
+
+
+if __name__ == "__main__":
+    main()
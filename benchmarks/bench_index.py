@@ -0,0 +1,46 @@
+"""
+Microbenchmark delle ricerche per distilleria: filtri booleani contro DistilleryIndex.
+
+Simula il lavoro di un rerun della pagina di confronto al crescere della
+dimensione dello storico e del numero di distillerie selezionate.
+
+Uso:
+    python -m benchmarks.bench_index
+"""
+import timeit
+
+from benchmarks.stub_api import generate_frames
+from distillery_index import DistilleryIndex
+
+
+def mask_lookup(df_info, df_data, slugs):
+    for slug in slugs:
+        df_info[df_info['slug'] == slug]['name'].iloc[0]
+        df_data[df_data['slug'] == slug]
+
+
+def index_lookup(index, slugs):
+    for slug in slugs:
+        index.info_for(slug)['name']
+        index.history_for(slug)
+
+
+def main():
+    repeat = 20
+    for n_distilleries in (50, 500, 2000):
+        df_info, df_data = generate_frames(n_distilleries, n_months=120)
+        build = timeit.timeit(lambda: DistilleryIndex(df_info, df_data), number=1)
+        index = DistilleryIndex(df_info, df_data)
+        for n_selected in (1, 5, 20):
+            slugs = df_info['slug'].head(n_selected).tolist()
+            mask = timeit.timeit(lambda: mask_lookup(df_info, df_data, slugs), number=repeat) / repeat
+            indexed = timeit.timeit(lambda: index_lookup(index, slugs), number=repeat) / repeat
+            print(
+                f"righe={len(df_data):>7} selezionate={n_selected:>2}: "
+                f"maschera {mask * 1000:8.2f} ms, indice {indexed * 1000:6.3f} ms "
+                f"(costruzione indice {build * 1000:.0f} ms, una volta)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Misura il percorso di caricamento della dashboard: il vecchio load_data
+(elenco distillerie scaricato due volte) contro WhiskyDataset, e il tempo
+di avvio in modalità lazy al crescere del catalogo.
+
+Uso:
+    python -m benchmarks.bench_load
+"""
+import time
+
+import data_loader
+from benchmarks.stub_api import StubAPI
+from dataset import WhiskyDataset
+
+
+def legacy_load(top_n):
+    # Come il vecchio app.load_data: build_combined_dataframe riscaricava l'elenco
+    df_info = data_loader.load_distilleries_info()
+    df_data = data_loader.build_combined_dataframe(top_n=top_n)
+    return df_info, df_data
+
+
+def dataset_load(top_n):
+    result = WhiskyDataset(top_n=top_n).load()
+    return result.info, result.history
+
+
+def main():
+    # Catalogo ampio per rendere visibile il costo dell'elenco distillerie
+    with StubAPI(n_distilleries=5000, n_months=60, latency=0.05) as stub:
+        data_loader.API_BASE_URL = stub.base_url
+        data_loader.cache = None
+        for label, load in (("prima", legacy_load), ("dopo", dataset_load)):
+            served = stub.requests_served
+            start = time.perf_counter()
+            load(top_n=50)
+            elapsed = time.perf_counter() - start
+            print(f"{label}: {elapsed:.2f}s, {stub.requests_served - served} richieste HTTP")
+
+    # In modalità lazy l'avvio scarica solo l'elenco delle distillerie
+    for n_distilleries in (100, 1000, 5000):
+        with StubAPI(n_distilleries=n_distilleries, n_months=60, latency=0.05) as stub:
+            data_loader.API_BASE_URL = stub.base_url
+            start = time.perf_counter()
+            WhiskyDataset(lazy=True).load()
+            elapsed = time.perf_counter() - start
+            print(f"lazy, catalogo di {n_distilleries}: avvio in {elapsed:.2f}s, {stub.requests_served} richieste HTTP")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Confronta la conversione degli storici distilleria per distilleria (DataFrame
+per risposta, pd.to_datetime, pd.to_numeric per colonna e pd.concat finale)
+con la conversione colonnare in un unico passaggio di parse_distillery_payloads.
+
+Uso:
+    python -m benchmarks.bench_parse
+"""
+import json
+import time
+
+import pandas as pd
+
+import data_loader
+from benchmarks.stub_api import generate_catalog, generate_history
+
+
+def legacy_parse(raw_payloads):
+    # Percorso precedente: una conversione completa per distilleria e concatenazione finale
+    frames = []
+    for raw in raw_payloads:
+        data = json.loads(raw)
+        if not data:
+            continue
+        df = pd.DataFrame(data)
+        df['dt'] = pd.to_datetime(df['dt'])
+        for col in data_loader.NUMERIC_COLUMNS:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors="coerce")
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def batched_parse(raw_payloads):
+    return data_loader.parse_distillery_payloads([data_loader.json_loads(raw) for raw in raw_payloads])
+
+
+def main():
+    decoder = "orjson" if data_loader.orjson is not None else "json"
+    print(f"Decoder JSON: {decoder}")
+    for n_slugs in (50, 500, 5000):
+        catalog = generate_catalog(n_slugs)
+        raw_payloads = [json.dumps(generate_history(distillery, 60)).encode() for distillery in catalog]
+
+        start = time.perf_counter()
+        before = legacy_parse(raw_payloads)
+        legacy = time.perf_counter() - start
+
+        start = time.perf_counter()
+        after = batched_parse(raw_payloads)
+        batched = time.perf_counter() - start
+
+        pd.testing.assert_frame_equal(before, after)
+        print(f"slug={n_slugs:>5}: per distilleria {legacy:.3f}s, colonnare {batched:.3f}s ({legacy / batched:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
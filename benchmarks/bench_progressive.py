@@ -0,0 +1,47 @@
+"""
+Tempo al primo blocco di dati contro tempo al completamento, per il
+caricamento bloccante e per quello progressivo.
+
+Uso:
+    python -m benchmarks.bench_progressive
+"""
+import time
+
+import data_loader
+from benchmarks.stub_api import StubAPI
+from dataset import WhiskyDataset
+
+
+def main():
+    with StubAPI(n_distilleries=400, n_months=60, latency=0.05) as stub:
+        data_loader.API_BASE_URL = stub.base_url
+        data_loader.cache = None
+        df_info = data_loader.load_distilleries_info()
+
+        for top_n in (50, 200):
+            start = time.perf_counter()
+            data_loader.build_combined_dataframe(top_n=top_n, df_info=df_info)
+            blocking = time.perf_counter() - start
+
+            start = time.perf_counter()
+            first = None
+            for _ in data_loader.iter_combined_dataframe(top_n=top_n, df_info=df_info):
+                if first is None:
+                    first = time.perf_counter() - start
+            complete = time.perf_counter() - start
+            print(
+                f"top_n={top_n}: bloccante {blocking:.2f}s al primo dato; "
+                f"progressivo {first:.2f}s al primo blocco, {complete:.2f}s al completamento"
+            )
+
+        # Dashboard in modalità lazy: la prima pagina dipende solo dall'elenco distillerie
+        store = WhiskyDataset(lazy=True, prefetch=200)
+        store.load()
+        store.mark_first_paint()
+        store.wait()
+        timings = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in store.timings.items())
+        print(f"WhiskyDataset lazy (prefetch=200): {timings}")
+
+
+if __name__ == "__main__":
+    main()
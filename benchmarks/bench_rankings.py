@@ -0,0 +1,82 @@
+"""
+Elementi inviati al browser e tempo di esecuzione della pagina Classifiche:
+un st.markdown per riga (versione precedente) contro un unico blocco HTML per
+scheda (rankings.ranking_html).
+
+Le pagine vengono eseguite senza browser con streamlit.testing (AppTest).
+
+Uso:
+    python -m benchmarks.bench_rankings
+"""
+import time
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from aggregates import compute_aggregates
+from benchmarks.stub_api import generate_frames
+from rankings import ranking_html
+
+TABS = [
+    ('winning_bid_mean_mean', "#F4D03F", "#FEF9E7"),
+    ('trading_volume_sum', "#E74C3C", "#FDEDEC"),
+]
+
+# Aggregati condivisi con gli script eseguiti da AppTest
+aggregates = None
+
+SCRIPT = """
+from benchmarks import bench_rankings
+bench_rankings.{renderer}({k})
+"""
+
+
+def per_row(k):
+    for tab, (column, colore_barra, colore_sfondo) in zip(st.tabs(["Prezzo", "Volume"]), TABS):
+        with tab:
+            top = aggregates.top_distilleries(column, k=k)
+            for idx, (_, row) in enumerate(top.iterrows()):
+                # Una riga per elemento, come faceva create_bar
+                st.markdown(
+                    ranking_html(top.iloc[idx:idx + 1], column, colore_barra, colore_sfondo),
+                    unsafe_allow_html=True,
+                )
+
+
+def batched(k):
+    for tab, (column, colore_barra, colore_sfondo) in zip(st.tabs(["Prezzo", "Volume"]), TABS):
+        with tab:
+            top = aggregates.top_distilleries(column, k=k)
+            st.markdown(ranking_html(top, column, colore_barra, colore_sfondo), unsafe_allow_html=True)
+
+
+def run(renderer, k, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        at = AppTest.from_string(SCRIPT.format(renderer=renderer, k=k), default_timeout=120)
+        start = time.perf_counter()
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+        best = min(best, time.perf_counter() - start)
+    size = sum(len(element.value) for element in at.markdown)
+    return len(at.markdown), size, best
+
+
+def main():
+    # Gli script di AppTest importano questo modulo con il suo nome, non come __main__
+    from benchmarks import bench_rankings
+
+    df_info, df_data = generate_frames(500, n_months=60)
+    bench_rankings.aggregates = compute_aggregates(df_info, df_data)
+    for k in (10, 50, None):
+        for renderer in ("per_row", "batched"):
+            elements, size, seconds = run(renderer, k)
+            print(
+                f"N={str(k or 'tutte'):>5} {renderer:<8}: {elements:>4} elementi, "
+                f"HTML {size / 1024:7.1f} KB, {seconds * 1000:7.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
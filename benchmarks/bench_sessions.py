@@ -0,0 +1,125 @@
+"""
+Memoria residente (RSS) del processo con 1, 10 e 50 sessioni simulate.
+
+Confronta la copia per sessione di st.cache_data (ogni sessione riceve il
+risultato deserializzato da pickle) con il DatasetResult condiviso da
+st.cache_resource. Nel secondo caso le sessioni sono vere esecuzioni di
+app.py (streamlit.testing, AppTest), aperte insieme e con il proprio
+session_state, che usano tutte la stessa risorsa load_data caricata da uno
+snapshot. Ogni misura gira in un processo separato.
+
+Uso:
+    python -m benchmarks.bench_sessions
+"""
+import gc
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.stub_api import generate_frames
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ["Panoramica", "Classifiche", "Analisi di Mercato"]
+
+
+def rss_mb():
+    # Linux: VmRSS da /proc; altrove il picco riportato da resource
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def release_memory():
+    # Restituisce al sistema la memoria libera di Python e di Arrow (lettura dello snapshot)
+    gc.collect()
+    try:
+        import pyarrow
+        pyarrow.default_memory_pool().release_unused()
+    except ImportError:
+        pass
+
+
+def simulate_copies(n_sessions):
+    from dataset import DatasetResult
+
+    df_info, df_data = generate_frames(2000, n_months=120)
+    result = DatasetResult(info=df_info, history=df_data)
+    baseline = rss_mb()
+
+    payload = pickle.dumps(result)
+    sessions = [pickle.loads(payload) for _ in range(n_sessions)]
+
+    # Ogni sessione legge lo storico, come farebbe una pagina
+    for session in sessions:
+        session.aggregates.top_distilleries('winning_bid_mean_mean')
+        session.history['winning_bid_mean'].mean()
+    print(f"{rss_mb():.0f} {rss_mb() - baseline:+.0f} -")
+
+
+def run_session():
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=300).run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return at
+
+
+def simulate_shared(n_sessions):
+    import metrics
+    from dataset import DatasetResult
+    from snapshot import export_snapshot
+
+    with tempfile.TemporaryDirectory() as directory:
+        df_info, df_data = generate_frames(2000, n_months=120)
+        export_snapshot(DatasetResult(info=df_info, history=df_data), directory)
+        del df_info, df_data
+        os.environ["WHISKY_SNAPSHOT"] = directory
+
+        # La prima sessione carica la risorsa condivisa e visita tutte le pagine
+        # (risultati e grafici condivisi vengono calcolati una volta sola); le
+        # altre restano aperte, ognuna con il proprio session_state, e visitano
+        # le pagine a turno (AppTest non esegue più script contemporaneamente)
+        first = run_session()
+        for page in PAGES:
+            first.sidebar.radio[0].set_value(page).run()
+        release_memory()
+        baseline = rss_mb()
+        sessions = [run_session() for _ in range(n_sessions)]
+        for page in PAGES:
+            for at in sessions:
+                at.sidebar.radio[0].set_value(page).run()
+                if at.exception:
+                    raise RuntimeError(at.exception[0].value)
+        release_memory()
+        loads = metrics.snapshot()['counters'].get("load_data.miss", 0)
+        print(f"{rss_mb():.0f} {rss_mb() - baseline:+.0f} {loads}")
+        del first, sessions
+
+
+def main():
+    if len(sys.argv) == 3:
+        simulate = simulate_copies if sys.argv[1] == "copy" else simulate_shared
+        simulate(int(sys.argv[2]))
+        return
+
+    for n_sessions in (1, 10, 50):
+        for mode, label in (("copy", "cache_data (copia)"), ("shared", "cache_resource (condiviso)")):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_sessions", mode, str(n_sessions)],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip().splitlines()[-1].split()
+            loads = f", esecuzioni di load_data: {output[2]}" if output[2] != "-" else ""
+            print(f"sessioni={n_sessions:>2} {label:<27}: RSS {output[0]} MB ({output[1]} MB per le sessioni{loads})")
+
+
+if __name__ == "__main__":
+    main()
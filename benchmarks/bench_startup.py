@@ -0,0 +1,125 @@
+"""
+Profilo dell'avvio a freddo di app.py.
+
+1. Tempo di import di ogni modulo (python -X importtime) importando app.py in
+   un processo nuovo: i pacchetti importati direttamente in ordine di tempo
+   cumulativo e i moduli del progetto.
+2. Tempo dall'avvio del processo alla prima esecuzione completa dello script
+   (AppTest, contro lo stub locale dell'API), ripetuto in processi nuovi.
+
+Uso:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --top 30 --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.stub_api import StubAPI
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_MODULES = {
+    os.path.splitext(name)[0] for name in os.listdir(ROOT) if name.endswith(".py")
+}
+
+# Eseguito in un processo nuovo: "ready" dopo l'import di streamlit, "rendered"
+# alla fine della prima esecuzione dello script
+FIRST_RENDER = """
+import json, os, time
+from streamlit.testing.v1 import AppTest
+ready = time.time()
+at = AppTest.from_file("app.py", default_timeout=120)
+at.run()
+print("FIRST_RENDER", json.dumps({"ready": ready, "rendered": time.time(), "exceptions": [str(e.value) for e in at.exception]}))
+os._exit(0)
+"""
+
+
+def import_profile(env):
+    """
+    Importa app.py con -X importtime.
+
+    Returns:
+        list: Tuple (modulo, profondità, tempo proprio, tempo cumulativo) in secondi
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    modules = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), depth, int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return modules
+
+
+def direct_imports(modules, parent):
+    # importtime elenca i moduli importati prima del modulo che li importa, un livello più in profondità
+    position = next(i for i, (name, depth, _, _) in enumerate(modules) if name == parent)
+    depth = modules[position][1]
+    children = []
+    for name, child_depth, own, cumulative in reversed(modules[:position]):
+        if child_depth <= depth:
+            break
+        if child_depth == depth + 1:
+            children.append((name, child_depth, own, cumulative))
+    return sorted(children, key=lambda m: m[3], reverse=True)
+
+
+def first_render(env, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.time()
+        completed = subprocess.run(
+            [sys.executable, "-c", FIRST_RENDER], cwd=ROOT, env=env, capture_output=True, text=True,
+        )
+        lines = [line for line in completed.stdout.splitlines() if line.startswith("FIRST_RENDER ")]
+        if not lines:
+            raise RuntimeError(completed.stderr[-2000:])
+        result = json.loads(lines[-1].split(" ", 1)[1])
+        if result['exceptions']:
+            raise RuntimeError(result['exceptions'][0])
+        runs.append((result['rendered'] - start, result['ready'] - start, result['rendered'] - result['ready']))
+    return runs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profilo dell'avvio a freddo della Whisky Dashboard")
+    parser.add_argument("--top", type=int, default=20, help="Pacchetti mostrati nel profilo degli import")
+    parser.add_argument("--repeat", type=int, default=3, help="Avvii misurati")
+    parser.add_argument("--distilleries", type=int, default=200, help="Distillerie nel catalogo dello stub")
+    args = parser.parse_args(argv)
+
+    with StubAPI(n_distilleries=args.distilleries, n_months=120, latency=0.0) as stub, \
+            tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ, WHISKYHUNTER_API_URL=stub.base_url, WHISKY_CACHE_DIR=cache_dir)
+
+        modules = import_profile(env)
+        app_total = next(cumulative for name, _, _, cumulative in modules if name == "app")
+        print(f"Import di app.py: {app_total * 1000:.0f} ms")
+        print("\nModuli importati direttamente da app.py (tempo cumulativo):")
+        for name, _, _, cumulative in direct_imports(modules, "app")[:args.top]:
+            print(f"  {name:<40} {cumulative * 1000:8.1f} ms")
+        print("\nModuli del progetto (tempo proprio / cumulativo):")
+        for name, _, own, cumulative in modules:
+            if name in PROJECT_MODULES:
+                print(f"  {name:<40} {own * 1000:8.1f} / {cumulative * 1000:8.1f} ms")
+
+        runs = first_render(env, args.repeat)
+        print(f"\nDall'avvio del processo alla prima visualizzazione ({args.repeat} avvii):")
+        for label, position in (("totale", 0), ("interprete e streamlit", 1), ("esecuzione di app.py", 2)):
+            values = [run[position] for run in runs]
+            print(f"  {label:<40} migliore {min(values) * 1000:7.0f} ms, mediana {statistics.median(values) * 1000:7.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,206 @@
+"""
+Server HTTP locale che imita l'API WhiskyHunter con dati sintetici.
+
+Espone gli stessi endpoint usati da data_loader:
+    /api/distilleries_info/
+    /api/distillery_data/{slug}/
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COUNTRIES = ["Scotland", "Japan", "Ireland", "USA", "Taiwan", "India", "Wales", "England"]
+
+
+def generate_catalog(n_distilleries, seed=0):
+    """
+    Genera un elenco sintetico di distillerie nel formato di distilleries_info.
+
+    Args:
+        n_distilleries (int): Numero di distillerie da generare
+        seed (int): Seme del generatore casuale
+
+    Returns:
+        list: Lista di dizionari, uno per distilleria
+    """
+    rng = random.Random(seed)
+    catalog = []
+    for i in range(n_distilleries):
+        catalog.append({
+            "name": f"Distillery {i:05d}",
+            "slug": f"distillery-{i:05d}",
+            "country": rng.choice(COUNTRIES),
+            # L'API reale restituisce i valori numerici come stringhe
+            "whiskybase_whiskies": str(rng.randint(10, 5000)),
+            "whiskybase_votes": str(rng.randint(50, 100000)),
+            "whiskybase_rating": f"{rng.uniform(70, 92):.2f}",
+        })
+    return catalog
+
+
+def generate_history(distillery, n_months, seed=0):
+    """
+    Genera lo storico mensile sintetico di una distilleria nel formato di distillery_data.
+
+    Args:
+        distillery (dict): Record della distilleria prodotto da generate_catalog
+        n_months (int): Numero di mesi di storico
+        seed (int): Seme del generatore casuale
+
+    Returns:
+        list: Lista di dizionari, uno per mese (dal più recente al più vecchio)
+    """
+    rng = random.Random(f"{seed}-{distillery['slug']}")
+    price = rng.uniform(50, 800)
+    history = []
+    for month in range(n_months):
+        year, month_idx = divmod(2024 * 12 - month, 12)
+        price = max(5.0, price * rng.uniform(0.9, 1.1))
+        lots = rng.randint(1, 300)
+        history.append({
+            "dt": f"{year:04d}-{month_idx + 1:02d}-01",
+            "name": distillery["name"],
+            "slug": distillery["slug"],
+            "winning_bid_max": round(price * rng.uniform(1.5, 4), 2),
+            "winning_bid_min": round(price * rng.uniform(0.2, 0.8), 2),
+            "winning_bid_mean": round(price, 2),
+            "trading_volume": round(price * lots, 2),
+            "lots_count": lots,
+        })
+    return history
+
+
+def generate_frames(n_distilleries, n_months, seed=0):
+    """
+    Genera direttamente i DataFrame df_info e df_data, senza passare dal server.
+
+    Args:
+        n_distilleries (int): Dimensione del catalogo
+        n_months (int): Lunghezza dello storico di ogni distilleria
+        seed (int): Seme per la generazione dei dati
+
+    Returns:
+        tuple: (df_info, df_data) come prodotti da data_loader
+    """
+    from data_loader import parse_distilleries_info, parse_distillery_data
+
+    catalog = generate_catalog(n_distilleries, seed=seed)
+    records = []
+    for distillery in catalog:
+        records.extend(generate_history(distillery, n_months, seed=seed))
+    return parse_distilleries_info(catalog), parse_distillery_data(records)
+
+
+class StubAPI:
+    """
+    Stub dell'API WhiskyHunter in esecuzione su un thread in background.
+
+    Oltre alla latenza può iniettare guasti con le probabilità indicate:
+    errori 500, risposte 429 con Retry-After e richieste che restano appese.
+
+    Args:
+        n_distilleries (int): Dimensione del catalogo
+        n_months (int): Lunghezza dello storico di ogni distilleria
+        latency (float): Ritardo in secondi aggiunto a ogni risposta
+        seed (int): Seme per la generazione dei dati
+        error_rate (float): Probabilità di rispondere 500
+        throttle_rate (float): Probabilità di rispondere 429
+        retry_after (float): Valore di Retry-After nelle risposte 429
+        hang_rate (float): Probabilità di attendere hang_seconds prima di rispondere
+        hang_seconds (float): Durata delle richieste appese
+    """
+
+    def __init__(self, n_distilleries=200, n_months=60, latency=0.05, seed=0,
+                 error_rate=0.0, throttle_rate=0.0, retry_after=0.2, hang_rate=0.0, hang_seconds=30.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self._random = random.Random(seed)
+        self.catalog = generate_catalog(n_distilleries, seed=seed)
+        self._payloads = {"distilleries_info": json.dumps(self.catalog).encode()}
+        for distillery in self.catalog:
+            history = generate_history(distillery, n_months, seed=seed)
+            self._payloads[distillery["slug"]] = json.dumps(history).encode()
+        self.requests_served = 0
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 per permettere al client di riutilizzare le connessioni
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub.requests_served += 1
+                time.sleep(stub.latency)
+                fault = stub._random.random()
+                if fault < stub.hang_rate:
+                    time.sleep(stub.hang_seconds)
+                elif fault < stub.hang_rate + stub.error_rate:
+                    self._send_empty(500)
+                    return
+                elif fault < stub.hang_rate + stub.error_rate + stub.throttle_rate:
+                    self._send_empty(429, {"Retry-After": str(stub.retry_after)})
+                    return
+                parts = [part for part in self.path.split("/") if part]
+                body = None
+                if parts[:2] == ["api", "distilleries_info"]:
+                    body = stub._payloads["distilleries_info"]
+                elif parts[:2] == ["api", "distillery_data"] and len(parts) >= 3:
+                    body = stub._payloads.get(parts[2])
+                if body is None:
+                    self._send_empty(404)
+                    return
+                # ETag per supportare le richieste condizionali della cache su disco
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    self._send_empty(304, {"ETag": etag})
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_empty(self, status, headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,191 @@
+"""
+Suite di benchmark riproducibile contro lo stub locale dell'API WhiskyHunter.
+
+Misura il caricamento degli storici (build_combined_dataframe,
+load_distillery_data) e le pagine di app.py eseguite senza browser con
+streamlit.testing (AppTest); i risultati vengono salvati in JSON insieme a
+commit, versioni delle librerie e parametri, così da poter confrontare
+esecuzioni su commit diversi.
+
+Uso:
+    python -m benchmarks.suite
+    python -m benchmarks.suite --distilleries 500 --months 240 --latency 0.05 --error-rate 0.02
+    python -m benchmarks.suite --compare benchmarks/results/precedente.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import data_loader
+import metrics
+from benchmarks.stub_api import StubAPI
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+PAGES = ["Panoramica", "Classifiche", "Analisi Distillerie", "Confronto Distillerie", "Analisi di Mercato"]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(function, repeat):
+    # Tempi di ogni ripetizione e risultato dell'ultima
+    runs, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        runs.append(time.perf_counter() - start)
+    return runs, result
+
+
+def summary(name, runs, **fields):
+    return dict(
+        name=name,
+        best_seconds=min(runs),
+        median_seconds=statistics.median(runs),
+        runs=runs,
+        **fields,
+    )
+
+
+def bench_loader(stub, args):
+    results = []
+
+    served = stub.requests_served
+    runs, df_data = measure(lambda: data_loader.build_combined_dataframe(
+        top_n=args.top_n, max_workers=args.workers, rate_limit=None,
+    ), args.repeat)
+    results.append(summary(
+        "build_combined_dataframe", runs,
+        rows=len(df_data), requests=(stub.requests_served - served) // args.repeat,
+    ))
+
+    slugs = [distillery['slug'] for distillery in stub.catalog[:args.slugs]]
+    runs, frames = measure(lambda: [data_loader.load_distillery_data(slug) for slug in slugs], args.repeat)
+    results.append(summary(
+        "load_distillery_data", [run / len(slugs) for run in runs],
+        rows=sum(len(df) for df in frames) // len(slugs), slugs=len(slugs),
+    ))
+    return results
+
+
+def wait_for_prefetch(timeout=120):
+    # Il precaricamento in background non deve sovrapporsi alle misure delle pagine
+    for thread in threading.enumerate():
+        if thread.name == "whisky-prefetch":
+            thread.join(timeout)
+
+
+def bench_pages(args):
+    results = []
+    st.cache_resource.clear()
+
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=300)
+    start = time.perf_counter()
+    at.run()
+    results.append(summary("app:avvio", [time.perf_counter() - start]))
+    wait_for_prefetch()
+
+    for page in PAGES:
+        at.sidebar.radio[0].set_value(page)
+        runs = []
+        # Il primo rerun costruisce grafici e aggregati, i successivi li riusano
+        for _ in range(args.repeat + 1):
+            start = time.perf_counter()
+            at.run()
+            runs.append(time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError(f"{page}: {at.exception[0].value}")
+        results.append(summary(
+            f"page:{page}", runs[1:], first_seconds=runs[0],
+            charts=len(at.get('plotly_chart')), markdown=len(at.markdown),
+        ))
+    return results
+
+
+def compare(current, previous_path):
+    with open(previous_path, encoding="utf-8") as f:
+        previous = {result['name']: result for result in json.load(f)['results']}
+    print(f"\nConfronto con {previous_path}:")
+    for result in current:
+        before = previous.get(result['name'])
+        if before is None:
+            continue
+        change = (result['best_seconds'] - before['best_seconds']) / before['best_seconds'] * 100
+        print(f"  {result['name']:<34} {before['best_seconds'] * 1000:9.1f} -> {result['best_seconds'] * 1000:9.1f} ms ({change:+.0f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Suite di benchmark della Whisky Dashboard")
+    parser.add_argument("--distilleries", type=int, default=200, help="Distillerie nel catalogo dello stub")
+    parser.add_argument("--months", type=int, default=120, help="Mesi di storico per distilleria")
+    parser.add_argument("--latency", type=float, default=0.02, help="Latenza dello stub in secondi")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Frazione di risposte 500 dello stub")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--top-n", type=int, default=50, help="Distillerie caricate da build_combined_dataframe")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--slugs", type=int, default=10, help="Distillerie per load_distillery_data")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-pages", action="store_true", help="Non eseguire le pagine dell'app")
+    parser.add_argument("--output", help="File JSON dei risultati (di default in benchmarks/results/)")
+    parser.add_argument("--compare", help="Risultati precedenti con cui confrontare questa esecuzione")
+    args = parser.parse_args(argv)
+
+    commit = git_commit()
+    metrics.clear()
+    with StubAPI(
+        n_distilleries=args.distilleries, n_months=args.months, latency=args.latency,
+        seed=args.seed, error_rate=args.error_rate,
+    ) as stub:
+        # Nessuna cache su disco: ogni ripetizione passa dalla rete
+        data_loader.API_BASE_URL = stub.base_url
+        data_loader.cache = None
+        results = bench_loader(stub, args)
+        if not args.skip_pages:
+            results += bench_pages(args)
+        requests_served = stub.requests_served
+
+    for result in results:
+        print(f"{result['name']:<36} migliore {result['best_seconds'] * 1000:9.1f} ms, mediana {result['median_seconds'] * 1000:9.1f} ms")
+
+    report = {
+        'commit': commit,
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'streamlit': st.__version__,
+        'config': vars(args),
+        'requests_served': requests_served,
+        'results': results,
+        'metrics': metrics.snapshot(),
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit or 'nocommit'}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Risultati salvati in {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
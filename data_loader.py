@@ -1,31 +1,206 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
 import requests
 import pandas as pd
-import time
-from tqdm import tqdm
+from pandas.api.types import union_categoricals
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from disk_cache import DiskCache
+import metrics
+from http_client import TokenBucket, http_get, record_fetch
+
+# URL base dell'API (sovrascrivibile, ad esempio per puntare a uno stub locale)
+API_BASE_URL = os.environ.get("WHISKYHUNTER_API_URL", "https://whiskyhunter.net/api")
+
+# Cache su disco delle risposte (None per disattivarla)
+cache = DiskCache()
+
+# Formato delle date restituite da distillery_data e colonne numeriche degli storici
+DATE_FORMAT = "%Y-%m-%d"
+NUMERIC_COLUMNS = ['winning_bid_max', 'winning_bid_min', 'winning_bid_mean', 'trading_volume', 'lots_count']
+
+# Ultimi mesi già noti che l'aggiornamento incrementale converte di nuovo a ogni
+# risposta modificata (refresh_distillery_data), perché l'API può ancora correggerli
+REFRESH_WINDOW_MONTHS = 3
 
 
-def load_distilleries_info():
+def json_loads(content):
+    """Decodifica una risposta JSON, con orjson se installato."""
+    try:
+        if orjson is not None:
+            return orjson.loads(content)
+        return json.loads(content)
+    except ValueError as e:
+        # Come response.json(), un JSON non valido è un errore della richiesta
+        raise requests.exceptions.InvalidJSONError(str(e))
+
+
+def parse_distilleries_info(records):
     """
-    Carica le informazioni di base su tutte le distillerie dall'API WhiskyHunter.
+    Converte la risposta JSON di distilleries_info in DataFrame.
     
+    Args:
+        records (list): Lista di dizionari restituita dall'API
+        
     Returns:
         pandas.DataFrame: DataFrame con informazioni sulle distillerie
     """
-    url = "https://whiskyhunter.net/api/distilleries_info/"
+    d_info = pd.DataFrame(records)
+    
+    # Convertiamo in integer o float gestendo eventuali errori
+    d_info["whiskybase_rating"] = pd.to_numeric(d_info["whiskybase_rating"], errors="coerce")
+    d_info["whiskybase_whiskies"] = pd.to_numeric(d_info["whiskybase_whiskies"], errors="coerce")
+    d_info["whiskybase_votes"] = pd.to_numeric(d_info["whiskybase_votes"], errors="coerce")
+    
+    return d_info
+
+def parse_distillery_data(records):
+    """
+    Converte la risposta JSON di distillery_data in DataFrame.
+    
+    Args:
+        records (list): Lista di dizionari restituita dall'API
+        
+    Returns:
+        pandas.DataFrame: DataFrame con i dati storici della distilleria
+    """
+    return parse_distillery_payloads([records])
+
+def parse_distillery_payloads(payloads):
+    """
+    Converte in un unico DataFrame le risposte JSON di più distillerie.
     
+    I record di tutte le distillerie vengono trasformati in array colonnari in
+    un solo passaggio, con tipi espliciti e formato della data fisso, e il
+    DataFrame viene costruito una volta sola invece di concatenare un
+    DataFrame per distilleria.
+    
+    Args:
+        payloads (list): Liste di record restituite da distillery_data, una per distilleria
+        
+    Returns:
+        pandas.DataFrame: Storici di tutte le distillerie (vuoto se non ci sono dati)
+    """
+    records = [record for payload in payloads if payload for record in payload]
+    
+    # Se non ci sono dati, ritorniamo un DataFrame vuoto
+    if not records:
+        return pd.DataFrame()
+    
+    # Colonne nell'ordine in cui compaiono nei record (anche chiavi presenti solo in alcuni)
+    columns = list(dict.fromkeys(key for record in records for key in record))
+    data = {col: [record.get(col) for record in records] for col in columns}
+    
+    # Convertiamo la data in formato datetime e gli altri valori in float
+    if 'dt' in data:
+        try:
+            data['dt'] = pd.to_datetime(data['dt'], format=DATE_FORMAT)
+        except ValueError:
+            data['dt'] = pd.to_datetime(data['dt'])
+    for col in NUMERIC_COLUMNS:
+        if col in data:
+            data[col] = _to_float_array(data[col])
+    
+    # Come pd.to_numeric, lots_count resta intero se non ci sono valori mancanti
+    lots = data.get('lots_count')
+    if lots is not None and not np.isnan(lots).any() and (lots == np.floor(lots)).all():
+        data['lots_count'] = lots.astype('int64')
+    
+    return pd.DataFrame(data, columns=columns)
+
+def _to_float_array(values):
     try:
-        # Facciamo una richiesta GET all'API e salviamo in JSON
-        response = requests.get(url)
+        return np.array(values, dtype='float64')
+    except (TypeError, ValueError):
+        # Valori non numerici: li convertiamo in NaN come faceva pd.to_numeric
+        return pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype='float64')
+
+def _fetch_resource(key, url, revalidate=False):
+    # Risorsa dalla cache su disco o dall'API, senza conversione in DataFrame:
+    # (DataFrame in cache, None, None) oppure (None, record JSON, risposta HTTP)
+    cached, meta = cache.load(key) if cache is not None else (None, None)
+    if cached is not None and not revalidate and cache.is_fresh(key, meta):
+        metrics.incr("disk_cache.hit")
+        return cached, None, None
+    metrics.incr("disk_cache.miss" if cached is None else "disk_cache.revalidate")
+    
+    headers = cache.conditional_headers(meta) if cached is not None else {}
+    try:
+        # Facciamo una richiesta GET all'API e decodifichiamo il JSON
+        response = http_get(url, headers=headers, key=key)
+        if response.status_code == 304 and cached is not None:
+            cache.touch(key, meta)
+            return cached, None, None
         response.raise_for_status()  # Verifica se ci sono stati errori
-        d_info = response.json()
-        d_info = pd.DataFrame(d_info)
+        records = json_loads(response.content)
+    except requests.exceptions.RequestException as e:
+        if cached is None:
+            raise
+        print(f"API non raggiungibile per {key}, uso i dati in cache: {e}")
+        record_fetch(key, outcome="stale_cache")
+        return cached, None, None
+    return None, records, response
+
+def _store_response(key, df, url, response):
+    # Salva in cache il DataFrame convertito da una risposta con i suoi validatori
+    if cache is not None:
+        cache.store(
+            key, df, url=url,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+
+def fetch_cached(key, url, parse, revalidate=False):
+    """
+    Scarica una risorsa passando per la cache su disco.
+    
+    Se la copia in cache è ancora valida viene restituita senza contattare
+    l'API; altrimenti si effettua una GET condizionale (ETag/Last-Modified) e,
+    se il server non è raggiungibile, si ripiega sulla copia scaduta.
+    
+    Args:
+        key (str): Chiave della risorsa in cache, ad esempio "distillery_data/ardbeg"
+        url (str): URL dell'endpoint
+        parse (callable): Funzione che converte il JSON in DataFrame
+        revalidate (bool): Se interrogare il server anche quando la copia in cache è ancora valida
         
-        # Convertiamo in integer o float gestendo eventuali errori
-        d_info["whiskybase_rating"] = pd.to_numeric(d_info["whiskybase_rating"], errors="coerce")
-        d_info["whiskybase_whiskies"] = pd.to_numeric(d_info["whiskybase_whiskies"], errors="coerce")
-        d_info["whiskybase_votes"] = pd.to_numeric(d_info["whiskybase_votes"], errors="coerce")
+    Returns:
+        pandas.DataFrame: Dati della risorsa
         
-        return d_info
+    Raises:
+        requests.exceptions.RequestException: Se la richiesta fallisce e non ci sono dati in cache
+    """
+    cached, records, response = _fetch_resource(key, url, revalidate=revalidate)
+    if response is None:
+        return cached
+    with metrics.timed("parse") as measure:
+        df = parse(records)
+        measure['rows'], measure['bytes'] = len(df), len(response.content)
+    _store_response(key, df, url, response)
+    return df
+
+def load_distilleries_info(revalidate=False):
+    """
+    Carica le informazioni di base su tutte le distillerie dall'API WhiskyHunter.
+    
+    Args:
+        revalidate (bool): Se interrogare l'API anche quando la copia in cache è ancora valida
+    
+    Returns:
+        pandas.DataFrame: DataFrame con informazioni sulle distillerie
+    """
+    url = f"{API_BASE_URL}/distilleries_info/"
+    
+    try:
+        return fetch_cached("distilleries_info", url, parse_distilleries_info, revalidate=revalidate)
     except requests.exceptions.RequestException as e:
         print(f"Errore durante il caricamento dei dati: {e}")
         return pd.DataFrame()
@@ -40,85 +215,490 @@ def load_distillery_data(slug):
     Returns:
         pandas.DataFrame: DataFrame con i dati storici della distilleria
     """
-    url = f"https://whiskyhunter.net/api/distillery_data/{slug}/"
+    url = f"{API_BASE_URL}/distillery_data/{slug}/"
     
     try:
-        # Facciamo una richiesta GET all'API e salviamo in JSON
-        response = requests.get(url)
-        response.raise_for_status()  # Verifica se ci sono stati errori
-        data = response.json()
+        return fetch_cached(f"distillery_data/{slug}", url, parse_distillery_data)
+    except requests.exceptions.RequestException as e:
+        print(f"Errore durante il caricamento dei dati per {slug}: {e}")
+        return pd.DataFrame()
+
+def fetch_distillery_payload(slug):
+    """
+    Come load_distillery_data, ma una risposta appena scaricata non viene convertita.
+    
+    Le risposte di più distillerie vengono poi convertite insieme da
+    combine_distillery_payloads.
+    
+    Args:
+        slug (str): L'identificativo della distilleria
         
-        # Se non ci sono dati, ritorniamo un DataFrame vuoto
-        if not data:
-            return pd.DataFrame()
+    Returns:
+        tuple: (DataFrame dalla cache, None, None) oppure (None, record JSON, risposta HTTP);
+        in caso di errore (None, [], None)
+    """
+    url = f"{API_BASE_URL}/distillery_data/{slug}/"
+    
+    try:
+        return _fetch_resource(f"distillery_data/{slug}", url)
+    except requests.exceptions.RequestException as e:
+        print(f"Errore durante il caricamento dei dati per {slug}: {e}")
+        return None, [], None
+
+def combine_distillery_payloads(slugs, results):
+    """
+    Unisce i risultati di fetch_distillery_payload in un unico DataFrame.
+    
+    Le risposte appena scaricate vengono convertite tutte insieme con
+    parse_distillery_payloads (un solo passaggio colonnare) e poi salvate in
+    cache una distilleria alla volta; gli storici già in cache vengono
+    aggiunti così come sono.
+    
+    Args:
+        slugs (list): Slug delle distillerie
+        results (list): Risultati di fetch_distillery_payload, nello stesso ordine di slugs
         
-        # Convertiamo i dati in un DataFrame
-        df = pd.DataFrame(data)
+    Returns:
+        pandas.DataFrame: Storici nell'ordine di slugs (vuoto se non ci sono dati)
+    """
+    downloaded = [(slug, records, response) for slug, (_, records, response) in zip(slugs, results) if response is not None]
+    parsed = pd.DataFrame()
+    if downloaded:
+        with metrics.timed("parse") as measure:
+            parsed = parse_distillery_payloads([records for _, records, _ in downloaded])
+            measure['rows'] = len(parsed)
+            measure['bytes'] = sum(len(response.content) for _, _, response in downloaded)
+    
+    # Le righe di ogni distilleria sono contigue, nell'ordine dei record
+    pieces, offset = {}, 0
+    for slug, records, response in downloaded:
+        piece = parsed.iloc[offset:offset + len(records)].reset_index(drop=True) if records else pd.DataFrame()
+        offset += len(records)
+        pieces[slug] = piece
+        _store_response(f"distillery_data/{slug}", piece, f"{API_BASE_URL}/distillery_data/{slug}/", response)
+    
+    if all(cached is None or cached.empty for cached, _, _ in results):
+        return parsed
+    frames = [pieces.get(slug) if cached is None else cached for slug, (cached, _, _) in zip(slugs, results)]
+    frames = [df for df in frames if df is not None and not df.empty]
+    with metrics.timed("concat") as measure:
+        df_data = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        measure['rows'] = len(df_data)
+    return df_data
+
+def merge_distillery_delta(existing, delta):
+    """
+    Unisce le righe nuove o modificate allo storico già noto di una distilleria.
+    
+    Le righe sono identificate dalla coppia (slug, dt): a parità di chiave
+    prevale la versione più recente.
+    
+    Args:
+        existing (pandas.DataFrame): Storico già presente
+        delta (pandas.DataFrame): Righe appena scaricate
         
-        # Convertiamo la data in formato datetime e gli altri valori in float
-        df['dt'] = pd.to_datetime(df['dt'])
-        numeric_columns = ['winning_bid_max', 'winning_bid_min', 'winning_bid_mean', 'trading_volume', 'lots_count']
-        for col in numeric_columns:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors="coerce")
+    Returns:
+        tuple: (DataFrame unito e ordinato per data, righe aggiunte, righe aggiornate)
+    """
+    key = ['slug', 'dt']
+    if existing.empty:
+        return delta.sort_values('dt', ignore_index=True), len(delta), 0
+    if delta.empty:
+        return existing, 0, 0
+    
+    old = existing.set_index(key)
+    new = delta.set_index(key)
+    is_new = ~new.index.isin(old.index)
+    
+    # Tra le righe già note contiamo solo quelle con almeno un valore diverso
+    overlap = new[~is_new]
+    previous = old.reindex(overlap.index)[overlap.columns]
+    same = (overlap == previous) | (overlap.isna() & previous.isna())
+    updated = int((~same.all(axis=1)).sum())
+    
+    merged = pd.concat([existing, delta], ignore_index=True)
+    merged = merged.drop_duplicates(subset=key, keep='last').sort_values('dt', ignore_index=True)
+    return merged, int(is_new.sum()), updated
+
+def _records_digest(records):
+    # Impronta dei record JSON, indipendente dall'ordine delle chiavi
+    return hashlib.sha1(json.dumps(records, sort_keys=True).encode()).hexdigest()
+
+def _refresh_window(df, records, dates):
+    # Inizio della finestra di mesi riconvertiti al prossimo aggiornamento e
+    # impronta dei record precedenti, salvati nei metadati della cache
+    if df.empty:
+        return {'window_start': None, 'digest': None}
+    months = df['dt'].drop_duplicates().nlargest(REFRESH_WINDOW_MONTHS)
+    window_start = months.min()
+    older = [record for record, is_older in zip(records, dates < window_start) if is_older]
+    return {'window_start': window_start.strftime(DATE_FORMAT), 'digest': _records_digest(older)}
+
+def refresh_distillery_data(slug):
+    """
+    Aggiorna in modo incrementale lo storico di una distilleria salvato in cache.
+    
+    Dalla risposta dell'API vengono convertite solo le righe degli ultimi
+    REFRESH_WINDOW_MONTHS mesi già noti e quelle successive, che poi vengono
+    unite allo storico esistente. I record più vecchi non vengono convertiti
+    ma confrontati, tramite un'impronta salvata nei metadati della cache, con
+    quelli dell'aggiornamento precedente: se l'API li ha corretti (o se
+    l'impronta manca, come al primo aggiornamento) la risposta viene
+    convertita per intero e sostituisce lo storico. Se il server risponde 304
+    non viene elaborato nulla.
+    
+    Args:
+        slug (str): L'identificativo della distilleria
         
-        return df
+    Returns:
+        tuple: (DataFrame aggiornato, dizionario con righe aggiunte/aggiornate, byte scaricati
+        e conversione completa)
+    """
+    key = f"distillery_data/{slug}"
+    url = f"{API_BASE_URL}/distillery_data/{slug}/"
+    stats = {'slug': slug, 'appended': 0, 'updated': 0, 'bytes': 0, 'full': False}
+    
+    existing, meta = cache.load(key) if cache is not None else (None, None)
+    if existing is None:
+        df = load_distillery_data(slug)
+        stats['appended'], stats['full'] = len(df), True
+        return df, stats
+    
+    try:
+        response = http_get(url, headers=cache.conditional_headers(meta), key=key)
+        if response.status_code == 304:
+            cache.touch(key, meta)
+            return existing, stats
+        response.raise_for_status()
+        records = json_loads(response.content)
     except requests.exceptions.RequestException as e:
-        print(f"Errore durante il caricamento dei dati per {slug}: {e}")
+        print(f"Errore durante l'aggiornamento dei dati per {slug}: {e}")
+        record_fetch(key, outcome="stale_cache")
+        return existing, stats
+    stats['bytes'] = len(response.content)
+    
+    # Convertiamo solo la finestra finale se i record più vecchi non sono cambiati
+    dates = pd.to_datetime(pd.Series([record['dt'] for record in records], dtype=object), format=DATE_FORMAT)
+    window_start = meta.get('window_start')
+    recent = None
+    if window_start is not None and not existing.empty:
+        is_recent = dates >= pd.Timestamp(window_start)
+        older = [record for record, keep in zip(records, is_recent) if not keep]
+        if _records_digest(older) == meta.get('digest'):
+            recent = [record for record, keep in zip(records, is_recent) if keep]
+    
+    if not records:
+        # Risposta vuota: si conserva lo storico già noto
+        df = existing
+    elif recent is None:
+        stats['full'] = True
+        delta = parse_distillery_data(records)
+        _, stats['appended'], stats['updated'] = merge_distillery_delta(existing, delta)
+        df = delta.sort_values('dt', ignore_index=True)
+    else:
+        delta = parse_distillery_data(recent)
+        df, stats['appended'], stats['updated'] = merge_distillery_delta(existing, delta)
+    
+    cache.store(
+        key, df, url=url,
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"),
+        extra={'last_dt': str(df['dt'].max()) if not df.empty else None, **_refresh_window(df, records, dates)},
+    )
+    return df, stats
+
+def select_top_slugs(df_info, top_n=50):
+    """
+    Restituisce gli slug delle distillerie con rating più alto.
+    
+    Args:
+        df_info (pandas.DataFrame): DataFrame con informazioni sulle distillerie
+        top_n (int): Numero di distillerie da selezionare (None per tutte)
+        
+    Returns:
+        list: Slug ordinati per rating decrescente
+    """
+    top_distilleries = df_info.sort_values(by="whiskybase_rating", ascending=False)
+    if top_n is not None:
+        top_distilleries = top_distilleries.head(top_n)
+    return top_distilleries["slug"].tolist()
+
+def _rate_limited(func, max_workers, rate_limit):
+    # Avvolge func con un token bucket condiviso da tutti i thread del pool
+    bucket = TokenBucket(rate_limit, capacity=max_workers) if rate_limit else None
+    
+    def wrapper(slug):
+        if bucket is not None:
+            bucket.acquire()
+        return func(slug)
+    
+    return wrapper
+
+def load_histories(slugs, max_workers=8, rate_limit=20.0, revalidate=False):
+    """
+    Scarica in parallelo gli storici di un elenco di distillerie.
+    
+    Le richieste sono eseguite da un pool di thread che condivide un'unica
+    sessione HTTP; un token bucket limita il numero di richieste al secondo.
+    Le risposte scaricate vengono convertite tutte insieme con
+    parse_distillery_payloads (vedi combine_distillery_payloads) e gli storici
+    già in cache riusati; con revalidate ogni storico in cache viene
+    aggiornato singolarmente in modo incrementale.
+    
+    Args:
+        slugs (list): Slug delle distillerie da scaricare
+        max_workers (int): Numero massimo di richieste contemporanee (1 per il caricamento seriale)
+        rate_limit (float): Numero massimo di richieste al secondo (None per nessun limite)
+        revalidate (bool): Se aggiornare gli storici in cache con refresh_distillery_data anche se ancora validi
+        
+    Returns:
+        pandas.DataFrame: Storici concatenati nell'ordine di slugs (vuoto se non ci sono dati)
+    """
+    fetch = _rate_limited(
+        (lambda slug: refresh_distillery_data(slug)[0]) if revalidate else fetch_distillery_payload,
+        max_workers, rate_limit,
+    )
+    
+    # Per ogni distilleria nella lista, carica i dati storici (map mantiene l'ordine);
+    # tqdm viene importato solo qui, non all'avvio dell'app
+    from tqdm import tqdm
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(tqdm(executor.map(fetch, slugs), total=len(slugs), desc="Caricamento dati distillerie"))
+    
+    if not revalidate:
+        return combine_distillery_payloads(slugs, results)
+    
+    all_data = [distillery_data for distillery_data in results if not distillery_data.empty]
+    
+    # Se non sono stati caricati dati, ritorna un DataFrame vuoto
+    if not all_data:
         return pd.DataFrame()
+    
+    # Combina tutti i dati storici in un unico DataFrame
+    with metrics.timed("concat") as measure:
+        df_data = pd.concat(all_data, ignore_index=True)
+        measure['rows'] = len(df_data)
+    return df_data
+
+def iter_histories(slugs, max_workers=8, rate_limit=20.0, batch_size=10):
+    """
+    Scarica in parallelo gli storici restituendoli a blocchi man mano che arrivano.
+    
+    A differenza di load_histories non attende la fine di tutte le richieste:
+    ogni blocco può essere mostrato subito.
+    
+    Args:
+        slugs (list): Slug delle distillerie da scaricare
+        max_workers (int): Numero massimo di richieste contemporanee
+        rate_limit (float): Numero massimo di richieste al secondo (None per nessun limite)
+        batch_size (int): Numero di distillerie completate per blocco
+        
+    Yields:
+        tuple: (slug completati nel blocco, DataFrame con i loro storici)
+    """
+    fetch = _rate_limited(fetch_distillery_payload, max_workers, rate_limit)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {executor.submit(fetch, slug): slug for slug in slugs}
+        done_slugs, batch = [], []
+        for completed, future in enumerate(as_completed(futures), start=1):
+            done_slugs.append(futures[future])
+            batch.append(future.result())
+            if len(done_slugs) == batch_size or completed == len(futures):
+                yield done_slugs, combine_distillery_payloads(done_slugs, batch)
+                done_slugs, batch = [], []
+    finally:
+        # Se il consumatore si interrompe, le richieste non ancora partite vengono annullate
+        executor.shutdown(wait=False, cancel_futures=True)
 
-def build_combined_dataframe(top_n=50, wait_time=0.1):
+def build_combined_dataframe(top_n=50, wait_time=None, max_workers=8, rate_limit=20.0, df_info=None):
     """
     Costruisce il DataFrame combinato per l'analisi di dashboard.
     
     Args:
-        top_n (int): Il numero di distillerie con rating più alto da analizzare
-        wait_time (float): Tempo di attesa tra le richieste API per evitare sovraccarichi
+        top_n (int): Il numero di distillerie con rating più alto da analizzare (None per tutte)
+        wait_time (float): Intervallo medio tra le richieste API; se indicato sostituisce rate_limit
+        max_workers (int): Numero massimo di richieste contemporanee (1 per il caricamento seriale)
+        rate_limit (float): Numero massimo di richieste al secondo (None per nessun limite)
+        df_info (pandas.DataFrame): Informazioni sulle distillerie già caricate, per evitare di riscaricarle
         
     Returns:
-       df_data è il DataFrame con i dati storici di tutte le distillerie
+       df_data è il DataFrame con i dati storici di tutte le distillerie (vuoto in caso di errore)
     """
-    # Carica le informazioni di base sulle distillerie
-    df_info = load_distilleries_info()
+    # Carica le informazioni di base sulle distillerie, se non già fornite
+    if df_info is None:
+        df_info = load_distilleries_info()
     if df_info.empty:
-        return df_info, pd.DataFrame()
+        return pd.DataFrame()
     
     # Filtra per le distillerie con rating più alto
-    top_distilleries = df_info.sort_values(by="whiskybase_rating", ascending=False).head(top_n)
+    slugs = select_top_slugs(df_info, top_n)
     
-    # Prepara una lista per i dati storici
-    all_data = []
+    # Limite di richieste al secondo condiviso da tutti i thread
+    if wait_time:
+        rate_limit = 1 / wait_time
     
-    # Per ogni distilleria nella lista, carica i dati storici
-    print(f"Caricamento dati per le {top_n} distillerie con rating più alto...")
-    for _, row in tqdm(top_distilleries.iterrows(), total=len(top_distilleries), desc="Caricamento dati distillerie"):
-        slug = row['slug']
-        distillery_data = load_distillery_data(slug)
+    print(f"Caricamento dati per le {len(slugs)} distillerie con rating più alto...")
+    return load_histories(slugs, max_workers=max_workers, rate_limit=rate_limit)
+
+
+def iter_combined_dataframe(top_n=50, max_workers=8, rate_limit=20.0, df_info=None, batch_size=10):
+    """
+    Versione progressiva di build_combined_dataframe.
+    
+    Args:
+        top_n (int): Il numero di distillerie con rating più alto da analizzare (None per tutte)
+        max_workers (int): Numero massimo di richieste contemporanee
+        rate_limit (float): Numero massimo di richieste al secondo (None per nessun limite)
+        df_info (pandas.DataFrame): Informazioni sulle distillerie già caricate
+        batch_size (int): Numero di distillerie completate per blocco
         
-        if not distillery_data.empty:
-            all_data.append(distillery_data)
+    Yields:
+        tuple: (slug completati nel blocco, DataFrame con i loro storici)
+    """
+    if df_info is None:
+        df_info = load_distilleries_info()
+    if df_info.empty:
+        return
+    
+    slugs = select_top_slugs(df_info, top_n)
+    yield from iter_histories(slugs, max_workers=max_workers, rate_limit=rate_limit, batch_size=batch_size)
+
+
+# Colonne testuali ripetute su ogni riga mensile, da convertire in categorie
+CATEGORY_COLUMNS = ['slug', 'name', 'country']
+PRICE_COLUMNS = ['winning_bid_max', 'winning_bid_min', 'winning_bid_mean', 'trading_volume']
+
+
+def optimize_dtypes(df_data, drop_columns=(), tolerance=0.005):
+    """
+    Riduce l'occupazione di memoria del DataFrame storico.
+    
+    slug, name e country diventano categorie, lots_count l'intero più piccolo
+    che contiene i valori e i prezzi float32 quando la conversione non altera
+    i valori oltre la tolleranza indicata (mezzo centesimo di default).
+    
+    Args:
+        df_data (pandas.DataFrame): Dati storici combinati
+        drop_columns (list): Colonne da eliminare perché non usate dalla dashboard
+        tolerance (float): Errore assoluto massimo accettato per i prezzi in float32
         
-        # Breve pausa per non sovraccaricare l'API
-        time.sleep(wait_time)
+    Returns:
+        pandas.DataFrame: Nuovo DataFrame con tipi compatti
+    """
+    if df_data.empty:
+        return df_data
     
-    # Se non sono stati caricati dati, ritorna un DataFrame vuoto
-    if not all_data:
-        return df_info, pd.DataFrame()
+    df = df_data.drop(columns=[col for col in drop_columns if col in df_data.columns])
     
-    # Combina tutti i dati storici in un unico DataFrame
-    df_data = pd.concat(all_data, ignore_index=True)
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
     
-    return df_data
-'''
-if __name__ == "__main__":
-    # Test delle funzioni
-    df_info, df_data = build_combined_dataframe(top_n=5)  # Test con solo 5 distillerie
+    if 'lots_count' in df.columns:
+        if df['lots_count'].isna().any():
+            df['lots_count'] = df['lots_count'].astype('Int32')
+        else:
+            df['lots_count'] = pd.to_numeric(df['lots_count'], downcast='unsigned')
     
-    print(f"Informazioni distillerie: {df_info.shape[0]} righe, {df_info.shape[1]} colonne")
-    if not df_info.empty:
-        print(df_info.head())
+    for col in PRICE_COLUMNS:
+        if col in df.columns:
+            compact = df[col].astype('float32')
+            error = (compact.astype('float64') - df[col]).abs().max()
+            if not error > tolerance:
+                df[col] = compact
     
-    print(f"Dati storici: {df_data.shape[0]} righe, {df_data.shape[1]} colonne")
-    if not df_data.empty:
-        print(df_data.head())
-'''
\ No newline at end of file
+    return df
+
+
+def concat_compact(frames):
+    """
+    Concatena storici già convertiti con optimize_dtypes mantenendo le categorie.
+    
+    pd.concat trasforma in object le colonne categoriche con categorie diverse:
+    qui le categorie vengono prima unificate, così la concatenazione copia solo
+    i codici interi.
+    
+    Args:
+        frames (list): DataFrame storici
+        
+    Returns:
+        pandas.DataFrame: Storici concatenati
+    """
+    frames = [df for df in frames if not df.empty]
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0]
+    for col in CATEGORY_COLUMNS:
+        if all(col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype) for df in frames):
+            categories = union_categoricals([df[col] for df in frames]).categories
+            frames = [df.assign(**{col: df[col].cat.set_categories(categories)}) for df in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def memory_usage_bytes(df):
+    """Restituisce la memoria occupata dal DataFrame, stringhe comprese."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def main(argv=None):
+    """
+    Riga di comando per creare e ispezionare snapshot offline e database del dataset.
+    
+    Esempi:
+        python data_loader.py export snapshots/latest
+        python data_loader.py export snapshots/top100 --top-n 100
+        python data_loader.py info snapshots/latest
+        python data_loader.py db data/whisky.db
+    """
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Snapshot offline dei dati WhiskyHunter")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    export = commands.add_parser("export", help="Scarica il dataset completo e lo salva come snapshot")
+    export.add_argument("directory", help="Cartella di destinazione dello snapshot")
+    export.add_argument("--top-n", type=int, default=None, help="Solo le N distillerie con rating più alto (default: tutte)")
+    export.add_argument("--workers", type=int, default=8, help="Richieste contemporanee")
+    export.add_argument("--rate-limit", type=float, default=20.0, help="Richieste al secondo")
+    
+    info = commands.add_parser("info", help="Mostra il manifest di uno snapshot")
+    info.add_argument("directory", help="Cartella dello snapshot")
+    
+    db = commands.add_parser("db", help="Scarica il dataset completo e lo salva in un database SQLite")
+    db.add_argument("path", help="File del database (creato o aggiornato)")
+    db.add_argument("--top-n", type=int, default=None, help="Solo le N distillerie con rating più alto (default: tutte)")
+    db.add_argument("--workers", type=int, default=8, help="Richieste contemporanee")
+    db.add_argument("--rate-limit", type=float, default=20.0, help="Richieste al secondo")
+    
+    args = parser.parse_args(argv)
+    
+    # Import locali: dataset e snapshot importano a loro volta questo modulo
+    from dataset import WhiskyDataset
+    from snapshot import export_snapshot, read_manifest
+    
+    if args.command == "db":
+        from database import export_database
+        
+        distilleries, rows = export_database(args.path, top_n=args.top_n, max_workers=args.workers, rate_limit=args.rate_limit)
+        if not distilleries:
+            print("Impossibile caricare i dati delle distillerie.")
+            return 1
+        print(f"Database {args.path} aggiornato: {distilleries} distillerie, {rows} righe di storico")
+    elif args.command == "export":
+        # Lo snapshot conserva lo storico completo: la conversione in tipi compatti
+        # avviene al caricamento (WhiskyDataset.from_snapshot)
+        result = WhiskyDataset(top_n=args.top_n, max_workers=args.workers, rate_limit=args.rate_limit, compact=False).load()
+        if not result.ok:
+            print("Impossibile caricare i dati delle distillerie.")
+            return 1
+        manifest = export_snapshot(result, args.directory, source=API_BASE_URL)
+        print(f"Snapshot {manifest['snapshot_id']} salvato in {args.directory}: "
+              f"{manifest['distilleries']} distillerie, {manifest['files']['history']['rows']} righe di storico")
+    else:
+        print(json.dumps(read_manifest(args.directory), indent=2))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
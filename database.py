@@ -0,0 +1,569 @@
+"""
+Archivio SQLite del dataset e risultati della dashboard basati su query.
+
+data_loader salva distillerie e storici in un database locale (tabella history
+con chiave primaria (slug, dt) e indice su dt); le pagine interrogano il
+database solo per le righe che mostrano: classifiche, medie, indice di mercato
+e storici di singole distillerie sono query con filtri, raggruppamenti e LIMIT
+eseguiti da SQLite, quindi lo storico completo non deve stare in memoria.
+"""
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from aggregates import Aggregates, HISTORY_COLUMNS, HISTORY_STATS, compute_aggregates
+from analytics import compute_market_analytics
+from dataset import DatasetResult, FetchStats
+
+INFO_COLUMNS = ['slug', 'name', 'country', 'whiskybase_whiskies', 'whiskybase_votes', 'whiskybase_rating']
+DATA_COLUMNS = ['slug', 'dt', 'name', 'winning_bid_max', 'winning_bid_min', 'winning_bid_mean',
+                'trading_volume', 'lots_count']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS distilleries (
+    slug TEXT PRIMARY KEY,
+    name TEXT,
+    country TEXT,
+    whiskybase_whiskies REAL,
+    whiskybase_votes REAL,
+    whiskybase_rating REAL
+);
+CREATE INDEX IF NOT EXISTS distilleries_country ON distilleries (country);
+
+-- Righe ordinate fisicamente per (slug, dt): lo storico di una distilleria è contiguo
+CREATE TABLE IF NOT EXISTS history (
+    slug TEXT NOT NULL,
+    dt TEXT NOT NULL,
+    name TEXT,
+    winning_bid_max REAL,
+    winning_bid_min REAL,
+    winning_bid_mean REAL,
+    trading_volume REAL,
+    lots_count INTEGER,
+    PRIMARY KEY (slug, dt)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS history_dt ON history (dt);
+"""
+
+# Funzioni SQL corrispondenti alle statistiche di aggregates.HISTORY_STATS
+SQL_STATS = {'mean': 'AVG', 'sum': 'SUM', 'min': 'MIN', 'max': 'MAX', 'count': 'COUNT'}
+
+
+class WhiskyDatabase:
+    """
+    Database SQLite con distillerie e storici.
+
+    Ogni thread usa una propria connessione (le sessioni Streamlit girano su
+    thread diversi); close chiude quelle aperte da tutti i thread. Si può usare
+    come context manager per chiuderle all'uscita dal blocco.
+
+    Args:
+        path (str): File del database (viene creato se non esiste)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def connection(self):
+        """Connessione SQLite del thread corrente."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # check_same_thread=False solo perché close possa chiuderla da un altro
+            # thread: durante l'uso ogni connessione resta del thread che l'ha aperta
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            with self._lock:
+                self._connections.append(conn)
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Chiude le connessioni di tutti i thread; le query successive ne aprono di nuove."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        for conn in connections:
+            conn.close()
+
+    def query(self, sql, params=(), stage="db_query"):
+        """
+        Esegue una query e restituisce il risultato come DataFrame.
+
+        Args:
+            sql (str): Query SQL con segnaposto ?
+            params (tuple): Valori dei segnaposto
+            stage (str): Nome della fase registrata nelle metriche
+
+        Returns:
+            pandas.DataFrame: Righe restituite
+        """
+        with metrics.timed(stage) as measure:
+            df = pd.read_sql_query(sql, self.connection(), params=params)
+            measure['rows'] = len(df)
+        if 'dt' in df.columns:
+            df['dt'] = pd.to_datetime(df['dt'])
+        return df
+
+    def scalar(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchone()[0]
+
+    def write_info(self, df_info):
+        """Inserisce o aggiorna le informazioni sulle distillerie."""
+        columns = [col for col in INFO_COLUMNS if col in df_info.columns]
+        rows = df_info[columns].astype(object).where(df_info[columns].notna(), None).itertuples(index=False, name=None)
+        placeholders = ", ".join("?" * len(columns))
+        with self.connection() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO distilleries ({', '.join(columns)}) VALUES ({placeholders})", rows
+            )
+
+    def write_history(self, df_data, replace=False):
+        """
+        Inserisce o aggiorna righe di storico; a parità di (slug, dt) prevale la nuova.
+
+        Args:
+            df_data (pandas.DataFrame): Storici nel formato di data_loader
+            replace (bool): Se cancellare prima tutte le righe delle distillerie presenti
+                in df_data, così i mesi non più restituiti dall'API non restano nel database
+
+        Returns:
+            int: Righe scritte
+        """
+        if df_data.empty:
+            return 0
+        columns = [col for col in DATA_COLUMNS if col in df_data.columns]
+        frame = df_data[columns].copy()
+        frame['dt'] = frame['dt'].dt.strftime('%Y-%m-%d')
+        frame = frame.astype(object).where(frame.notna(), None)
+        placeholders = ", ".join("?" * len(columns))
+        with self.connection() as conn:
+            if replace:
+                conn.executemany("DELETE FROM history WHERE slug = ?", ((slug,) for slug in frame['slug'].unique()))
+            conn.executemany(
+                f"INSERT OR REPLACE INTO history ({', '.join(columns)}) VALUES ({placeholders})",
+                frame.itertuples(index=False, name=None),
+            )
+        return len(frame)
+
+    def prune(self, info_slugs, history_slugs):
+        """
+        Cancella distillerie e storici non più esportati.
+
+        Args:
+            info_slugs (list): Slug delle distillerie da conservare
+            history_slugs (list): Slug di cui conservare gli storici
+
+        Returns:
+            tuple: (distillerie cancellate, righe di storico cancellate)
+        """
+        with self.connection() as conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep (slug TEXT PRIMARY KEY, history INTEGER)")
+            conn.execute("DELETE FROM keep")
+            conn.executemany("INSERT OR IGNORE INTO keep (slug, history) VALUES (?, 0)", ((slug,) for slug in info_slugs))
+            conn.executemany("INSERT OR REPLACE INTO keep (slug, history) VALUES (?, 1)", ((slug,) for slug in history_slugs))
+            info = conn.execute("DELETE FROM distilleries WHERE slug NOT IN (SELECT slug FROM keep)").rowcount
+            history = conn.execute("DELETE FROM history WHERE slug NOT IN (SELECT slug FROM keep WHERE history)").rowcount
+            conn.execute("DELETE FROM keep")
+        return info, history
+
+    def analyze(self):
+        """Aggiorna le statistiche usate dal pianificatore delle query."""
+        with self.connection() as conn:
+            conn.execute("ANALYZE")
+
+
+def _where(filters, alias="h"):
+    # Condizioni SQL (e parametri) corrispondenti ai filtri sullo storico
+    clauses, params = [], []
+    if filters is None:
+        return clauses, params
+    if filters.start is not None:
+        clauses.append(f"{alias}.dt >= ?")
+        params.append(filters.start.strftime('%Y-%m-%d'))
+    if filters.end is not None:
+        clauses.append(f"{alias}.dt <= ?")
+        params.append(filters.end.strftime('%Y-%m-%d'))
+    if filters.countries or filters.min_rating is not None:
+        conditions, values = [], []
+        if filters.countries:
+            conditions.append(f"country IN ({', '.join('?' * len(filters.countries))})")
+            values.extend(filters.countries)
+        if filters.min_rating is not None:
+            conditions.append("whiskybase_rating >= ?")
+            values.append(filters.min_rating)
+        clauses.append(f"{alias}.slug IN (SELECT slug FROM distilleries WHERE {' AND '.join(conditions)})")
+        params.extend(values)
+    return clauses, params
+
+
+def _sql(select, filters, tail=""):
+    clauses, params = _where(filters)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return f"{select}{where}{tail}", tuple(params)
+
+
+class DatabaseIndex:
+    """
+    Come DistilleryIndex, ma gli storici vengono letti dal database alla richiesta.
+
+    Args:
+        database (WhiskyDatabase): Database
+        df_info (pandas.DataFrame): Informazioni delle distillerie incluse
+        filters (filters.Filters): Filtri applicati (None per nessuno)
+    """
+
+    def __init__(self, database, df_info, filters=None):
+        self._db = database
+        self._filters = filters
+        info = df_info.drop_duplicates(subset='slug').sort_values(by='name')
+        self._info = info.set_index('slug').to_dict('index')
+        self.all_names = info['name'].drop_duplicates().tolist()
+
+        sql, params = _sql("SELECT DISTINCT h.slug FROM history h", filters)
+        self._slugs = set(database.query(sql, params)['slug'])
+        available = info[info['slug'].isin(self._slugs)]
+        self.available_names = available['name'].tolist()
+        self._slug_by_name = {}
+        for name, slug in zip(available['name'], available['slug']):
+            self._slug_by_name.setdefault(name, slug)
+        for name, slug in zip(info['name'], info['slug']):
+            self._slug_by_name.setdefault(name, slug)
+
+    def __len__(self):
+        return len(self._slugs)
+
+    def __contains__(self, slug):
+        return slug in self._slugs
+
+    def slug_for(self, name):
+        return self._slug_by_name.get(name)
+
+    def info_for(self, slug):
+        return self._info.get(slug, {})
+
+    def history_for(self, slug):
+        """Storico della distilleria (nel periodo filtrato) letto con la chiave primaria (slug, dt)."""
+        clauses, params = _where(self._filters)
+        columns = ", ".join(f"h.{col}" for col in DATA_COLUMNS)
+        sql = f"SELECT {columns} FROM history h WHERE {' AND '.join(['h.slug = ?'] + clauses)} ORDER BY h.dt"
+        return self._db.query(sql, (slug, *params), stage="db_history")
+
+
+@dataclass
+class DatabaseAggregates(Aggregates):
+    """Aggregati delle informazioni in memoria; classifiche e medie degli storici calcolate da SQLite."""
+    database: WhiskyDatabase = None
+    filters: object = None
+
+    def top_distilleries(self, column, k=10):
+        """
+        Come Aggregates.top_distilleries, con raggruppamento, ordinamento e LIMIT eseguiti dal database.
+
+        Args:
+            column (str): Statistica "<colonna>_<statistica>", ad esempio "trading_volume_sum"
+            k (int): Numero di distillerie (None per tutte)
+
+        Returns:
+            pandas.DataFrame: Colonne name e column, in ordine decrescente
+        """
+        if (column, k) not in self._top_cache:
+            source, stat = column.rsplit('_', 1)
+            if source not in HISTORY_COLUMNS or stat not in HISTORY_STATS:
+                raise KeyError(column)
+            function = SQL_STATS[stat]
+            sql, params = _sql(
+                f"SELECT h.name AS name, {function}(h.{source}) AS {column} FROM history h", self.filters,
+                tail=f" GROUP BY h.name HAVING {column} IS NOT NULL ORDER BY {column} DESC, h.name"
+                     + (" LIMIT ?" if k else ""),
+            )
+            self._top_cache[(column, k)] = self.database.query(sql, params + ((k,) if k else ()), stage="db_ranking")
+        return self._top_cache[(column, k)]
+
+
+def _aggregates(database, df_info, filters):
+    # Aggregati delle informazioni come in memoria, più le medie globali degli storici via SQL
+    base = compute_aggregates(df_info, pd.DataFrame())
+    sql, params = _sql("SELECT AVG(h.winning_bid_mean) AS winning_bid_mean, AVG(h.trading_volume) AS trading_volume FROM history h", filters)
+    means = dict(base.means)
+    for col, value in database.query(sql, params, stage="db_kpi").iloc[0].items():
+        if pd.notna(value):
+            means[col] = value
+    return DatabaseAggregates(
+        country_counts=base.country_counts,
+        info_describe=base.info_describe,
+        means=means,
+        top_rating=base.top_rating,
+        database=database,
+        filters=filters,
+    )
+
+
+@dataclass(frozen=True)
+class DatabaseResult(DatasetResult):
+    """
+    DatasetResult basato sul database: info è in memoria, history resta vuoto
+    e storici, classifiche e medie vengono letti con query.
+    """
+    database: WhiskyDatabase = None
+
+    @cached_property
+    def filter_index(self):
+        return DatabaseFilterIndex(self)
+
+    @cached_property
+    def analytics(self):
+        """Analisi di mercato calcolate con query (DatabaseAnalytics)."""
+        return DatabaseAnalytics(self.database, self.filters)
+
+
+# Rendimenti rispetto al mese precedente di ogni distilleria, sommati per
+# (mese, mese precedente): la finestra LAG segue la chiave primaria (slug, dt) e
+# il risultato ha poche righe per mese, senza la matrice mesi × distillerie.
+# Come in MarketAnalytics.returns, conta solo il rendimento rispetto al mese
+# precedente dell'intero mercato (prev_dt uguale al mese prima nel calendario del mercato)
+RETURNS_SQL = """
+WITH steps AS (
+    SELECT h.dt, h.winning_bid_mean AS price, h.trading_volume AS volume,
+           LAG(h.dt) OVER w AS prev_dt, LAG(h.winning_bid_mean) OVER w AS prev_price,
+           COALESCE(LAG(h.trading_volume) OVER w, 0) AS weight
+    FROM history h{where}
+    WINDOW w AS (PARTITION BY h.slug ORDER BY h.dt)
+),
+returns AS (
+    SELECT dt, prev_dt, volume, weight, CASE WHEN prev_price <> 0 THEN price / prev_price - 1.0 END AS ret
+    FROM steps
+)
+SELECT dt, prev_dt,
+       SUM(ret) AS ret_sum, COUNT(ret) AS ret_count,
+       SUM(ret * weight) AS weighted_sum, SUM(CASE WHEN ret IS NOT NULL THEN weight END) AS weight_sum,
+       SUM(volume) AS volume
+FROM returns
+GROUP BY dt, prev_dt
+"""
+
+
+class DatabaseAnalytics:
+    """
+    Come analytics.MarketAnalytics, con le aggregazioni eseguite da SQLite.
+
+    L'indice di mercato è una query raggruppata per mese e la classifica per
+    volume una query con LIMIT; prezzi e rendimenti vengono letti solo per le
+    distillerie mostrate nella heatmap (by_volume).
+
+    Args:
+        database (WhiskyDatabase): Database
+        filters (filters.Filters): Filtri applicati (None per nessuno)
+    """
+
+    def __init__(self, database, filters=None):
+        self._db = database
+        self._filters = filters
+        self._cache = {}
+        sql, params = _sql("SELECT COUNT(DISTINCT h.slug) FROM history h", filters)
+        self._size = database.scalar(sql, params)
+
+    def __len__(self):
+        return self._size
+
+    def _monthly(self):
+        # Rendimenti medi (semplici e pesati), distillerie e volume per mese
+        if 'monthly' not in self._cache:
+            clauses, params = _where(self._filters)
+            where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+            steps = self._db.query(RETURNS_SQL.format(where=where), tuple(params), stage="db_analytics")
+            dates = np.sort(steps['dt'].unique())
+            previous = pd.Series(np.concatenate(([np.datetime64('NaT')], dates[:-1])), index=dates)
+            steps['prev_dt'] = pd.to_datetime(steps['prev_dt'])
+            steps = steps.assign(volume=steps['volume'].fillna(0.0))
+            # Fuori dal calendario del mercato (mese mancante in mezzo) il rendimento non conta
+            outside = steps['prev_dt'].to_numpy() != previous.loc[steps['dt']].to_numpy()
+            steps.loc[outside, ['ret_sum', 'ret_count', 'weighted_sum', 'weight_sum']] = 0
+            monthly = steps.groupby('dt', sort=True)[['ret_sum', 'ret_count', 'weighted_sum', 'weight_sum', 'volume']].sum()
+            with np.errstate(invalid='ignore', divide='ignore'):
+                equal = np.where(monthly['ret_count'] > 0, monthly['ret_sum'] / monthly['ret_count'], 0.0)
+                weighted = np.where(monthly['weight_sum'] > 0, monthly['weighted_sum'] / monthly['weight_sum'], 0.0)
+            self._cache['monthly'] = pd.DataFrame({
+                'dt': monthly.index.to_numpy(),
+                'equal': equal,
+                'volume': weighted,
+                'distilleries': monthly['ret_count'].to_numpy(dtype='int64'),
+                'total_volume': monthly['volume'].to_numpy(dtype='float64'),
+            })
+        return self._cache['monthly']
+
+    def market_index(self, weighting='equal', base=100.0):
+        """Come MarketAnalytics.market_index, a partire dai rendimenti mensili calcolati dal database."""
+        key = ('market_index', weighting, base)
+        if key not in self._cache:
+            monthly = self._monthly()
+            mean_return = monthly['volume' if weighting == 'volume' else 'equal'].to_numpy(dtype='float64')
+            self._cache[key] = pd.DataFrame({
+                'dt': monthly['dt'].to_numpy(),
+                'index': base * np.cumprod(1.0 + mean_return),
+                'return': mean_return,
+                'distilleries': monthly['distilleries'].to_numpy(),
+                'volume': monthly['total_volume'].to_numpy(dtype='float64'),
+            })
+        return self._cache[key]
+
+    def by_volume(self, k):
+        """
+        Come MarketAnalytics.by_volume: le k distillerie con più volume sono scelte
+        con una query e solo i loro storici vengono letti.
+
+        Args:
+            k (int): Numero di distillerie
+
+        Returns:
+            MarketAnalytics: Matrici (mesi di tutto il mercato, k distillerie)
+        """
+        key = ('by_volume', k)
+        if key not in self._cache:
+            sql, params = _sql(
+                "SELECT h.slug FROM history h", self._filters,
+                tail=" GROUP BY h.slug ORDER BY COALESCE(SUM(h.trading_volume), 0) DESC, h.slug LIMIT ?",
+            )
+            slugs = self._db.query(sql, params + (k,), stage="db_analytics")['slug'].tolist()
+            clauses, params = _where(self._filters)
+            clauses.insert(0, f"h.slug IN ({', '.join('?' * len(slugs))})")
+            sql = (
+                "SELECT h.slug, h.name, h.dt, h.winning_bid_mean, h.trading_volume FROM history h"
+                f" WHERE {' AND '.join(clauses)} ORDER BY h.slug, h.dt"
+            )
+            rows = self._db.query(sql, (*slugs, *params), stage="db_analytics")
+            market = compute_market_analytics(rows, dates=self._monthly()['dt'].to_numpy())
+            self._cache[key] = market.by_volume(k) if len(market) else market
+        return self._cache[key]
+
+
+class DatabaseFilterIndex:
+    """
+    Equivalente di filters.FilterIndex per DatabaseResult: i filtri diventano condizioni SQL.
+
+    Args:
+        result (DatabaseResult): Risultato completo
+        max_size (int): Numero di risultati filtrati da memorizzare
+    """
+
+    def __init__(self, result, max_size=16):
+        self._result = result
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_size = max_size
+        info = result.info
+        self.countries = sorted(info['country'].dropna().unique().tolist())
+        ratings = info['whiskybase_rating'].dropna()
+        self.rating_range = (float(ratings.min()), float(ratings.max())) if not ratings.empty else None
+        first, last = result.database.connection().execute("SELECT MIN(dt), MAX(dt) FROM history").fetchone()
+        self.date_range = (pd.Timestamp(first), pd.Timestamp(last)) if first else None
+
+    def apply(self, filters):
+        with self._lock:
+            if filters in self._cache:
+                self._cache.move_to_end(filters)
+                return self._cache[filters]
+
+        result, database = self._result, self._result.database
+        df_info = result.info
+        if filters.countries:
+            df_info = df_info[df_info['country'].isin(filters.countries)]
+        if filters.min_rating is not None:
+            df_info = df_info[df_info['whiskybase_rating'] >= filters.min_rating]
+        filtered = DatabaseResult(
+            info=df_info,
+            stats=result.stats,
+            index=DatabaseIndex(database, df_info, filters),
+            aggregates=_aggregates(database, df_info, filters),
+            version=result.version,
+            filters=filters,
+            database=database,
+        )
+        with self._lock:
+            self._cache[filters] = filtered
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return filtered
+
+
+def load_database(path, version=0):
+    """
+    Apre il database e costruisce il risultato completo senza caricare gli storici.
+
+    Args:
+        path (str): File del database
+        version (int): Versione da assegnare al risultato
+
+    Returns:
+        DatabaseResult: Risultato basato su query (info vuoto se il database è vuoto)
+    """
+    database = WhiskyDatabase(path)
+    df_info = database.query("SELECT * FROM distilleries", stage="db_info")
+    stats = FetchStats(
+        requested=len(df_info),
+        loaded=database.scalar("SELECT COUNT(DISTINCT slug) FROM history"),
+        rows=database.scalar("SELECT COUNT(*) FROM history"),
+    )
+    return DatabaseResult(
+        info=df_info,
+        stats=stats,
+        index=DatabaseIndex(database, df_info),
+        aggregates=_aggregates(database, df_info, None),
+        version=version,
+        database=database,
+    )
+
+
+def export_database(path, top_n=None, max_workers=8, rate_limit=20.0, batch_size=20):
+    """
+    Scarica informazioni e storici dall'API e li salva nel database.
+
+    Gli storici vengono scritti a blocchi man mano che arrivano (iter_histories),
+    quindi in memoria resta al più un blocco alla volta. Ogni distilleria scaricata
+    sostituisce le proprie righe (i mesi spariti dall'API vengono cancellati); le
+    distillerie non più esportate vengono rimosse, mentre quelle il cui download
+    è fallito o vuoto conservano lo storico precedente.
+
+    Args:
+        path (str): File del database
+        top_n (int): Solo le N distillerie con rating più alto (None per tutte)
+        max_workers (int): Richieste contemporanee
+        rate_limit (float): Richieste al secondo
+        batch_size (int): Distillerie per blocco scritto
+
+    Returns:
+        tuple: (distillerie salvate, righe di storico salvate)
+    """
+    from data_loader import iter_histories, load_distilleries_info, select_top_slugs
+
+    df_info = load_distilleries_info()
+    if df_info.empty:
+        return 0, 0
+    rows = 0
+    slugs = select_top_slugs(df_info, top_n)
+    with WhiskyDatabase(path) as database:
+        database.write_info(df_info)
+        for _, df_batch in iter_histories(slugs, max_workers=max_workers, rate_limit=rate_limit, batch_size=batch_size):
+            rows += database.write_history(df_batch, replace=True)
+        database.prune(df_info['slug'].tolist(), slugs)
+        database.analyze()
+    return len(df_info), rows
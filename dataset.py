@@ -0,0 +1,515 @@
+"""
+Punto di ingresso unico per il caricamento del dataset della dashboard.
+"""
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from functools import cached_property
+
+import pandas as pd
+
+import metrics
+from aggregates import Aggregates, compute_aggregates, merge_aggregates
+from analytics import compute_market_analytics
+from data_loader import (
+    load_distilleries_info,
+    build_combined_dataframe,
+    concat_compact,
+    iter_histories,
+    load_histories,
+    memory_usage_bytes,
+    optimize_dtypes,
+    select_top_slugs,
+)
+from distillery_index import DistilleryIndex
+from filters import FilterIndex
+
+# Colonne dello storico che nessuna pagina mostra: eliminate con la conversione in tipi compatti
+UNUSED_HISTORY_COLUMNS = ['winning_bid_max', 'winning_bid_min']
+
+
+@dataclass
+class FetchStats:
+    """Statistiche di un caricamento del dataset."""
+    requested: int = 0
+    loaded: int = 0
+    rows: int = 0
+    info_seconds: float = 0.0
+    history_seconds: float = 0.0
+    memory_raw: int = 0
+    memory: int = 0
+
+    @property
+    def missing(self):
+        """Numero di distillerie richieste per cui non sono arrivati dati."""
+        return self.requested - self.loaded
+
+    @property
+    def total_seconds(self):
+        return self.info_seconds + self.history_seconds
+
+
+@dataclass(frozen=True)
+class DatasetResult:
+    """
+    Risultato di un caricamento: informazioni, storici e statistiche.
+
+    È immutabile e condiviso tra tutte le sessioni: un aggiornamento dei dati
+    pubblica un nuovo DatasetResult invece di modificare quello esistente.
+    Anche i DataFrame sono condivisi e vanno trattati in sola lettura: chi
+    deve modificarli lavora su una copia esplicita (df.copy()). Con pandas 3
+    (copy-on-write, vedi requirements.txt) le modifiche a colonne e fette
+    estratte non arrivano mai ai DataFrame condivisi; restano vietate solo le
+    modifiche dirette (assegnazione di colonne o righe, inplace=True).
+
+    Attributes:
+        info (pandas.DataFrame): Informazioni su tutte le distillerie
+        history (pandas.DataFrame): Dati storici delle distillerie caricate
+        stats (FetchStats): Statistiche del caricamento
+        index (DistilleryIndex): Storici e informazioni indicizzati per slug
+        aggregates (Aggregates): Statistiche precalcolate per classifiche e metriche
+        version (int): Numero progressivo della pubblicazione (WhiskyDataset.version)
+        filters (filters.Filters): Filtri applicati (None per il risultato completo)
+    """
+    info: pd.DataFrame = field(default_factory=pd.DataFrame)
+    history: pd.DataFrame = field(default_factory=pd.DataFrame)
+    stats: FetchStats = field(default_factory=FetchStats)
+    index: DistilleryIndex = None
+    aggregates: Aggregates = None
+    version: int = 0
+    filters: object = None
+
+    def __post_init__(self):
+        if self.index is None:
+            object.__setattr__(self, 'index', DistilleryIndex(self.info, self.history))
+        if self.aggregates is None:
+            object.__setattr__(self, 'aggregates', compute_aggregates(self.info, self.history))
+
+    @property
+    def ok(self):
+        """Indica se le informazioni di base sulle distillerie sono disponibili."""
+        return not self.info.empty
+
+    @property
+    def key(self):
+        """Identifica dati e filtri del risultato, ad esempio nelle chiavi della cache dei grafici."""
+        return (self.version, self.filters)
+
+    @cached_property
+    def filter_index(self):
+        """Strutture per applicare i filtri (filters.FilterIndex), costruite al primo accesso."""
+        with metrics.timed("filter_index") as measure:
+            index = FilterIndex(self)
+            measure['rows'] = len(self.history)
+        return index
+
+    def filtered(self, filters):
+        """
+        Restituisce il risultato ristretto ai filtri (se stesso se nessun filtro è attivo).
+
+        Args:
+            filters (filters.Filters): Filtri da applicare
+
+        Returns:
+            DatasetResult: Risultato filtrato
+        """
+        if filters is None or not filters.active:
+            return self
+        return self.filter_index.apply(filters)
+
+    @cached_property
+    def analytics(self):
+        """Matrici di mercato (analytics.MarketAnalytics), calcolate al primo accesso."""
+        with metrics.timed("analytics") as measure:
+            market = compute_market_analytics(self.history)
+            measure['rows'] = len(self.history)
+        return market
+
+
+class WhiskyDataset:
+    """
+    Carica il dataset della dashboard scaricando l'elenco delle distillerie una sola volta.
+
+    In modalità lazy all'avvio viene scaricato solo l'elenco delle distillerie;
+    gli storici vengono scaricati alla prima richiesta (ensure_loaded) ed
+    eventualmente precaricati in background per le distillerie più popolari.
+
+    Args:
+        top_n (int): Numero di distillerie con rating più alto di cui caricare lo storico (None per tutte)
+        max_workers (int): Numero massimo di richieste contemporanee
+        rate_limit (float): Numero massimo di richieste al secondo
+        compact (bool): Se convertire lo storico in tipi compatti ed eliminare le colonne
+            non usate (vedi optimize_dtypes e UNUSED_HISTORY_COLUMNS)
+        lazy (bool): Se caricare gli storici solo quando servono
+        prefetch (int): In modalità lazy, numero di distillerie più votate da precaricare in background
+        publish_interval (float): Secondi minimi tra due pubblicazioni del precaricamento
+        defer_prefetch (bool): Se avviare il precaricamento solo dopo mark_first_paint,
+            così non rallenta la prima visualizzazione
+    """
+
+    def __init__(self, top_n=50, max_workers=8, rate_limit=20.0, compact=True, lazy=False, prefetch=0,
+                 publish_interval=1.0, defer_prefetch=False):
+        self.top_n = top_n
+        self.max_workers = max_workers
+        self.rate_limit = rate_limit
+        self.compact = compact
+        self.lazy = lazy
+        self.prefetch = prefetch
+        self.publish_interval = publish_interval
+        self.defer_prefetch = defer_prefetch
+        self._deferred_prefetch = None
+        # _lock protegge solo _requested e lo scambio del risultato; _build_lock
+        # serializza la costruzione dei nuovi risultati, che avviene fuori da _lock
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._requested = set()
+        self._result = DatasetResult()
+        self._prefetch_thread = None
+        self._progress = (0, 0)
+        self.version = 0
+        # Secondi dall'inizio di load: informazioni pronte, prima pagina mostrata,
+        # primo blocco di storici pubblicato, precaricamento completato
+        self.timings = {}
+        self._started = None
+        # Dataset caricato da uno snapshot o da un database: nessun accesso alla rete
+        self.offline = False
+
+    @classmethod
+    def from_snapshot(cls, directory):
+        """
+        Crea un dataset offline a partire da uno snapshot (vedi snapshot.py).
+
+        Non accede alla rete: le distillerie assenti dallo snapshot restano senza storico.
+
+        Args:
+            directory (str): Cartella dello snapshot
+
+        Returns:
+            WhiskyDataset: Dataset con il risultato già pubblicato
+        """
+        from snapshot import load_snapshot
+
+        started = time.perf_counter()
+        with metrics.timed("snapshot_load") as measure:
+            result = load_snapshot(directory)
+            measure['rows'] = len(result.history)
+        return cls._offline(result, started)
+
+    @classmethod
+    def from_database(cls, path):
+        """
+        Crea un dataset offline basato su un database SQLite (vedi database.py).
+
+        Gli storici non vengono caricati in memoria: pagine, classifiche e
+        filtri li interrogano dal database solo quando servono.
+
+        Args:
+            path (str): File del database creato con "python data_loader.py db"
+
+        Returns:
+            WhiskyDataset: Dataset con il risultato già pubblicato
+        """
+        from database import load_database
+
+        started = time.perf_counter()
+        with metrics.timed("database_load") as measure:
+            result = load_database(path)
+            measure['rows'] = len(result.info)
+        return cls._offline(result, started)
+
+    @classmethod
+    def _offline(cls, result, started):
+        # Dataset offline con il risultato già caricato: tutte le distillerie
+        # risultano richieste, quindi ensure_loaded non accede mai alla rete
+        store = cls(top_n=None)
+        store.offline = True
+        store._started = started
+        if store.compact and not result.history.empty:
+            # Lo snapshot contiene lo storico completo: in memoria si usano i tipi compatti
+            history = optimize_dtypes(result.history, drop_columns=UNUSED_HISTORY_COLUMNS)
+            stats = replace(result.stats, memory_raw=result.stats.memory, memory=memory_usage_bytes(history))
+            result = replace(result, history=history, stats=stats)
+        with store._lock:
+            store._requested = set(result.info['slug']) if result.ok else set()
+            store.version += 1
+            store._result = replace(result, version=store.version)
+        store._mark('info')
+        store._mark('complete')
+        return store
+
+    @property
+    def result(self):
+        """Ultimo DatasetResult pubblicato (vuoto prima di load)."""
+        return self._result
+
+    @property
+    def loading(self):
+        """Indica se è in corso un precaricamento in background."""
+        return self._prefetch_thread is not None and self._prefetch_thread.is_alive()
+
+    @property
+    def progress(self):
+        """Avanzamento del precaricamento come (distillerie completate, totale)."""
+        return self._progress
+
+    def wait(self, timeout=None):
+        """Attende la fine del precaricamento in background, se in corso."""
+        if self._prefetch_thread is not None:
+            self._prefetch_thread.join(timeout)
+
+    def _mark(self, name):
+        if name not in self.timings and self._started is not None:
+            self.timings[name] = time.perf_counter() - self._started
+
+    def mark_first_paint(self):
+        """Registra il momento in cui la prima pagina è stata mostrata all'utente e avvia l'eventuale precaricamento rinviato."""
+        self._mark('first_paint')
+        with self._lock:
+            slugs, self._deferred_prefetch = self._deferred_prefetch, None
+        if slugs:
+            self.start_prefetch(slugs)
+
+    def load(self):
+        """
+        Scarica informazioni e storici (solo informazioni in modalità lazy).
+
+        Returns:
+            DatasetResult: Risultato del caricamento (info vuoto in caso di errore)
+        """
+        stats = FetchStats()
+
+        start = self._started = time.perf_counter()
+        df_info = load_distilleries_info()
+        stats.info_seconds = time.perf_counter() - start
+        self._mark('info')
+        if df_info.empty:
+            self._result = DatasetResult(stats=stats)
+            return self._result
+
+        slugs = [] if self.lazy else select_top_slugs(df_info, self.top_n)
+        df_data = pd.DataFrame()
+        if slugs:
+            start = time.perf_counter()
+            df_data = build_combined_dataframe(
+                top_n=self.top_n,
+                max_workers=self.max_workers,
+                rate_limit=self.rate_limit,
+                df_info=df_info,
+            )
+            stats.history_seconds = time.perf_counter() - start
+
+        with self._build_lock:
+            with self._lock:
+                self._requested = set(slugs)
+            self._publish(df_info, df_data, stats)
+
+        if self.lazy and self.prefetch:
+            popular = df_info.nlargest(self.prefetch, 'whiskybase_votes')['slug'].tolist()
+            if self.defer_prefetch:
+                with self._lock:
+                    self._deferred_prefetch = popular
+            else:
+                self.start_prefetch(popular)
+        else:
+            self._mark('complete')
+        return self._result
+
+    def _publish(self, df_info, df_data, stats):
+        # Costruzione completa di un nuovo risultato (caricamento e aggiornamenti)
+        start = time.perf_counter()
+        # Memoria dello storico prima e dopo la conversione in tipi compatti
+        # (registrata nelle metriche da _swap)
+        stats.memory_raw = memory_usage_bytes(df_data)
+        if self.compact:
+            df_data = optimize_dtypes(df_data, drop_columns=UNUSED_HISTORY_COLUMNS)
+        stats.memory = memory_usage_bytes(df_data)
+
+        stats.requested = len(self._requested)
+        stats.loaded = df_data['slug'].nunique() if not df_data.empty else 0
+        stats.rows = len(df_data)
+        return self._swap(DatasetResult(info=df_info, history=df_data, stats=stats), start, df_info)
+
+    def _swap(self, result, start, df_info):
+        # Pubblica il risultato già costruito: l'unica operazione sotto _lock.
+        # Da qui in poi i DataFrame sono letti da tutte le sessioni e non vanno
+        # più modificati (vedi DatasetResult)
+        with self._lock:
+            self.version += 1
+            self._result = replace(result, version=self.version)
+            published = self._result
+
+        stats = published.stats
+        metrics.record("publish", time.perf_counter() - start, rows=stats.rows, nbytes=stats.memory)
+        metrics.set_gauge("history.rows", stats.rows)
+        metrics.set_gauge("history.memory_raw", stats.memory_raw)
+        metrics.set_gauge("history.memory", stats.memory)
+        metrics.set_gauge("info.memory", memory_usage_bytes(df_info))
+        return published
+
+    def _merge(self, slugs, new_data, elapsed):
+        # Aggiunge al risultato corrente gli storici appena scaricati per slugs:
+        # solo il nuovo blocco viene convertito, indicizzato e aggregato
+        with self._build_lock:
+            with self._lock:
+                # Un'altra sessione potrebbe aver caricato le stesse distillerie nel frattempo
+                slugs = [slug for slug in slugs if slug not in self._requested]
+                current = self._result
+            if not new_data.empty:
+                new_data = new_data[new_data['slug'].isin(slugs)]
+            # Si segnano come richieste solo le distillerie con dati: quelle il cui
+            # download è fallito (errore o circuito aperto) vengono riprovate dal
+            # prossimo ensure_loaded invece di attendere l'aggiornamento periodico
+            with self._lock:
+                self._requested.update(new_data['slug'].unique() if not new_data.empty else [])
+            if new_data.empty:
+                # Indice e aggregati non cambiano: si riusano quelli correnti
+                stats = replace(current.stats, requested=len(self._requested))
+                with self._lock:
+                    self._result = replace(current, stats=stats)
+                    return self._result
+
+            start = time.perf_counter()
+            memory_raw = memory_usage_bytes(new_data)
+            if self.compact:
+                new_data = optimize_dtypes(new_data, drop_columns=UNUSED_HISTORY_COLUMNS)
+            history = concat_compact([current.history, new_data])
+            index = current.index.extended(new_data)
+            stats = replace(
+                current.stats,
+                history_seconds=current.stats.history_seconds + elapsed,
+                requested=len(self._requested),
+                loaded=len(index),
+                rows=len(history),
+                memory_raw=current.stats.memory_raw + memory_raw,
+                memory=memory_usage_bytes(history),
+            )
+            result = DatasetResult(
+                info=current.info,
+                history=history,
+                stats=stats,
+                index=index,
+                aggregates=merge_aggregates(current.aggregates, new_data),
+            )
+            return self._swap(result, start, current.info)
+
+    def refresh(self, revalidate=True):
+        """
+        Riscarica l'elenco delle distillerie e gli storici già richiesti.
+
+        Il nuovo risultato viene costruito a parte e poi sostituito a quello
+        corrente con un'unica assegnazione: le sessioni continuano a leggere
+        lo snapshot precedente senza mai attendere.
+
+        Args:
+            revalidate (bool): Se interrogare l'API anche per i dati in cache ancora validi
+
+        Returns:
+            DatasetResult: Nuovo risultato
+
+        Raises:
+            RuntimeError: Se l'elenco delle distillerie non è disponibile
+        """
+        stats = FetchStats()
+        start = time.perf_counter()
+        df_info = load_distilleries_info(revalidate=revalidate)
+        stats.info_seconds = time.perf_counter() - start
+        if df_info.empty:
+            raise RuntimeError("Elenco delle distillerie non disponibile")
+
+        slugs = sorted(self._requested)
+        start = time.perf_counter()
+        df_data = load_histories(
+            slugs,
+            max_workers=self.max_workers,
+            rate_limit=self.rate_limit,
+            revalidate=revalidate,
+        )
+        stats.history_seconds = time.perf_counter() - start
+
+        with self._build_lock:
+            # Si conservano gli storici correnti delle distillerie senza nuovi dati:
+            # quelle aggiunte da altre sessioni durante l'aggiornamento e quelle il
+            # cui nuovo download è fallito o vuoto (ad esempio con la cache disattivata)
+            current = self._result.history
+            if not current.empty:
+                fetched = df_data['slug'].unique() if not df_data.empty else []
+                kept = current[~current['slug'].isin(fetched)]
+                if not kept.empty:
+                    missing = len(set(kept['slug']) & set(slugs))
+                    if missing:
+                        print(f"Aggiornamento: nessun dato nuovo per {missing} distillerie, mantenuti gli storici precedenti")
+                    df_data = pd.concat([df_data, kept], ignore_index=True)
+            return self._publish(df_info, df_data, stats)
+
+    def is_requested(self, slug):
+        """Indica se lo storico della distilleria è già stato caricato (i download falliti o vuoti vengono riprovati)."""
+        return slug in self._requested
+
+    def ensure_loaded(self, slugs):
+        """
+        Scarica gli storici non ancora caricati e pubblica un nuovo risultato.
+
+        Args:
+            slugs (list): Slug delle distillerie necessarie
+
+        Returns:
+            DatasetResult: Risultato aggiornato
+        """
+        missing = [slug for slug in slugs if slug not in self._requested]
+        if not missing or self.offline:
+            return self._result
+
+        start = time.perf_counter()
+        new_data = load_histories(missing, max_workers=self.max_workers, rate_limit=self.rate_limit)
+        return self._merge(missing, new_data, time.perf_counter() - start)
+
+    def start_prefetch(self, slugs, batch_size=10):
+        """
+        Precarica gli storici in un thread in background.
+
+        Gli storici vengono pubblicati a blocchi man mano che arrivano
+        (iter_histories), così le pagine vedono i nuovi dati al rerun successivo;
+        i blocchi arrivati entro publish_interval secondi dall'ultima
+        pubblicazione vengono accumulati e pubblicati insieme (ogni
+        pubblicazione invalida le cache legate alla versione dei dati).
+        progress riporta l'avanzamento.
+
+        Args:
+            slugs (list): Slug da precaricare, in ordine di priorità
+            batch_size (int): Numero di distillerie per blocco
+
+        Returns:
+            threading.Thread: Thread di precaricamento
+        """
+        slugs = [slug for slug in slugs if slug not in self._requested]
+        self._progress = (0, len(slugs))
+
+        def run():
+            done = 0
+            start = time.perf_counter()
+            published = None
+            pending_slugs, pending = [], []
+            batches = iter_histories(
+                slugs,
+                max_workers=self.max_workers,
+                rate_limit=self.rate_limit,
+                batch_size=batch_size,
+            )
+            for batch_slugs, batch in batches:
+                pending_slugs += batch_slugs
+                pending.append(batch)
+                done += len(batch_slugs)
+                self._progress = (done, len(slugs))
+                # Il primo blocco viene pubblicato subito, i successivi al più ogni publish_interval secondi
+                if published is None or time.perf_counter() - published >= self.publish_interval:
+                    self._merge(pending_slugs, concat_compact(pending), time.perf_counter() - start)
+                    start = published = time.perf_counter()
+                    pending_slugs, pending = [], []
+                    self._mark('first_batch')
+            if pending_slugs:
+                self._merge(pending_slugs, concat_compact(pending), time.perf_counter() - start)
+            self._mark('complete')
+
+        self._prefetch_thread = threading.Thread(target=run, name="whisky-prefetch", daemon=True)
+        self._prefetch_thread.start()
+        return self._prefetch_thread
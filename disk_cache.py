@@ -0,0 +1,153 @@
+"""
+Cache su disco delle risposte dell'API WhiskyHunter.
+
+Ogni risorsa (l'elenco delle distillerie o lo storico di una distilleria) viene
+salvata come file Parquet già convertito in DataFrame, accompagnato da un file
+JSON di metadati con data di download, ETag e Last-Modified restituiti dal server.
+"""
+import json
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+# Cartella predefinita della cache (sovrascrivibile da variabile d'ambiente)
+DEFAULT_CACHE_DIR = os.environ.get("WHISKY_CACHE_DIR", ".cache/whiskyhunter")
+
+# Durata di validità in secondi per ciascun endpoint
+DEFAULT_TTL = {
+    "distilleries_info": 24 * 3600,
+    "distillery_data": 6 * 3600,
+}
+
+
+def _dump_json(data, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def _write_atomic(path, write):
+    # Ogni scrittura usa un proprio file temporaneo nella stessa cartella: due
+    # thread o processi che salvano la stessa risorsa non si sovrascrivono il
+    # file a metà, e os.replace rende visibile solo un file completo
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".",
+                                     suffix=".tmp", delete=False) as f:
+        tmp = f.name
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class DiskCache:
+    """
+    Cache persistente di DataFrame con scadenza per endpoint.
+
+    Args:
+        directory (str): Cartella in cui salvare i file
+        ttl (dict): Durata di validità in secondi per endpoint (vedi DEFAULT_TTL)
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, ttl=None):
+        self.directory = directory
+        self.ttl = dict(DEFAULT_TTL, **(ttl or {}))
+        self.extension = "parquet" if HAS_PARQUET else "pkl"
+
+    def _paths(self, key):
+        # Le chiavi hanno la forma "endpoint" oppure "endpoint/slug"
+        filename = key.replace("/", "__")
+        return (
+            os.path.join(self.directory, f"{filename}.{self.extension}"),
+            os.path.join(self.directory, f"{filename}.json"),
+        )
+
+    def load(self, key):
+        """
+        Legge una risorsa dalla cache.
+
+        Args:
+            key (str): Chiave della risorsa, ad esempio "distillery_data/ardbeg"
+
+        Returns:
+            tuple: (DataFrame, metadati) oppure (None, None) se assente o illeggibile
+        """
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if HAS_PARQUET:
+                df = pd.read_parquet(data_path)
+            else:
+                df = pd.read_pickle(data_path)
+        except (OSError, ValueError):
+            return None, None
+        return df, meta
+
+    def store(self, key, df, url=None, etag=None, last_modified=None, extra=None):
+        """
+        Salva una risorsa e i relativi metadati in modo atomico.
+
+        Args:
+            key (str): Chiave della risorsa
+            df (pandas.DataFrame): Dati da salvare
+            url (str): URL da cui sono stati scaricati i dati
+            etag (str): Header ETag della risposta, se presente
+            last_modified (str): Header Last-Modified della risposta, se presente
+            extra (dict): Metadati aggiuntivi da salvare insieme alla risorsa
+
+        Returns:
+            dict: Metadati salvati
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        data_path, meta_path = self._paths(key)
+        meta = {
+            "url": url,
+            "fetched_at": time.time(),
+            "etag": etag,
+            "last_modified": last_modified,
+            "rows": len(df),
+            **(extra or {}),
+        }
+        # Scriviamo su file temporanei e poi rinominiamo, così un lettore concorrente
+        # non vede mai un file scritto a metà
+        if HAS_PARQUET:
+            _write_atomic(data_path, lambda tmp: df.to_parquet(tmp, index=False))
+        else:
+            _write_atomic(data_path, df.to_pickle)
+        _write_atomic(meta_path, lambda tmp: _dump_json(meta, tmp))
+        return meta
+
+    def touch(self, key, meta):
+        """Aggiorna la data di download dopo una rivalidazione andata a buon fine (HTTP 304)."""
+        meta = dict(meta, fetched_at=time.time())
+        _, meta_path = self._paths(key)
+        _write_atomic(meta_path, lambda tmp: _dump_json(meta, tmp))
+        return meta
+
+    def is_fresh(self, key, meta):
+        """Indica se la risorsa è ancora entro la durata di validità del suo endpoint."""
+        endpoint = key.split("/", 1)[0]
+        ttl = self.ttl.get(endpoint, 0)
+        return time.time() - meta.get("fetched_at", 0) < ttl
+
+    @staticmethod
+    def conditional_headers(meta):
+        """Costruisce gli header per una richiesta GET condizionale."""
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
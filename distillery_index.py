@@ -0,0 +1,116 @@
+"""
+Indice per distilleria costruito una sola volta dopo il caricamento dei dati.
+
+Sostituisce i filtri booleani df[df['slug'] == slug] delle pagine con
+ricerche in dizionari già pronti.
+"""
+import copy
+
+import numpy as np
+
+
+class DistilleryIndex:
+    """
+    Storici pre-suddivisi e informazioni per slug.
+
+    Args:
+        df_info (pandas.DataFrame): Informazioni sulle distillerie
+        df_data (pandas.DataFrame): Dati storici combinati
+    """
+
+    def __init__(self, df_info, df_data):
+        self._info = {}
+        self._history = {}
+        self._slug_by_name = {}
+        self.all_names = []
+        self.available_names = []
+        self._empty = df_data.iloc[0:0]
+        self._sorted_info = df_info
+        if df_info.empty:
+            return
+
+        info = self._sorted_info = df_info.drop_duplicates(subset='slug').sort_values(by='name')
+        self._info = info.set_index('slug').to_dict('index')
+        self.all_names = info['name'].drop_duplicates().tolist()
+        self._add_histories(df_data)
+        self._index_names()
+
+    def _add_histories(self, df_data):
+        if df_data.empty:
+            return
+        # Un solo ordinamento per (slug, dt): ogni storico è poi una fetta contigua
+        ordered = df_data.sort_values(['slug', 'dt'], kind='stable', ignore_index=True)
+        slugs = ordered['slug'].to_numpy()
+        bounds = np.flatnonzero(slugs[1:] != slugs[:-1]) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(ordered)]))
+        for start, end in zip(starts, ends):
+            self._history[slugs[start]] = ordered.iloc[start:end]
+
+    def _index_names(self):
+        # Distillerie con dati storici, ordinate per nome come nei menu delle pagine;
+        # a parità di nome si preferisce lo slug che ha dati
+        info = self._sorted_info
+        available = info[info['slug'].isin(self._history.keys())]
+        self.available_names = available['name'].tolist()
+        self._slug_by_name = {}
+        for name, slug in zip(available['name'], available['slug']):
+            self._slug_by_name.setdefault(name, slug)
+        for name, slug in zip(info['name'], info['slug']):
+            self._slug_by_name.setdefault(name, slug)
+
+    def extended(self, new_data):
+        """
+        Restituisce un nuovo indice con gli storici di altre distillerie.
+
+        Le fette già indicizzate vengono condivise: solo new_data viene ordinato
+        e suddiviso. L'indice corrente non viene modificato.
+
+        Args:
+            new_data (pandas.DataFrame): Storici di distillerie non ancora indicizzate
+
+        Returns:
+            DistilleryIndex: Indice aggiornato
+        """
+        index = copy.copy(self)
+        index._history = dict(self._history)
+        if not self._empty.columns.size:
+            index._empty = new_data.iloc[0:0]
+        if not self._sorted_info.empty:
+            index._add_histories(new_data)
+            index._index_names()
+        return index
+
+    def __len__(self):
+        return len(self._history)
+
+    def __contains__(self, slug):
+        return slug in self._history
+
+    def slug_for(self, name):
+        """Restituisce lo slug di una distilleria a partire dal nome."""
+        return self._slug_by_name.get(name)
+
+    def info_for(self, slug):
+        """Restituisce le informazioni della distilleria come dizionario (vuoto se sconosciuta)."""
+        return self._info.get(slug, {})
+
+    def history_for(self, slug, start=None, end=None):
+        """
+        Restituisce lo storico della distilleria ordinato per data (vuoto se assente).
+
+        Args:
+            slug (str): Slug della distilleria
+            start (pandas.Timestamp): Primo mese incluso (None per nessun limite)
+            end (pandas.Timestamp): Ultimo mese incluso (None per nessun limite)
+
+        Returns:
+            pandas.DataFrame: Storico, eventualmente limitato al periodo con una ricerca binaria
+        """
+        history = self._history.get(slug, self._empty)
+        if (start is None and end is None) or history.empty:
+            return history
+        dates = history['dt'].to_numpy()
+        lo = 0 if start is None else np.searchsorted(dates, start.to_datetime64(), side='left')
+        hi = len(dates) if end is None else np.searchsorted(dates, end.to_datetime64(), side='right')
+        return history.iloc[lo:hi]
@@ -0,0 +1,111 @@
+"""
+Riduzione del numero di punti delle serie storiche prima di costruire i grafici.
+
+Due strategie, applicabili insieme:
+- aggregazione per periodo (mensile, trimestrale, annuale) con resample_period;
+- Largest-Triangle-Three-Buckets (lttb_indices) per restare entro un numero
+  massimo di punti per traccia conservando picchi e andamento visivo.
+"""
+import numpy as np
+
+# Periodi di aggregazione disponibili: etichetta -> frequenza pandas
+PERIODS = {
+    'Mensile': None,
+    'Trimestrale': 'QS',
+    'Annuale': 'YS',
+}
+
+# Come aggregare ogni colonna numerica all'interno di un periodo
+PERIOD_AGGREGATIONS = {
+    'winning_bid_max': 'max',
+    'winning_bid_min': 'min',
+    'winning_bid_mean': 'mean',
+    'trading_volume': 'sum',
+    'lots_count': 'sum',
+}
+
+
+def resample_period(distillery_data, period):
+    """
+    Aggrega lo storico di una distilleria per periodo.
+
+    Args:
+        distillery_data (pandas.DataFrame): Storico di una distilleria ordinato per dt
+        period (str): Chiave di PERIODS
+
+    Returns:
+        pandas.DataFrame: Una riga per periodo (lo storico stesso per 'Mensile')
+    """
+    freq = PERIODS[period]
+    if freq is None or distillery_data.empty:
+        return distillery_data
+    aggregations = {col: how for col, how in PERIOD_AGGREGATIONS.items() if col in distillery_data.columns}
+    groups = distillery_data.resample(freq, on='dt')
+    resampled = groups.agg(aggregations)
+    # I periodi senza aste restano vuoti invece di comparire con volume zero
+    resampled = resampled[groups.size() > 0]
+    return resampled.reset_index()
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Seleziona n_out punti con l'algoritmo Largest-Triangle-Three-Buckets.
+
+    Il primo e l'ultimo punto vengono sempre mantenuti; gli altri sono divisi
+    in n_out - 2 gruppi e da ciascuno si sceglie il punto che forma il
+    triangolo più grande con il punto scelto nel gruppo precedente e la
+    media del gruppo successivo.
+
+    Args:
+        x (numpy.ndarray): Ascisse crescenti (numeriche)
+        y (numpy.ndarray): Ordinate
+        n_out (int): Numero di punti da mantenere (almeno 3)
+
+    Returns:
+        numpy.ndarray: Posizioni dei punti scelti, in ordine crescente
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    # I valori mancanti non devono vincere il confronto delle aree
+    y = np.where(np.isnan(y), np.nanmean(y) if np.isfinite(y).any() else 0.0, y)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    # Media di ogni gruppo (più l'ultimo punto come gruppo finale), calcolate in blocco
+    bounds = np.append(edges, n)
+    counts = np.diff(bounds)
+    mean_x = np.add.reduceat(x, bounds[:-1]) / counts
+    mean_y = np.add.reduceat(y, bounds[:-1]) / counts
+
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        px, py = x[previous], y[previous]
+        areas = np.abs((px - mean_x[i + 1]) * (y[start:end] - py) - (px - x[start:end]) * (mean_y[i + 1] - py))
+        previous = start + int(areas.argmax())
+        selected[i + 1] = previous
+    return selected
+
+
+def downsample(distillery_data, column, max_points):
+    """
+    Riduce lo storico a max_points righe scelte con LTTB sulla colonna indicata.
+
+    Args:
+        distillery_data (pandas.DataFrame): Storico ordinato per dt
+        column (str): Colonna da preservare visivamente
+        max_points (int): Numero massimo di punti (None o 0 per non ridurre)
+
+    Returns:
+        pandas.DataFrame: Storico ridotto (lo stesso DataFrame se già entro il limite)
+    """
+    if not max_points or len(distillery_data) <= max_points:
+        return distillery_data
+    x = distillery_data['dt'].to_numpy(dtype='datetime64[ns]').astype('int64')
+    y = distillery_data[column].to_numpy(dtype='float64', na_value=np.nan)
+    return distillery_data.iloc[lttb_indices(x, y, max_points)]
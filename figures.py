@@ -0,0 +1,292 @@
+"""
+Costruzione dei grafici Plotly della dashboard e cache LRU dei grafici già costruiti.
+
+A ogni interazione Streamlit riesegue l'intero script: i grafici vengono
+memorizzati con una chiave (pagina, grafico, selezione, versione dei dati) e
+ricostruiti solo quando uno di questi elementi cambia.
+
+Plotly viene importato dai singoli costruttori, al primo grafico da costruire:
+l'avvio dell'app e le pagine senza grafici non ne pagano il costo di import.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+from downsampling import downsample
+
+
+class FigureCache:
+    """
+    Cache LRU dei grafici, condivisa tra le sessioni.
+
+    Args:
+        max_size (int): Numero massimo di grafici memorizzati
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+        # Statistiche per grafico: costruzioni, riusi e tempi in secondi
+        self.stats = {}
+
+    def _stat(self, name):
+        return self.stats.setdefault(name, {
+            'builds': 0, 'hits': 0, 'build_seconds': 0.0, 'render_seconds': 0.0, 'renders': 0,
+        })
+
+    def get_or_build(self, key, builder):
+        """
+        Restituisce il grafico associato alla chiave, costruendolo se necessario.
+
+        Args:
+            key (tuple): (pagina, grafico, ...) seguiti da selezione e versione dei dati
+            builder (callable): Funzione senza argomenti che costruisce il grafico
+
+        Returns:
+            plotly.graph_objects.Figure: Grafico
+        """
+        name = f"{key[0]}/{key[1]}"
+        with self._lock:
+            if key in self._figures:
+                self._figures.move_to_end(key)
+                self._stat(name)['hits'] += 1
+                return self._figures[key]
+
+        start = time.perf_counter()
+        fig = builder()
+        elapsed = time.perf_counter() - start
+        metrics.record(f"figure:{name}", elapsed)
+
+        with self._lock:
+            stat = self._stat(name)
+            stat['builds'] += 1
+            stat['build_seconds'] += elapsed
+            self._figures[key] = fig
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.max_size:
+                self._figures.popitem(last=False)
+        return fig
+
+    def record_render(self, key, seconds):
+        """Registra il tempo di serializzazione e invio al browser di un grafico."""
+        metrics.record(f"render:{key[0]}/{key[1]}", seconds)
+        with self._lock:
+            stat = self._stat(f"{key[0]}/{key[1]}")
+            stat['renders'] += 1
+            stat['render_seconds'] += seconds
+
+    def __len__(self):
+        return len(self._figures)
+
+
+def country_pie(country_counts):
+    # Primo grafico della pagina iniziale: usa graph_objects (già importato da
+    # Streamlit) invece di plotly.express, che resta fuori dalla prima visualizzazione
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Pie(
+        labels=country_counts["country"],
+        values=country_counts["count"],
+        hole=0.4,
+        hovertemplate="country=%{label}<br>count=%{value}<extra></extra>",
+    ))
+
+    fig.update_layout(
+    showlegend=False
+    )
+
+    fig.update_traces(
+        textfont_size=16,
+        textposition='outside',
+        textinfo='percent+label',
+        pull=[0.05]*len(country_counts)
+    )
+    return fig
+
+
+def info_box_plot(df_info, stats_col):
+    import plotly.express as px
+    return px.box(df_info, y=stats_col, 
+            title=f"Box Plot di {stats_col}",
+            color_discrete_sequence=['#3CB44B'])
+
+
+def price_trend(distillery_data, name, max_points=None):
+    import plotly.express as px
+    # Trend prezzo medio
+    fig = px.line(
+        downsample(distillery_data, 'winning_bid_mean', max_points),
+        x='dt',
+        y='winning_bid_mean',
+        markers=True,
+        labels={
+            'dt': 'Data',
+            'winning_bid_mean': 'Prezzo Medio (£ GBP)'},
+            title=f"📈 Trend Prezzo Medio di {name}")
+
+    # Miglioramenti estetici
+    fig.update_layout(
+        title={'x': 0.1, 'font': {'size': 26}},
+        xaxis_title='Data',
+        yaxis_title='Prezzo Medio (£ GBP)',
+        template='plotly_white',  # stile bianco pulito
+        xaxis_tickangle=45,
+        margin=dict(l=40, r=40, t=80, b=40),
+        hovermode="x unified")
+    return fig
+
+
+def volume_bars(distillery_data, name, max_points=None):
+    import plotly.express as px
+    # Volume di trading
+    fig = px.bar(
+    downsample(distillery_data, 'trading_volume', max_points),
+    x='dt',
+    y='trading_volume',
+    labels={
+        'dt': 'Data',
+        'trading_volume': 'Volume (£ GBP)'},
+        title=f"📊 Volume di Trading di {name}")
+
+    # Miglioramenti estetici
+    fig.update_layout(
+        title={'x': 0.1, 'font': {'size': 26}},
+        xaxis_title='Data',
+        yaxis_title='Volume (£ GBP)',
+        template='plotly_white',  # stile bianco pulito
+        xaxis_tickangle=45,
+        margin=dict(l=40, r=40, t=80, b=40),
+        hovermode="x unified")
+    return fig
+
+
+def comparison_lines(compare_data, column, title, yaxis_title, max_points=None):
+    """Grafico a linee di una colonna per ogni distilleria confrontata (al più max_points punti per linea)."""
+    import plotly.graph_objects as go
+    fig = go.Figure()
+
+    for name, data in compare_data:
+        data = downsample(data, column, max_points)
+        fig.add_trace(
+            go.Scatter(
+                x=data['dt'], 
+                y=data[column], 
+                mode='lines+markers',
+                name=name
+            )
+        )
+
+    fig.update_layout(
+        title={'text': title, 'x': 0.1, 'font': {'size': 26}},
+        xaxis_title='Data',
+        yaxis_title=yaxis_title,
+        template='plotly_white',
+        xaxis_tickangle=45,
+        margin=dict(l=40, r=40, t=80, b=40),
+        hovermode="x unified",
+        legend_title_text="Distilleria",
+    )
+    return fig
+
+
+def comparison_boxes(compare_data, column, title, yaxis_title):
+    """Boxplot di una colonna per ogni distilleria confrontata (sempre su tutti i punti)."""
+    import plotly.express as px
+    import plotly.graph_objects as go
+    # Colori coerenti con plotly (puoi anche personalizzarli)
+    color_sequence = px.colors.qualitative.Plotly
+
+    fig = go.Figure()
+
+    for idx, (name, data) in enumerate(compare_data):
+        fig.add_trace(
+            go.Box(
+                y=data[column],
+                name=name,
+                marker_color=color_sequence[idx % len(color_sequence)],
+                boxmean=True,  # Mostra anche la media
+                boxpoints='outliers'  # Mostra solo gli outlier
+            )
+        )
+
+    fig.update_layout(
+        title={'text': title, 'x': 0.1, 'font': {'size': 26}},
+        yaxis_title=yaxis_title,
+        xaxis_title='Distilleria',
+        template='plotly_white',
+        margin=dict(l=40, r=40, t=80, b=50),
+        boxmode='group'
+    )
+    return fig
+
+
+def market_index_chart(market_index, title):
+    """Indice di mercato (linea) e volume totale mensile (barre, asse secondario)."""
+    import plotly.graph_objects as go
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=market_index['dt'], y=market_index['volume'], name='Volume (£ GBP)',
+        marker_color='rgba(245, 185, 113, 0.5)', yaxis='y2',
+    ))
+    fig.add_trace(go.Scatter(
+        x=market_index['dt'], y=market_index['index'], mode='lines', name='Indice',
+        line=dict(color='#1E3D59', width=3),
+    ))
+    fig.update_layout(
+        title={'text': title, 'x': 0.1, 'font': {'size': 26}},
+        xaxis_title='Data',
+        yaxis=dict(title='Indice (base 100)'),
+        yaxis2=dict(title='Volume (£ GBP)', overlaying='y', side='right', showgrid=False),
+        template='plotly_white',
+        margin=dict(l=40, r=40, t=80, b=40),
+        hovermode="x unified",
+        legend=dict(orientation='h', y=1.02, x=1, xanchor='right', yanchor='bottom'),
+    )
+    return fig
+
+
+def correlation_heatmap(corr, names, title):
+    """Heatmap di una matrice di correlazione (scala da -1 a 1)."""
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Heatmap(
+        z=corr, x=names, y=names, zmin=-1, zmax=1, colorscale='RdBu', reversescale=True,
+        hovertemplate='%{y} / %{x}: %{z:.2f}<extra></extra>',
+    ))
+    fig.update_layout(
+        title={'text': title, 'x': 0.1, 'font': {'size': 26}},
+        template='plotly_white',
+        height=max(500, 14 * len(names)),
+        margin=dict(l=40, r=40, t=80, b=40),
+        yaxis=dict(autorange='reversed'),
+    )
+    return fig
+
+
+def rolling_chart(dates, prices, mean, volatility, title):
+    """Prezzo medio mensile con la sua media mobile e la volatilità mobile dei rendimenti (asse secondario)."""
+    import plotly.graph_objects as go
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=dates, y=prices, mode='lines', name='Prezzo Medio (£ GBP)',
+        line=dict(color='rgba(30, 61, 89, 0.35)', width=1),
+    ))
+    fig.add_trace(go.Scatter(
+        x=dates, y=mean, mode='lines', name='Media mobile',
+        line=dict(color='#1E3D59', width=3),
+    ))
+    fig.add_trace(go.Scatter(
+        x=dates, y=volatility, mode='lines', name='Volatilità mobile', yaxis='y2',
+        line=dict(color='#E74C3C', width=2, dash='dot'),
+    ))
+    fig.update_layout(
+        title={'text': title, 'x': 0.1, 'font': {'size': 26}},
+        xaxis_title='Data',
+        yaxis=dict(title='Prezzo Medio (£ GBP)'),
+        yaxis2=dict(title='Volatilità dei rendimenti', overlaying='y', side='right', showgrid=False, tickformat='.0%'),
+        template='plotly_white',
+        margin=dict(l=40, r=40, t=80, b=40),
+        hovermode="x unified",
+        legend=dict(orientation='h', y=1.02, x=1, xanchor='right', yanchor='bottom'),
+    )
+    return fig
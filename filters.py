@@ -0,0 +1,219 @@
+"""
+Filtri globali della dashboard: periodo, paesi e rating minimo.
+
+Per ogni risultato pubblicato viene costruito una sola volta un FilterIndex:
+lo storico ordinato per data (il periodo diventa una fetta trovata con una
+ricerca binaria), le righe di ogni distilleria ordinate per data (intervalli
+trovati allo stesso modo), i gruppi paese → distillerie e i rating ordinati. Applicare un filtro produce un DatasetResult
+ristretto che le pagine usano come quello completo; i risultati filtrati più
+recenti vengono memorizzati.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from aggregates import compute_aggregates
+
+
+@dataclass(frozen=True)
+class Filters:
+    """
+    Selezione corrente dei filtri (None o vuoto significa nessun vincolo).
+
+    Attributes:
+        start (pandas.Timestamp): Primo mese incluso
+        end (pandas.Timestamp): Ultimo mese incluso
+        countries (tuple): Paesi inclusi
+        min_rating (float): Rating Whiskybase minimo
+    """
+    start: pd.Timestamp = None
+    end: pd.Timestamp = None
+    countries: tuple = ()
+    min_rating: float = None
+
+    @property
+    def active(self):
+        """Indica se almeno un filtro restringe i dati."""
+        return self != Filters()
+
+
+class FilteredIndex:
+    """
+    Vista di un DistilleryIndex ristretta alle distillerie e al periodo filtrati.
+
+    Args:
+        index (DistilleryIndex): Indice completo
+        df_info (pandas.DataFrame): Informazioni delle distillerie incluse
+        start (pandas.Timestamp): Primo mese incluso (None per nessun limite)
+        end (pandas.Timestamp): Ultimo mese incluso (None per nessun limite)
+        loaded (int): Numero di distillerie incluse con dati nel periodo
+    """
+
+    def __init__(self, index, df_info, start, end, loaded):
+        self._index = index
+        self._slugs = set(df_info['slug'])
+        self._start = start
+        self._end = end
+        self._loaded = loaded
+        names = set(df_info['name'])
+        self.all_names = [name for name in index.all_names if name in names]
+        self.available_names = [name for name in index.available_names if name in names]
+
+    def __len__(self):
+        return self._loaded
+
+    def __contains__(self, slug):
+        return slug in self._slugs and slug in self._index
+
+    def slug_for(self, name):
+        return self._index.slug_for(name)
+
+    def info_for(self, slug):
+        return self._index.info_for(slug)
+
+    def history_for(self, slug):
+        """Storico della distilleria limitato al periodo (vuoto se esclusa dai filtri)."""
+        if slug not in self._slugs:
+            return self._index.history_for(None)
+        return self._index.history_for(slug, self._start, self._end)
+
+
+class FilterIndex:
+    """
+    Strutture precalcolate per applicare rapidamente i filtri a un risultato.
+
+    Args:
+        result (DatasetResult): Risultato completo da filtrare
+        max_size (int): Numero di risultati filtrati da memorizzare
+    """
+
+    def __init__(self, result, max_size=16):
+        self._result = result
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_size = max_size
+
+        info = result.info.reset_index(drop=True)
+        self._info = info
+        self._countries = (
+            info.groupby('country', observed=True, sort=True).indices if 'country' in info.columns else {}
+        )
+        self.countries = list(self._countries)
+
+        # Rating in ordine crescente (NaN in fondo): "rating >= x" è una coda dell'ordinamento
+        ratings = info['whiskybase_rating'].to_numpy(dtype='float64', na_value=np.nan) \
+            if 'whiskybase_rating' in info.columns else np.full(len(info), np.nan)
+        self._rating_order = np.argsort(ratings, kind='stable')
+        self._sorted_ratings = ratings[self._rating_order]
+        self._rated = int((~np.isnan(ratings)).sum())
+        self.rating_range = (
+            (float(self._sorted_ratings[0]), float(self._sorted_ratings[self._rated - 1])) if self._rated else None
+        )
+
+        # Storico ordinato per data: ogni periodo è una fetta contigua. Per i filtri
+        # su paesi e rating, _slug_order elenca le stesse righe ordinate per
+        # (slug, dt): le righe di una distilleria nel periodo sono un intervallo
+        # trovato con una ricerca binaria sulla chiave slug × mese (_keys)
+        history = result.history
+        self._slugs = pd.Index([])
+        if history.empty:
+            self._history = history
+            self._dates = np.array([], dtype='datetime64[ns]')
+            self._months = self._dates
+            self._slug_order = self._keys = np.array([], dtype='int64')
+            self.date_range = None
+        else:
+            self._history = history.sort_values('dt', kind='stable', ignore_index=True)
+            self._dates = self._history['dt'].to_numpy()
+            self.date_range = (pd.Timestamp(self._dates[0]), pd.Timestamp(self._dates[-1]))
+
+            codes, slugs = pd.factorize(self._history['slug'])
+            self._slugs = pd.Index(slugs)
+            self._months, months = np.unique(self._dates, return_inverse=True)
+            keys = codes.astype('int64') * (len(self._months) + 1) + months
+            self._slug_order = np.argsort(keys, kind='stable')
+            self._keys = keys[self._slug_order]
+
+    def _info_positions(self, filters):
+        # Righe di df_info che rispettano paesi e rating minimo
+        selected = np.ones(len(self._info), dtype=bool)
+        if filters.countries:
+            selected[:] = False
+            for country in filters.countries:
+                selected[self._countries.get(country, [])] = True
+        if filters.min_rating is not None:
+            rated = np.zeros(len(self._info), dtype=bool)
+            first = np.searchsorted(self._sorted_ratings[:self._rated], filters.min_rating, side='left')
+            rated[self._rating_order[first:self._rated]] = True
+            selected &= rated
+        return np.flatnonzero(selected)
+
+    def _window(self, filters):
+        # Fetta dello storico ordinato compresa nel periodo (ricerca binaria)
+        lo = 0 if filters.start is None else np.searchsorted(self._dates, filters.start.to_datetime64(), side='left')
+        hi = len(self._dates) if filters.end is None else np.searchsorted(self._dates, filters.end.to_datetime64(), side='right')
+        return self._history.iloc[lo:hi]
+
+    def _rows(self, filters, df_info):
+        # Righe delle distillerie di df_info nel periodo, senza scorrere tutto lo
+        # storico: per ogni slug una ricerca binaria dell'inizio e della fine
+        codes = self._slugs.get_indexer(df_info['slug'].unique())
+        codes = codes[codes >= 0]
+        first = 0 if filters.start is None else np.searchsorted(self._months, filters.start.to_datetime64(), side='left')
+        last = len(self._months) if filters.end is None else np.searchsorted(self._months, filters.end.to_datetime64(), side='right')
+        # Con start successivo a end il periodo è vuoto (e non ha lunghezza negativa)
+        last = max(last, first)
+        base = codes.astype('int64') * (len(self._months) + 1)
+        lo = np.searchsorted(self._keys, base + first, side='left')
+        hi = np.searchsorted(self._keys, base + last, side='left')
+        lengths = hi - lo
+        # Concatenazione vettoriale degli intervalli [lo, hi), poi di nuovo in ordine di data
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.sort(self._slug_order[np.arange(lengths.sum()) + np.repeat(lo - offsets, lengths)])
+        return self._history.iloc[positions]
+
+    def apply(self, filters):
+        """
+        Restituisce il risultato ristretto ai filtri indicati.
+
+        Args:
+            filters (Filters): Filtri da applicare
+
+        Returns:
+            DatasetResult: Risultato filtrato, con gli stessi version e stats di quello completo
+        """
+        from dataset import DatasetResult
+
+        if not filters.active:
+            return self._result
+        with self._lock:
+            if filters in self._cache:
+                self._cache.move_to_end(filters)
+                return self._cache[filters]
+
+        df_info = self._info
+        if filters.countries or filters.min_rating is not None:
+            df_info = df_info.iloc[self._info_positions(filters)]
+        if len(df_info) < len(self._info) and not self._history.empty:
+            df_data = self._rows(filters, df_info)
+        else:
+            df_data = self._window(filters)
+
+        loaded = df_data['slug'].nunique() if not df_data.empty else 0
+        filtered = DatasetResult(
+            info=df_info,
+            history=df_data,
+            stats=self._result.stats,
+            index=FilteredIndex(self._result.index, df_info, filters.start, filters.end, loaded),
+            aggregates=compute_aggregates(df_info, df_data),
+            version=self._result.version,
+            filters=filters,
+        )
+        with self._lock:
+            self._cache[filters] = filtered
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return filtered
@@ -0,0 +1,300 @@
+"""
+Livello HTTP condiviso per le chiamate all'API WhiskyHunter.
+
+Fornisce la sessione con pool di connessioni, il rate limiter, i timeout,
+i tentativi ripetuti con attesa esponenziale e un circuit breaker per host.
+Ogni richiesta viene registrata in un report consultabile con get_fetch_report.
+"""
+import email.utils
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+# Dimensione del pool di connessioni della sessione HTTP condivisa
+POOL_SIZE = 16
+
+# Timeout in secondi per la connessione e per la lettura della risposta
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 20
+
+# Tentativi ripetuti: numero massimo di tentativi e attesa esponenziale (secondi)
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 10
+
+# Attesa massima (secondi) concessa a un Retry-After indicato dal server
+RETRY_AFTER_MAX = 60
+
+# Circuit breaker: errori consecutivi prima dell'apertura e secondi prima di riprovare
+BREAKER_THRESHOLD = 5
+BREAKER_RESET = 30
+
+# Codici di stato per cui ha senso ripetere la richiesta
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Richiesta non eseguita perché il circuit breaker dell'host è aperto."""
+
+
+def get_session():
+    """
+    Restituisce la sessione HTTP condivisa, creandola al primo utilizzo.
+
+    La sessione riutilizza le connessioni keep-alive tra le richieste, evitando
+    un nuovo handshake TCP/TLS per ogni distilleria.
+
+    Returns:
+        requests.Session: Sessione con pool di connessioni
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+    return _session
+
+
+class TokenBucket:
+    """
+    Rate limiter a token bucket condiviso tra più thread.
+
+    Args:
+        rate (float): Numero medio di richieste consentite al secondo
+        capacity (int): Numero massimo di richieste consecutive (burst)
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Attende finché non è disponibile un token e lo consuma."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker per un singolo host.
+
+    Dopo threshold errori consecutivi il circuito si apre e le richieste
+    falliscono subito; trascorsi reset_timeout secondi viene lasciata passare
+    una richiesta di prova che, se riesce, richiude il circuito.
+
+    Args:
+        threshold (int): Errori consecutivi che aprono il circuito
+        reset_timeout (float): Secondi di apertura prima della richiesta di prova
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, reset_timeout=BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        """Indica se una richiesta può partire."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(url):
+    """Restituisce il circuit breaker dell'host di url."""
+    host = urlsplit(url).netloc
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker()
+        return _breakers[host]
+
+
+# Report delle richieste: un record per risorsa (l'ultimo tentativo di download),
+# aggiornato dai thread del pool di download
+_fetch_report = {}
+_fetch_report_lock = threading.Lock()
+
+
+def record_fetch(key, **fields):
+    """Aggiorna il record del report per una risorsa."""
+    with _fetch_report_lock:
+        _fetch_report[key] = dict(_fetch_report.get(key, {}), key=key, **fields)
+    if 'latency' in fields:
+        metrics.record("http", fields['latency'], nbytes=fields.get('bytes') or 0)
+
+
+def get_fetch_report():
+    """
+    Restituisce il report delle richieste effettuate.
+
+    Returns:
+        pandas.DataFrame: Una riga per risorsa con url, latency, attempts, bytes, status e outcome
+    """
+    with _fetch_report_lock:
+        records = list(_fetch_report.values())
+    return pd.DataFrame(records)
+
+
+def clear_fetch_report():
+    with _fetch_report_lock:
+        _fetch_report.clear()
+
+
+def _retry_after(response):
+    # Retry-After può essere un numero di secondi o una data HTTP
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def _outcome(status):
+    if status == 304:
+        return "not_modified"
+    return "ok" if status < 400 else "http_error"
+
+
+def _backoff(attempt):
+    # Attesa esponenziale con "full jitter"
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def http_get(url, headers=None, key=None):
+    """
+    Esegue una GET con timeout, tentativi ripetuti e circuit breaker.
+
+    Errori di rete, timeout e risposte 429/5xx vengono ripetuti fino a
+    MAX_ATTEMPTS volte con attesa esponenziale (rispettando Retry-After se
+    presente, fino a RETRY_AFTER_MAX secondi); le altre risposte vengono
+    restituite al chiamante, gli altri errori di requests vengono rilanciati
+    subito dopo averli registrati.
+
+    Args:
+        url (str): URL da scaricare
+        headers (dict): Header aggiuntivi della richiesta
+        key (str): Chiave con cui registrare la richiesta nel report (di default l'URL)
+
+    Returns:
+        requests.Response: Ultima risposta ricevuta
+
+    Raises:
+        CircuitOpenError: Se il circuito dell'host è aperto
+        requests.exceptions.RequestException: Se tutti i tentativi falliscono per errori di rete
+    """
+    key = key or url
+    breaker = get_breaker(url)
+    start = time.perf_counter()
+    attempt = 0
+    while True:
+        attempt += 1
+        if not breaker.allow():
+            record_fetch(key, url=url, latency=time.perf_counter() - start, attempts=attempt - 1,
+                         bytes=0, status=None, outcome="circuit_open")
+            raise CircuitOpenError(f"Circuito aperto per {urlsplit(url).netloc}")
+
+        delay = None
+        try:
+            response = get_session().get(url, headers=headers, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            breaker.record_failure()
+            if attempt >= MAX_ATTEMPTS:
+                record_fetch(key, url=url, latency=time.perf_counter() - start, attempts=attempt,
+                             bytes=0, status=None, outcome="error")
+                raise
+            reason = type(e).__name__
+        except requests.exceptions.RequestException:
+            # Altri errori (risposta troncata, troppi redirect, URL non valido) non
+            # vengono ripetuti, ma contano come fallimento: una richiesta di prova
+            # del circuito non deve restare in sospeso
+            breaker.record_failure()
+            record_fetch(key, url=url, latency=time.perf_counter() - start, attempts=attempt,
+                         bytes=0, status=None, outcome="error")
+            raise
+        else:
+            if response.status_code not in RETRY_STATUS:
+                breaker.record_success()
+                record_fetch(key, url=url, latency=time.perf_counter() - start, attempts=attempt,
+                             bytes=len(response.content), status=response.status_code,
+                             outcome=_outcome(response.status_code))
+                return response
+            breaker.record_failure()
+            if attempt >= MAX_ATTEMPTS:
+                record_fetch(key, url=url, latency=time.perf_counter() - start, attempts=attempt,
+                             bytes=len(response.content), status=response.status_code, outcome="http_error")
+                return response
+            reason = f"http_{response.status_code}"
+            delay = _retry_after(response)
+
+        if delay is None:
+            delay = _backoff(attempt)
+        else:
+            delay = min(delay, RETRY_AFTER_MAX)
+        # Ogni nuovo tentativo finisce nelle metriche (visibili in Diagnostica e nel
+        # log JSONL): la fase http_retry misura l'attesa, il contatore la causa
+        metrics.record("http_retry", delay)
+        metrics.incr(f"http_retry.{reason}")
+        time.sleep(delay)
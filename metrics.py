@@ -0,0 +1,153 @@
+"""
+Metriche di prestazione del processo: durate per fase, contatori e valori istantanei.
+
+Le fasi (richieste HTTP, conversione del JSON, concatenazione, pubblicazione
+del dataset, calcolo delle pagine e costruzione dei grafici) vengono registrate
+con record o con il context manager timed; il riepilogo è consultabile con
+get_stage_report ed esportabile in JSON con export_json.
+
+Se la variabile WHISKY_METRICS_LOG indica un file, ogni misura viene anche
+aggiunta al file come riga JSON (log strutturato).
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+LOG_PATH = os.environ.get("WHISKY_METRICS_LOG")
+
+_lock = threading.Lock()
+# Serializza le scritture nel log: le righe di thread diversi non si mescolano
+_log_lock = threading.Lock()
+_stages = {}
+_counters = {}
+_gauges = {}
+_started = time.time()
+
+
+def _log(entry):
+    if not LOG_PATH:
+        return
+    line = json.dumps(entry, default=str) + "\n"
+    try:
+        with _log_lock, open(LOG_PATH, "a", encoding="utf-8") as f:
+            f.write(line)
+    except OSError as e:
+        print(f"Impossibile scrivere il log delle metriche in {LOG_PATH}: {e}")
+
+
+def record(stage, seconds, rows=0, nbytes=0):
+    """
+    Registra una esecuzione di una fase.
+
+    Args:
+        stage (str): Nome della fase, ad esempio "parse" o "page:Panoramica"
+        seconds (float): Durata in secondi
+        rows (int): Righe elaborate
+        nbytes (int): Byte elaborati
+    """
+    with _lock:
+        stat = _stages.setdefault(stage, {
+            'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0, 'last_seconds': 0.0, 'rows': 0, 'bytes': 0,
+        })
+        stat['count'] += 1
+        stat['total_seconds'] += seconds
+        stat['max_seconds'] = max(stat['max_seconds'], seconds)
+        stat['last_seconds'] = seconds
+        stat['rows'] += rows
+        stat['bytes'] += nbytes
+    _log({'time': time.time(), 'stage': stage, 'seconds': seconds, 'rows': rows, 'bytes': nbytes})
+
+
+@contextmanager
+def timed(stage):
+    """
+    Misura la durata del blocco e la registra come fase.
+
+    Il dizionario restituito permette di indicare righe e byte elaborati:
+
+        with timed("parse") as m:
+            df = parse(payload)
+            m['rows'] = len(df)
+    """
+    measure = {'rows': 0, 'bytes': 0}
+    start = time.perf_counter()
+    try:
+        yield measure
+    finally:
+        record(stage, time.perf_counter() - start, rows=measure['rows'], nbytes=measure['bytes'])
+
+
+def incr(name, n=1):
+    """Incrementa un contatore, ad esempio "load_data.miss"."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def set_gauge(name, value):
+    """Imposta un valore istantaneo, ad esempio la memoria occupata dallo storico."""
+    with _lock:
+        _gauges[name] = value
+    _log({'time': time.time(), 'gauge': name, 'value': value})
+
+
+def get_stage_report():
+    """
+    Restituisce il riepilogo delle fasi registrate.
+
+    Returns:
+        pandas.DataFrame: Una riga per fase con count, total_seconds, mean_seconds,
+        max_seconds, last_seconds, rows e bytes, in ordine di tempo totale decrescente
+    """
+    columns = ['stage', 'count', 'total_seconds', 'max_seconds', 'last_seconds', 'rows', 'bytes']
+    with _lock:
+        rows = [dict(stat, stage=stage) for stage, stat in _stages.items()]
+    report = pd.DataFrame(rows, columns=columns)
+    report.insert(3, 'mean_seconds', report['total_seconds'] / report['count'])
+    return report.sort_values('total_seconds', ascending=False, ignore_index=True)
+
+
+def snapshot():
+    """
+    Restituisce tutte le metriche in una struttura serializzabile in JSON.
+
+    Returns:
+        dict: Fasi, contatori, valori istantanei e tempo di attività del processo
+    """
+    with _lock:
+        return {
+            'uptime_seconds': time.time() - _started,
+            'stages': {stage: dict(stat) for stage, stat in _stages.items()},
+            'counters': dict(_counters),
+            'gauges': dict(_gauges),
+        }
+
+
+def export_json(path=None, **extra):
+    """
+    Esporta le metriche in JSON.
+
+    Args:
+        path (str): File in cui salvare l'esportazione (None per restituire solo il testo)
+        **extra: Sezioni aggiuntive da includere, ad esempio le statistiche del dataset
+
+    Returns:
+        str: Metriche in formato JSON
+    """
+    data = dict(snapshot(), exported_at=time.strftime("%Y-%m-%dT%H:%M:%S"), **extra)
+    text = json.dumps(data, indent=2, default=str)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+    return text
+
+
+def clear():
+    """Azzera tutte le metriche (usato dai benchmark)."""
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+        _gauges.clear()
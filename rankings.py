@@ -0,0 +1,87 @@
+"""
+HTML delle classifiche a barre, costruito in un unico blocco per classifica.
+
+Un solo st.markdown per scheda invece di uno per riga: il numero di elementi
+inviati al browser non dipende dal numero di distillerie mostrate.
+"""
+from html import escape
+
+import numpy as np
+
+MEDALS = ["🥇", "🥈", "🥉"]
+
+# Oltre questo numero di righe la classifica scorre in un riquadro di altezza fissa
+SCROLL_ROWS = 15
+
+# Stile comune delle righe: ogni riga porta solo colori, testi e larghezza della barra
+RANKING_CSS = """<style>
+    .rank-row {
+        border-radius: 8px;
+        padding: 8px 12px;
+        margin-bottom: 8px;
+        width: 100%;
+        box-shadow: 0 2px 6px rgba(0,0,0,0.1);
+        display: flex;
+        flex-direction: column;
+    }
+    .rank-label {
+        display: flex;
+        justify-content: space-between;
+        align-items: center;
+        margin-bottom: 4px;
+        font-weight: bold;
+        font-size: 16px;
+        color: black;
+    }
+    .rank-bar {
+        height: 20px;
+        border-radius: 6px;
+    }
+</style>"""
+
+ROW_TEMPLATE = (
+    "<div class='rank-row' style='background-color: {colore_sfondo};'>"
+    "<div class='rank-label'><div>{medaglia} {distilleria}</div><div>{valore} {unità}</div></div>"
+    "<div class='rank-bar' style='background-color: {colore_barra}; width: {larghezza:.2f}%;'></div>"
+    "</div>"
+)
+
+
+def ranking_html(ranking, column, colore_barra, colore_sfondo, unità=""):
+    """
+    Costruisce l'HTML di una classifica a barre.
+
+    Args:
+        ranking (pandas.DataFrame): Colonne name e column, in ordine decrescente
+        column (str): Colonna con il valore da mostrare
+        colore_barra (str): Colore delle barre
+        colore_sfondo (str): Colore di sfondo delle righe
+        unità (str): Unità di misura mostrata accanto al valore
+
+    Returns:
+        str: HTML dell'intera classifica
+    """
+    if ranking.empty:
+        return ""
+    values = ranking[column].to_numpy(dtype='float64')
+    # Larghezze delle barre e testi calcolati su tutta la colonna
+    widths = values / np.nanmax(values) * 100
+    labels = [f"{value:.2f}" for value in values]
+    names = [escape(str(name)) for name in ranking['name']]
+    medals = MEDALS[:len(names)] + [""] * (len(names) - len(MEDALS))
+
+    rows = "\n".join(
+        ROW_TEMPLATE.format(
+            colore_sfondo=colore_sfondo,
+            colore_barra=colore_barra,
+            medaglia=medal,
+            distilleria=name,
+            valore=label,
+            unità=unità,
+            larghezza=width,
+        )
+        for medal, name, label, width in zip(medals, names, labels, widths)
+    )
+    if len(names) > SCROLL_ROWS:
+        rows = f"<div style='max-height: 640px; overflow-y: auto; padding-right: 8px;'>\n{rows}\n</div>"
+    return f"{RANKING_CSS}\n{rows}"
@@ -0,0 +1,107 @@
+"""
+Aggiornamento periodico del dataset in un thread in background.
+
+Le sessioni non aspettano mai il download: leggono l'ultimo snapshot
+pubblicato mentre il refresher ne prepara uno nuovo.
+"""
+import random
+import threading
+import time
+
+
+class Refresher:
+    """
+    Esegue WhiskyDataset.refresh a intervalli regolari.
+
+    Gli intervalli hanno una variazione casuale (jitter) per non sincronizzare
+    più processi sull'API; dopo un errore si riprova con attesa esponenziale.
+
+    Args:
+        store (WhiskyDataset): Dataset da aggiornare
+        interval (float): Secondi tra un aggiornamento riuscito e il successivo
+        jitter (float): Variazione relativa massima dell'intervallo (0.1 = ±10%)
+        retry_delay (float): Attesa in secondi dopo il primo errore
+        max_retry_delay (float): Attesa massima in secondi tra due tentativi falliti
+    """
+
+    def __init__(self, store, interval=6 * 3600, jitter=0.1, retry_delay=60, max_retry_delay=3600):
+        self.store = store
+        self.interval = interval
+        self.jitter = jitter
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.last_refresh = None
+        self.last_duration = None
+        self.last_error = None
+        self.consecutive_failures = 0
+        self.total_failures = 0
+        self.refresh_count = 0
+        self.next_run = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _next_delay(self):
+        if self.consecutive_failures:
+            delay = min(self.max_retry_delay, self.retry_delay * 2 ** (self.consecutive_failures - 1))
+        else:
+            delay = self.interval
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def run_once(self):
+        """
+        Esegue subito un aggiornamento e ne registra l'esito.
+
+        Returns:
+            bool: True se l'aggiornamento è riuscito
+        """
+        start = time.perf_counter()
+        try:
+            self.store.refresh()
+        except Exception as e:
+            self.consecutive_failures += 1
+            self.total_failures += 1
+            self.last_error = str(e)
+            print(f"Aggiornamento dei dati non riuscito: {e}")
+            return False
+        finally:
+            self.last_duration = time.perf_counter() - start
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.last_refresh = time.time()
+        self.refresh_count += 1
+        return True
+
+    def _run(self):
+        while True:
+            delay = self._next_delay()
+            self.next_run = time.time() + delay
+            if self._stop.wait(delay):
+                return
+            self.run_once()
+
+    def start(self):
+        """Avvia il thread di aggiornamento (il primo aggiornamento avviene dopo un intervallo)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="whisky-refresher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Ferma il thread di aggiornamento."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    @property
+    def status(self):
+        """Stato corrente dell'aggiornamento, per il pannello nella sidebar."""
+        return {
+            'last_refresh': self.last_refresh,
+            'last_duration': self.last_duration,
+            'last_error': self.last_error,
+            'consecutive_failures': self.consecutive_failures,
+            'total_failures': self.total_failures,
+            'refresh_count': self.refresh_count,
+            'next_run': self.next_run,
+        }
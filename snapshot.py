@@ -0,0 +1,150 @@
+"""
+Esportazione e importazione di snapshot offline del dataset.
+
+Uno snapshot è una cartella con le informazioni sulle distillerie e gli
+storici in formato Parquet compresso, più un manifest JSON con versione del
+formato, data di creazione, numero di righe, nomi e impronte SHA-256 dei file.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+import uuid
+
+import pandas as pd
+
+from dataset import DatasetResult, FetchStats
+
+# Versione del formato: va incrementata quando cambia la struttura dei file
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+FILES = {"info": "info.parquet", "history": "history.parquet"}
+COMPRESSION = "zstd"
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def export_snapshot(result, directory, source=None):
+    """
+    Scrive uno snapshot del dataset nella cartella indicata.
+
+    I file Parquet hanno nomi nuovi a ogni esportazione (nome-<snapshot_id>-<token>.parquet)
+    e il manifest che li elenca viene sostituito per ultimo con os.replace: chi
+    legge la cartella durante l'esportazione vede sempre lo snapshot precedente
+    completo oppure quello nuovo. Restano solo i file del nuovo snapshot e del
+    precedente (che un lettore potrebbe star ancora aprendo).
+
+    Args:
+        result (DatasetResult): Dataset da esportare
+        directory (str): Cartella di destinazione (viene creata se non esiste)
+        source (str): URL dell'API da cui provengono i dati, da riportare nel manifest
+
+    Returns:
+        dict: Manifest dello snapshot
+    """
+    os.makedirs(directory, exist_ok=True)
+    try:
+        previous = read_manifest(directory)
+    except (OSError, ValueError):
+        previous = None
+
+    snapshot_id = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    token = uuid.uuid4().hex[:8]
+    frames = {"info": result.info, "history": result.history}
+    files = {}
+    for name, filename in FILES.items():
+        stem, extension = os.path.splitext(filename)
+        versioned = f"{stem}-{snapshot_id}-{token}{extension}"
+        path = os.path.join(directory, versioned)
+        frames[name].to_parquet(path, compression=COMPRESSION, index=False)
+        files[name] = {"path": versioned, "rows": len(frames[name]), "sha256": _sha256(path)}
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "snapshot_id": snapshot_id,
+        "created_at": time.time(),
+        "source": source,
+        "distilleries": len(result.info),
+        "distilleries_with_history": result.stats.loaded,
+        "files": files,
+    }
+    # Il manifest viene scritto per ultimo: la sua presenza indica uno snapshot completo
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, prefix=MANIFEST, suffix=".tmp",
+                                     delete=False) as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f.name, os.path.join(directory, MANIFEST))
+
+    _remove_unreferenced(directory, [manifest, previous])
+    return manifest
+
+
+def _remove_unreferenced(directory, manifests):
+    # Elimina i Parquet degli snapshot più vecchi (nomi versionati o quelli fissi
+    # dei manifest precedenti) e di esportazioni interrotte
+    keep = {entry["path"] for manifest in manifests if manifest for entry in manifest["files"].values()}
+    stems = tuple(os.path.splitext(filename)[0] + "-" for filename in FILES.values())
+    for filename in os.listdir(directory):
+        ours = filename in FILES.values() or (filename.startswith(stems) and filename.endswith(".parquet"))
+        if ours and filename not in keep:
+            try:
+                os.remove(os.path.join(directory, filename))
+            except OSError as e:
+                print(f"Impossibile eliminare il file dello snapshot {filename}: {e}")
+
+
+def read_manifest(directory):
+    """Legge il manifest di uno snapshot."""
+    with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _read_frames(directory, verify):
+    manifest = read_manifest(directory)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Versione dello snapshot non supportata: {manifest.get('format_version')}")
+
+    frames = {}
+    for name, entry in manifest["files"].items():
+        path = os.path.join(directory, entry["path"])
+        if verify and _sha256(path) != entry["sha256"]:
+            raise ValueError(f"File dello snapshot corrotto: {path}")
+        frames[name] = pd.read_parquet(path)
+    return manifest, frames
+
+
+def load_snapshot(directory, verify=False):
+    """
+    Carica uno snapshot senza accedere alla rete.
+
+    Args:
+        directory (str): Cartella dello snapshot
+        verify (bool): Se controllare le impronte SHA-256 dei file
+
+    Returns:
+        DatasetResult: Dataset contenuto nello snapshot
+
+    Raises:
+        ValueError: Se la versione del formato non è supportata o un file è corrotto
+    """
+    try:
+        manifest, frames = _read_frames(directory, verify)
+    except FileNotFoundError:
+        # Un'esportazione concorrente ha sostituito il manifest ed eliminato i file
+        # dello snapshot letto: si riparte dal manifest nuovo
+        manifest, frames = _read_frames(directory, verify)
+
+    history = frames["history"]
+    stats = FetchStats(
+        requested=manifest["distilleries_with_history"],
+        loaded=manifest["distilleries_with_history"],
+        rows=len(history),
+        memory=int(history.memory_usage(deep=True).sum()),
+    )
+    return DatasetResult(info=frames["info"], history=history, stats=stats)
@@ -0,0 +1,93 @@
+"""
+Aggiornamento incrementale degli storici in cache (refresh_distillery_data):
+nuovo mese, correzione dell'ultimo mese, risposta invariata e correzione di
+un mese più vecchio della finestra riconvertita.
+
+Uso:
+    python -m pytest tests
+"""
+import copy
+import json
+
+import pandas as pd
+import pytest
+
+import data_loader
+from benchmarks.stub_api import generate_catalog, generate_history
+from data_loader import parse_distillery_data, refresh_distillery_data
+from disk_cache import DiskCache
+
+
+class FakeResponse:
+    def __init__(self, records, etag):
+        self.status_code = 200
+        self.content = json.dumps(records).encode()
+        self.headers = {"ETag": etag}
+
+    def raise_for_status(self):
+        pass
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    # Risposta corrente dell'API, modificabile dai test; ogni risposta ha un ETag nuovo
+    state = {'records': [], 'version': 0}
+
+    def http_get(url, headers=None, key=None):
+        state['version'] += 1
+        return FakeResponse(state['records'], f'"v{state["version"]}"')
+
+    monkeypatch.setattr(data_loader, "cache", DiskCache(str(tmp_path)))
+    monkeypatch.setattr(data_loader, "http_get", http_get)
+    return state
+
+
+@pytest.fixture
+def slug(api):
+    distillery = generate_catalog(1)[0]
+    # 24 mesi dal più recente; il primo mese resta da pubblicare
+    history = generate_history(distillery, 25)
+    api['upcoming'], api['records'] = history[0], history[1:]
+    data_loader.load_distillery_data(distillery['slug'])
+    # Il primo aggiornamento converte tutto e registra l'impronta dei mesi vecchi
+    _, stats = refresh_distillery_data(distillery['slug'])
+    assert stats['full']
+    return distillery['slug']
+
+
+def _expected(records):
+    return parse_distillery_data(records).sort_values('dt', ignore_index=True)
+
+
+def test_new_month(api, slug):
+    api['records'] = [api['upcoming']] + api['records']
+    df, stats = refresh_distillery_data(slug)
+    assert (stats['full'], stats['appended'], stats['updated']) == (False, 1, 0)
+    pd.testing.assert_frame_equal(df, _expected(api['records']))
+
+
+def test_corrected_last_month(api, slug):
+    api['records'] = copy.deepcopy(api['records'])
+    api['records'][0]['winning_bid_mean'] += 10
+    df, stats = refresh_distillery_data(slug)
+    assert (stats['full'], stats['appended'], stats['updated']) == (False, 0, 1)
+    pd.testing.assert_frame_equal(df, _expected(api['records']))
+
+
+def test_unchanged_payload(api, slug):
+    df, stats = refresh_distillery_data(slug)
+    assert (stats['full'], stats['appended'], stats['updated']) == (False, 0, 0)
+    pd.testing.assert_frame_equal(df, _expected(api['records']))
+
+
+def test_corrected_older_month(api, slug):
+    # Mese fuori dalla finestra riconvertita: la risposta viene convertita per intero
+    api['records'] = copy.deepcopy(api['records'])
+    api['records'][data_loader.REFRESH_WINDOW_MONTHS + 5]['trading_volume'] += 1000
+    df, stats = refresh_distillery_data(slug)
+    assert (stats['full'], stats['appended'], stats['updated']) == (True, 0, 1)
+    pd.testing.assert_frame_equal(df, _expected(api['records']))
+
+    # Il successivo aggiornamento torna incrementale
+    _, stats = refresh_distillery_data(slug)
+    assert not stats['full']
@@ -0,0 +1,153 @@
+"""
+Equivalenza tra il backend SQLite (database.py) e quello in memoria (DatasetResult):
+classifiche, medie, filtri, storici, indice di mercato e correlazioni, più la
+sostituzione degli storici nelle esportazioni successive e la chiusura delle
+connessioni.
+
+Uso:
+    python -m pytest tests
+"""
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.stub_api import generate_frames
+from database import WhiskyDatabase, load_database
+from dataset import DatasetResult
+from filters import Filters
+
+
+@pytest.fixture(scope="module")
+def frames():
+    df_info, df_data = generate_frames(60, n_months=48)
+    # Buchi nello storico e prezzi mancanti, come nei dati reali
+    rng = np.random.default_rng(0)
+    df_data = df_data[rng.random(len(df_data)) > 0.1].reset_index(drop=True)
+    df_data.loc[rng.random(len(df_data)) < 0.02, 'winning_bid_mean'] = np.nan
+    return df_info, df_data
+
+
+@pytest.fixture(scope="module")
+def backends(frames, tmp_path_factory):
+    df_info, df_data = frames
+    path = str(tmp_path_factory.mktemp("db") / "whisky.db")
+    with WhiskyDatabase(path) as database:
+        database.write_info(df_info)
+        database.write_history(df_data)
+    sqlite = load_database(path)
+    yield sqlite, DatasetResult(info=df_info, history=df_data)
+    sqlite.database.close()
+
+
+@pytest.fixture(scope="module")
+def filters(backends):
+    sqlite, _ = backends
+    start, end = sqlite.filter_index.date_range
+    return [
+        Filters(start=start + pd.DateOffset(months=6), end=end - pd.DateOffset(months=3)),
+        Filters(countries=tuple(sqlite.filter_index.countries[:2])),
+        Filters(min_rating=80.0, start=start + pd.DateOffset(months=12)),
+    ]
+
+
+def _pairs(backends, filters):
+    yield backends
+    for f in filters:
+        yield backends[0].filtered(f), backends[1].filtered(f)
+
+
+@pytest.mark.parametrize("column", ['winning_bid_mean_mean', 'trading_volume_sum', 'winning_bid_mean_max', 'lots_count_sum'])
+def test_rankings(backends, filters, column):
+    for sqlite, memory in _pairs(backends, filters):
+        for k in (10, None):
+            a = sqlite.aggregates.top_distilleries(column, k)
+            b = memory.aggregates.top_distilleries(column, k)
+            np.testing.assert_allclose(a[column].to_numpy(dtype=float), b[column].to_numpy(dtype=float), rtol=1e-6)
+        # A parità di valore l'ordine dei nomi può differire: si confronta il valore di ogni distilleria
+        a = sqlite.aggregates.top_distilleries(column, None).set_index('name')[column]
+        b = memory.aggregates.top_distilleries(column, None).set_index('name')[column]
+        b.index = b.index.astype(str)
+        pd.testing.assert_series_equal(a.sort_index().astype(float), b.sort_index().astype(float), check_names=False, rtol=1e-6)
+
+
+def test_means(backends, filters):
+    for sqlite, memory in _pairs(backends, filters):
+        for column in ('winning_bid_mean', 'trading_volume'):
+            assert sqlite.aggregates.means[column] == pytest.approx(memory.aggregates.means[column], rel=1e-6)
+
+
+def test_filters_and_history(backends, filters):
+    for sqlite, memory in _pairs(backends, filters):
+        assert len(sqlite.index) == len(memory.index)
+        assert sqlite.index.available_names == memory.index.available_names
+        for name in sqlite.index.available_names[:5]:
+            slug = sqlite.index.slug_for(name)
+            a = sqlite.index.history_for(slug)
+            b = memory.index.history_for(slug)
+            assert a['dt'].tolist() == b['dt'].tolist()
+            np.testing.assert_allclose(a['winning_bid_mean'].to_numpy(dtype=float), b['winning_bid_mean'].to_numpy(dtype=float), rtol=1e-6)
+
+
+@pytest.mark.parametrize("weighting", ['equal', 'volume'])
+def test_market_index(backends, filters, weighting):
+    for sqlite, memory in _pairs(backends, filters):
+        assert len(sqlite.analytics) == len(memory.analytics)
+        a = sqlite.analytics.market_index(weighting)
+        b = memory.analytics.market_index(weighting)
+        assert a['dt'].tolist() == pd.to_datetime(b['dt']).tolist()
+        assert a['distilleries'].tolist() == b['distilleries'].tolist()
+        np.testing.assert_allclose(a['index'], b['index'], rtol=1e-9)
+        np.testing.assert_allclose(a['volume'], b['volume'], rtol=1e-6)
+
+
+def test_correlation(backends, filters):
+    for sqlite, memory in _pairs(backends, filters):
+        a = sqlite.analytics.by_volume(10)
+        b = memory.analytics.by_volume(10)
+        assert a.slugs.tolist() == b.slugs.tolist()
+        np.testing.assert_allclose(a.correlation(), b.correlation(), rtol=1e-9, equal_nan=True)
+
+
+def test_export_replaces_history(frames, tmp_path, request):
+    df_info, df_data = frames
+    database = WhiskyDatabase(str(tmp_path / "whisky.db"))
+    request.addfinalizer(database.close)
+    database.write_info(df_info)
+    database.write_history(df_data)
+
+    # Secondo export: una distilleria ha perso i mesi più vecchi, una non ha più lo
+    # storico esportato e una è sparita dal catalogo
+    slug, removed, dropped = df_info['slug'].iloc[:3]
+    rows = df_data[df_data['slug'] == slug]
+    recent = rows[rows['dt'] >= rows['dt'].median()]
+    database.write_history(recent, replace=True)
+    catalog = [s for s in df_info['slug'] if s != dropped]
+    database.prune(catalog, [s for s in catalog if s != removed])
+
+    assert database.scalar("SELECT COUNT(*) FROM history WHERE slug = ?", (slug,)) == len(recent)
+    assert database.scalar("SELECT MIN(dt) FROM history WHERE slug = ?", (slug,)) == recent['dt'].min().strftime('%Y-%m-%d')
+    assert database.scalar("SELECT COUNT(*) FROM history WHERE slug = ?", (removed,)) == 0
+    assert database.scalar("SELECT COUNT(*) FROM distilleries WHERE slug = ?", (removed,)) == 1
+    assert database.scalar("SELECT COUNT(*) FROM history WHERE slug = ?", (dropped,)) == 0
+    assert database.scalar("SELECT COUNT(*) FROM distilleries WHERE slug = ?", (dropped,)) == 0
+    assert database.scalar("SELECT COUNT(DISTINCT slug) FROM history") == df_info['slug'].nunique() - 2
+
+
+def test_close_all_threads(tmp_path):
+    database = WhiskyDatabase(str(tmp_path / "whisky.db"))
+    connections = []
+    worker = threading.Thread(target=lambda: connections.append(database.connection()))
+    worker.start()
+    worker.join()
+    connections.append(database.connection())
+
+    database.close()
+    for conn in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+    # Dopo close le query aprono una nuova connessione
+    assert database.scalar("SELECT COUNT(*) FROM history") == 0
+    database.close()
@@ -0,0 +1,48 @@
+"""
+Caricamento su richiesta di WhiskyDataset (modalità lazy): un download fallito
+non deve impedire i tentativi successivi.
+
+Uso:
+    python -m pytest tests
+"""
+import pandas as pd
+import pytest
+
+import dataset
+from benchmarks.stub_api import generate_frames
+from dataset import WhiskyDataset
+
+
+@pytest.fixture
+def frames():
+    return generate_frames(5, n_months=12)
+
+
+def test_failed_fetch_is_retried(frames, monkeypatch):
+    df_info, df_data = frames
+    slug = df_info['slug'].iloc[0]
+    calls = []
+
+    def load_histories(slugs, **kwargs):
+        calls.append(list(slugs))
+        # Il primo download fallisce: load_histories restituisce un DataFrame vuoto
+        if len(calls) == 1:
+            return pd.DataFrame()
+        return df_data[df_data['slug'].isin(slugs)].reset_index(drop=True)
+
+    monkeypatch.setattr(dataset, "load_distilleries_info", lambda revalidate=False: df_info)
+    monkeypatch.setattr(dataset, "load_histories", load_histories)
+
+    store = WhiskyDataset(lazy=True)
+    store.load()
+    assert store.ensure_loaded([slug]).index.history_for(slug).empty
+    assert not store.is_requested(slug)
+
+    result = store.ensure_loaded([slug])
+    assert calls == [[slug], [slug]]
+    assert store.is_requested(slug)
+    assert len(result.index.history_for(slug)) == (df_data['slug'] == slug).sum()
+
+    # Una volta caricato lo storico non viene più scaricato
+    store.ensure_loaded([slug])
+    assert len(calls) == 2
@@ -0,0 +1,56 @@
+"""
+FilterIndex: i filtri danno le stesse righe di un filtro diretto sullo storico,
+anche con periodi vuoti o invertiti.
+
+Uso:
+    python -m pytest tests
+"""
+import pandas as pd
+import pytest
+
+from benchmarks.stub_api import generate_frames
+from dataset import DatasetResult
+from filters import Filters
+
+
+@pytest.fixture(scope="module")
+def result():
+    df_info, df_data = generate_frames(30, n_months=24)
+    return DatasetResult(info=df_info, history=df_data)
+
+
+def _expected(result, filters):
+    df_info, df_data = result.info, result.history
+    if filters.countries:
+        df_info = df_info[df_info['country'].isin(filters.countries)]
+    if filters.min_rating is not None:
+        df_info = df_info[df_info['whiskybase_rating'] >= filters.min_rating]
+    rows = df_data['slug'].isin(df_info['slug'])
+    if filters.start is not None:
+        rows &= df_data['dt'] >= filters.start
+    if filters.end is not None:
+        rows &= df_data['dt'] <= filters.end
+    return df_data[rows]
+
+
+def test_filters_match_direct_selection(result):
+    start, end = result.filter_index.date_range
+    country = result.filter_index.countries[0]
+    for filters in (
+        Filters(start=start + pd.DateOffset(months=3), end=end - pd.DateOffset(months=3)),
+        Filters(countries=(country,), start=start + pd.DateOffset(months=6)),
+        Filters(min_rating=85.0, end=end - pd.DateOffset(months=12)),
+    ):
+        filtered = result.filtered(filters)
+        expected = _expected(result, filters)
+        key = lambda df: sorted(zip(df['slug'], df['dt']))
+        assert key(filtered.history) == key(expected)
+
+
+@pytest.mark.parametrize("countries", [(), ("Scotland",)])
+def test_start_after_end_is_empty(result, countries):
+    start, end = result.filter_index.date_range
+    filters = Filters(start=end, end=start, countries=countries)
+    filtered = result.filtered(filters)
+    assert filtered.history.empty
+    assert len(filtered.index) == 0
@@ -0,0 +1,33 @@
+"""
+Snapshot offline: l'esportazione conserva lo storico completo, il caricamento
+lo converte in tipi compatti.
+
+Uso:
+    python -m pytest tests
+"""
+import pandas as pd
+
+import data_loader
+from benchmarks.stub_api import StubAPI
+from dataset import UNUSED_HISTORY_COLUMNS, WhiskyDataset
+from snapshot import load_snapshot
+
+
+def test_export_keeps_full_history(tmp_path, monkeypatch):
+    directory = str(tmp_path / "snapshot")
+    with StubAPI(n_distilleries=10, n_months=12, latency=0.0) as stub:
+        monkeypatch.setattr(data_loader, "API_BASE_URL", stub.base_url)
+        monkeypatch.setattr(data_loader, "cache", None)
+        assert data_loader.main(["export", directory, "--rate-limit", "0"]) == 0
+
+    history = load_snapshot(directory).history
+    assert set(UNUSED_HISTORY_COLUMNS) <= set(history.columns)
+    assert history['winning_bid_mean'].dtype == 'float64'
+    assert history['slug'].nunique() == 10
+
+    store = WhiskyDataset.from_snapshot(directory)
+    compact = store.result.history
+    assert not set(UNUSED_HISTORY_COLUMNS) & set(compact.columns)
+    assert len(compact) == len(history)
+    assert isinstance(compact['slug'].dtype, pd.CategoricalDtype)
+    assert store.result.stats.memory < store.result.stats.memory_raw